@@ -1,18 +1,35 @@
-from fastapi import FastAPI , UploadFile , File,  HTTPException
+from fastapi import FastAPI , HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import asyncio
+import json
 import os
+import time
 
+import orjson
 
+
+from models.card import Card, Document
 from models.cardGenerator import CardGenerator
-from utils.pdfParser import parse_pdf
+from models.geminiClient import BREAKER_STATES
+from utils import metrics
+from utils.cache import hashKey
+from utils.decks import DeckStore, EXPORT_FORMATS, exportDeck
+from utils.jobs import JobRunner, jobStoreFromEnv
+from utils.parsePool import ParsePool
+from utils.reviews import ReviewStore
+from utils.sharedState import SharedState
+from utils.singleflight import SingleFlight
+from utils.uploads import PdfUpload, UploadError, UploadForm, receiveForm
 from utils.textProcessor import processText
 
 app = FastAPI(
     title = "Flashcards API" ,
     description = "API для генерации флэшкарт из текста и PDF", 
-    version = "1.0.0"
+    version = "1.0.0",
+    default_response_class = ORJSONResponse
 )
 
 app.add_middleware(
@@ -24,16 +41,139 @@ app.add_middleware(
 )
 
 cardGenerator = CardGenerator()
+parsePool = ParsePool()
+jobRunner = JobRunner(jobStoreFromEnv())
+# файлы колод (по умолчанию decks.db в рабочем каталоге) открываются при старте сервера, а не при импорте app
+deckStore : DeckStore = None
+reviewStore : ReviewStore = None
+# один и тот же документ, загруженный одновременно (например всем классом), обрабатывается один раз
+# с SHARED_STATE_DB — и между воркерами gunicorn: документ считает один воркер, остальные берут его из общего кэша
+generateFlight = SingleFlight("generate", SharedState.fromEnv(), float(os.getenv("SHARED_LEASE_TTL", "30")))
+
+@app.middleware("http")
+async def requestTiming(request : Request, call_next):
+    started = time.perf_counter()
+    spans = None
+    status = 500
+    try :
+        with metrics.collect() as spans :
+            response = await call_next(request)
+        status = response.status_code
+    finally :
+        elapsed = time.perf_counter() - started
+        endpoint = getattr(request.scope.get("endpoint"), "__name__", "unmatched")
+        metrics.HTTP_REQUESTS.inc(endpoint = endpoint, method = request.method, status = str(status))
+        metrics.HTTP_SECONDS.observe(elapsed, endpoint = endpoint)
+        if spans is not None :
+            spans.finish()
+    if spans.stages or spans.events :
+        response.headers["Server-Timing"] = ", ".join(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans.stages.items()
+        )
+        print(f"⏱️ {request.method} {request.url.path} {status} {elapsed:.3f} с {json.dumps(spans.export(), ensure_ascii=False)}")
+    return response
+
+async def receiveUpload(request : Request , failFast : bool = True) -> UploadForm :
+    # тело читается потоком: размер и сигнатура PDF проверяются до того, как файл загружен целиком
+    try :
+        with metrics.span("upload_read") :
+            form = await receiveForm(request, failFast = failFast)
+    except UploadError as e :
+        raise HTTPException(status_code=400, detail=str(e))
+    for uploads in form.files.values() :
+        for upload in uploads :
+            metrics.UPLOAD_BYTES.observe(upload.size)
+    return form
+
+def formNumCards(form : UploadForm) -> int :
+    try :
+        return int(form.field("numCards", "10"))
+    except ValueError :
+        form.close()
+        raise HTTPException(status_code=400, detail="numCards должно быть числом")
+
+def pdfFromForm(form : UploadForm) -> PdfUpload :
+    uploads = form.files.get("file")
+    if not uploads :
+        form.close()
+        raise HTTPException(status_code=400, detail="Нужен PDF файл")
+    return uploads[0]
+
+NO_USABLE_TEXT = "После очистки не осталось текста для карточек"
+
+def usableText(text : str) -> str :
+    # очистка убирает шум (номера страниц, ссылки, служебные символы): из такого текста генерировать нечего
+    processed = processText(text)
+    if not processed.strip() :
+        raise HTTPException(status_code=400, detail=NO_USABLE_TEXT)
+    return processed
+
+PDF_UPLOAD_BODY = {
+    "requestBody": {
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"]
+                }
+            }
+        }
+    }
+}
+
+async def warmUp():
+    started = time.perf_counter()
+    try :
+        await asyncio.gather(asyncio.to_thread(cardGenerator.warmUp), parsePool.warmUp())
+        print(f"🔥 Прогрев завершён за {time.perf_counter() - started:.2f} с")
+    except Exception as e :
+        print(f"⚠️ Прогрев не удался: {e}")
+
+@app.on_event("startup")
+async def startup():
+    global deckStore , reviewStore
+    deckStore = DeckStore.fromEnv()
+    reviewStore = ReviewStore.fromEnv()
+    jobRunner.start()
+    # тяжёлые импорты (Gemini, PDF) идут в фоне после готовности: /health отвечает сразу
+    app.state.warmUp = asyncio.create_task(warmUp()) if os.getenv("WARMUP_ON_START", "0") == "1" else None
+
+@app.on_event("shutdown")
+async def shutdown():
+    await jobRunner.stop()
+    parsePool.shutdown()
 
 class TextInput(BaseModel) : 
     text : str
     numCards : int = 10
+    save : bool = False
+    title : Optional[str] = None
 class Flashcard(BaseModel) :
     question : str
     answer : str
+    type : Optional[str] = None
+    difficulty : Optional[str] = None
+    start : Optional[int] = None
+    end : Optional[int] = None
 class FlashcardsResponse(BaseModel) :
     cards : List[Flashcard]
     total : int
+    deckId : Optional[str] = None
+
+# карточки (Card) сериализуются orjson напрямую, без pydantic; модели ответов остаются только схемой для документации
+CARDS_RESPONSES = {200: {"model": FlashcardsResponse}}
+
+def cardsResponse(cards : list , deckId : str = None) -> ORJSONResponse :
+    return ORJSONResponse({"cards": cards, "total": len(cards), "deckId": deckId})
+
+def savedDeck(sourceHash : str , numCards : int) -> Optional[ORJSONResponse] :
+    # повторный просмотр сохранённой колоды — чтение из базы, а не новая генерация
+    deck = deckStore.findBySource(sourceHash, numCards)
+    if deck is None :
+        return None
+    # та же схема карточек, что и у свежей генерации (без id/deckId/position из таблицы)
+    return cardsResponse(Card.fromList(deckStore.cards(deck["id"])), deck["id"])
 
 @app.get("/")
 async def root():
@@ -42,15 +182,54 @@ async def root():
         "endpoints": {
             "POST /generate/text": "Генерация карточек из текста",
             "POST /generate/pdf": "Генерация карточек из PDF",
-            "GET /health": "Проверка работы сервера"
+            "POST /generate/text/stream": "Потоковая генерация карточек из текста (NDJSON/SSE)",
+            "POST /generate/pdf/stream": "Потоковая генерация карточек из PDF (NDJSON/SSE)",
+            "POST /generate/batch": "Генерация карточек для нескольких текстов и PDF за один запрос",
+            "POST /jobs": "Фоновая генерация карточек из текста или PDF",
+            "GET /jobs/{id}": "Статус фоновой задачи",
+            "GET /jobs/{id}/cards": "Результат фоновой задачи",
+            "POST /decks": "Сохранение колоды",
+            "GET /decks": "Список сохранённых колод (по страницам, фильтр по sourceHash)",
+            "GET /decks/{id}": "Колода и её карточки",
+            "GET /decks/{id}/export": "Экспорт колоды в CSV, Anki или JSON",
+            "GET /cards/{id}": "Карточка по id",
+            "POST /reviews/{userId}/decks/{deckId}": "Добавить колоду в повторение",
+            "GET /reviews/{userId}/due": "Карточки, которые пора повторить",
+            "POST /reviews/{userId}/cards/{cardId}": "Записать ответ (оценка 0-5)",
+            "GET /reviews/{userId}/stats": "Статистика повторений",
+            "GET /health": "Проверка работы сервера",
+            "GET /metrics": "Метрики в формате Prometheus"
         }
     }
 
 @app.get("/health")
 async def healthCheck():
-    return {"status": "healthy", "service": "flashcards-api"}
+    return {
+        "status": "healthy",
+        "service": "flashcards-api",
+        "worker": os.getpid(),
+        "gemini": cardGenerator.geminiStats(),
+        "cache": [cardGenerator.cache.stats(), parsePool.cache.stats()],
+        "coalescing": generateFlight.stats()
+    }
+
+@app.get("/metrics")
+async def metricsEndpoint():
+    gauges = {}
+    gemini = cardGenerator.geminiStats()
+    for name , value in gemini.items() :
+        if isinstance(value , (int, float)) and not isinstance(value , bool) :
+            gauges[f"flashcards_gemini_{name}"] = value
+    if "breakerState" in gemini :
+        # строку Prometheus не примет: состояние предохранителя отдаётся числом
+        gauges["flashcards_gemini_breakerState"] = BREAKER_STATES.index(gemini["breakerState"])
+    for stats in (cardGenerator.cache.stats(), parsePool.cache.stats(), generateFlight.stats()) :
+        for name , value in stats.items() :
+            if isinstance(value , (int, float)) :
+                gauges[f"flashcards_{stats['name']}_{name}"] = value
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
 
-@app.post("/generate/text", response_model=FlashcardsResponse)
+@app.post("/generate/text", response_model = None, responses = CARDS_RESPONSES)
 async def generateFromText(inputData : TextInput):
     try : 
         if len(inputData.text.strip()) < 50 :
@@ -58,63 +237,85 @@ async def generateFromText(inputData : TextInput):
                 status_code=400,
                 detail="Текст слишком короткий.Минимум 50 символов"
             )
-        processedText = processText(inputData.text)
+        metrics.INPUT_CHARS.observe(len(inputData.text))
+        # хэш исходного текста считается один раз: ключ кэша, single-flight и поиска сохранённой колоды
+        document = Document.fromText(inputData.text)
+        if inputData.save :
+            saved = await asyncio.to_thread(savedDeck, document.hash, inputData.numCards)
+            if saved is not None :
+                return saved
 
-        cards = await cardGenerator.generateCards(
-            processedText,
-            numCards = inputData.numCards
+        async def generate() :
+            document.text = usableText(document.text)
+            return await cardGenerator.generateCards(
+                document,
+                numCards = inputData.numCards
+            )
+
+        cards = await generateFlight.do(
+            hashKey("text", document.hash, inputData.numCards),
+            generate
         )
         if not cards : 
             raise HTTPException(
                 status_code=500,
                 detail="Не удалось сгенерировать карточки"
             )
-        return FlashcardsResponse(
-            cards=cards,
-            total=len(cards)
-        )
+        metrics.CARDS.observe(len(cards))
+        deckId = None
+        if inputData.save :
+            deck = await asyncio.to_thread(deckStore.save, cards, inputData.title, document.hash, "text", inputData.numCards)
+            deckId = deck["id"]
+        return cardsResponse(cards, deckId)
+    except HTTPException:
+        raise
     except Exception as e: 
         raise HTTPException(status_code=500,detail=f"Ошибка генерации:{str(e)}")
     
-@app.post("/generate/pdf", response_model = FlashcardsResponse)
-async def generateFromPdf(file : UploadFile = File(...) , numCards : int = 10) :
-    try : 
-        if not file.filename.endswith('.pdf'):
-            raise HTTPException(
-                status_code=400,
-                detail="Разрешены только PDF файлы"
-            )
-        contents = await file.read()
-        if len(contents) > 10 * 1024 * 1024 :
-            raise HTTPException(
-                status_code=400,
-                detail="Файл слишком большой.Максимум 10MB"
-            )
-        
-        text = parse_pdf(contents)
+@app.post("/generate/pdf", response_model = None, responses = CARDS_RESPONSES, openapi_extra = PDF_UPLOAD_BODY)
+async def generateFromPdf(request : Request , numCards : int = 10 , save : bool = False , title : str = None) :
+    form = await receiveUpload(request)
+    upload = pdfFromForm(form)
+    if save :
+        saved = await asyncio.to_thread(savedDeck, upload.hash, numCards)
+        if saved is not None :
+            form.close()
+            return saved
+    async def generate() :
+        try :
+            parsed = await parsePool.parseDocument(upload, numCards)
+        finally :
+            # временный файл больше не нужен: дальше работа идёт с текстом
+            form.close()
 
-        if len(text.strip()) < 50 :
+        if len(parsed["text"].strip()) < 50 :
             raise HTTPException(
                 status_code=400,
                 detail = "PDF содержит слишком мало текста"
             )
-        
-        processedText = processText(text)
-        cards = await cardGenerator.generateCards(
-            processedText,
+        metrics.INPUT_CHARS.observe(len(parsed["text"]))
+
+        return await cardGenerator.generateCards(
+            Document(parsed["text"], upload.hash, "pdf", parsed["pages"], upload.filename),
             numCards = numCards
         )
 
+    try : 
+        # загрузкой владеет вычисление: если запрос отключится, пока оно ждёт аренду, файл не удалится раньше разбора
+        cards = await generateFlight.do(hashKey("pdf", upload.hash, numCards), generate, release = form.close)
+
         if not cards : 
             raise HTTPException(
                 status_code=500,
                 detail= "Не удалось сгенерировать карточки из PDF"
             )
-        
-        return FlashcardsResponse(
-            cards = cards,
-            total = len(cards)
-        )
+
+        metrics.CARDS.observe(len(cards))
+        deckId = None
+        if save :
+            deck = await asyncio.to_thread(deckStore.save, cards, title or upload.filename, upload.hash, "pdf", numCards)
+            deckId = deck["id"]
+        return cardsResponse(cards, deckId)
     except HTTPException:
         raise
     except Exception as e:
@@ -123,6 +324,415 @@ async def generateFromPdf(file : UploadFile = File(...) , numCards : int = 10) :
             detail = f"Ошибка обработки PDF : {str(e)}"
         )
     
+def streamResponse(cards , fmt : str) -> StreamingResponse :
+    if fmt not in ("ndjson", "sse") :
+        raise HTTPException(
+            status_code=400,
+            detail="Формат потока должен быть ndjson или sse"
+        )
+
+    def encode(event : str , payload) -> bytes :
+        data = orjson.dumps(payload)
+        if fmt == "sse" :
+            return b"event: " + event.encode() + b"\ndata: " + data + b"\n\n"
+        return data + b"\n"
+
+    async def body() :
+        total = 0
+        try :
+            async for card in cards :
+                total += 1
+                yield encode("card", card)
+            metrics.CARDS.observe(total)
+            yield encode("done", {"done": True, "total": total})
+        except Exception as e :
+            yield encode("error", {"error": f"Ошибка генерации:{str(e)}"})
+
+    mediaType = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=mediaType)
+
+@app.post("/generate/text/stream")
+async def streamFromText(inputData : TextInput, format : str = "ndjson"):
+    if len(inputData.text.strip()) < 50 :
+        raise HTTPException(
+            status_code=400,
+            detail="Текст слишком короткий.Минимум 50 символов"
+        )
+    document = Document.fromText(inputData.text)
+    document.text = usableText(document.text)
+    return streamResponse(
+        cardGenerator.streamCards(document, numCards = inputData.numCards),
+        format
+    )
+
+@app.post("/generate/pdf/stream", openapi_extra = PDF_UPLOAD_BODY)
+async def streamFromPdf(request : Request , numCards : int = 10, format : str = "ndjson") :
+    form = await receiveUpload(request)
+    upload = pdfFromForm(form)
+    try :
+        parsed = await parsePool.parseDocument(upload, numCards)
+    except Exception as e :
+        raise HTTPException(
+            status_code=500,
+            detail = f"Ошибка обработки PDF : {str(e)}"
+        )
+    finally :
+        form.close()
+    if len(parsed["text"].strip()) < 50 :
+        raise HTTPException(
+            status_code=400,
+            detail = "PDF содержит слишком мало текста"
+        )
+    document = Document(parsed["text"], upload.hash, "pdf", parsed["pages"], upload.filename)
+    return streamResponse(
+        cardGenerator.streamCards(document, numCards = numCards),
+        format
+    )
+
+class BatchItemResult(BaseModel) :
+    index : int
+    source : str
+    cards : List[Flashcard] = []
+    total : int = 0
+    error : Optional[str] = None
+class BatchResponse(BaseModel) :
+    results : List[BatchItemResult]
+    total : int
+
+@app.post("/generate/batch", response_model = None, responses = {200: {"model": BatchResponse}}, openapi_extra = {
+    "requestBody": {
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "texts": {"type": "array", "items": {"type": "string"}},
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                        "numCards": {"type": "integer", "default": 10}
+                    }
+                }
+            },
+            # пакет из одних текстов можно прислать обычной формой: texts=...&texts=...
+            "application/x-www-form-urlencoded": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "texts": {"type": "array", "items": {"type": "string"}},
+                        "numCards": {"type": "integer", "default": 10}
+                    },
+                    "required": ["texts"]
+                }
+            }
+        }
+    }
+})
+async def generateBatch(request : Request) :
+    # ошибка одного файла (размер, не PDF) не отменяет остальные
+    form = await receiveUpload(request, failFast = False)
+    numCards = formNumCards(form)
+    texts = form.fields.get("texts", [])
+    files = form.files.get("files", [])
+    if not texts and not files :
+        form.close()
+        raise HTTPException(
+            status_code=400,
+            detail="Нужен хотя бы один текст или PDF файл"
+        )
+
+    sources = [f"text[{i}]" for i in range(len(texts))] + [f.filename for f in files]
+    errors = [None] * len(texts) + [f.error for f in files]
+    rawTexts = list(texts) + [""] * len(files)
+    hashes = [Document.fromText(text).hash for text in texts] + [f.hash for f in files]
+
+    pdfIndices = [len(texts) + i for i in range(len(files)) if errors[len(texts) + i] is None]
+    try :
+        parsed = await parsePool.parseMany([files[i - len(texts)] for i in pdfIndices], numCards)
+    finally :
+        form.close()
+    for index , result in zip(pdfIndices , parsed) :
+        if isinstance(result , Exception) :
+            errors[index] = f"Ошибка обработки PDF : {str(result)}"
+        else :
+            rawTexts[index] = result
+
+    for index , text in enumerate(rawTexts) :
+        if errors[index] is None and len(text.strip()) < 50 :
+            errors[index] = "Текст слишком короткий.Минимум 50 символов"
+
+    valid = [i for i in range(len(sources)) if errors[i] is None]
+    # текст PDF обработан ещё в процессе-парсере: обрабатываются только присланные тексты
+    validTexts = [i for i in valid if i < len(texts)]
+    processed = dict(zip(validTexts , await parsePool.processMany([rawTexts[i] for i in validTexts])))
+    ready = []
+    for index in valid :
+        result = processed.get(index , rawTexts[index])
+        if isinstance(result , Exception) :
+            errors[index] = f"Ошибка обработки текста:{str(result)}"
+        elif not result.strip() :
+            errors[index] = NO_USABLE_TEXT
+        else :
+            kind = "text" if index < len(texts) else "pdf"
+            ready.append((index , Document(result, hashes[index], kind)))
+
+    generated = await cardGenerator.generateBatch([document for _ , document in ready] , numCards = numCards)
+    cardsByIndex = {}
+    for (index , _) , result in zip(ready , generated) :
+        if isinstance(result , Exception) :
+            errors[index] = f"Ошибка генерации:{str(result)}"
+        elif not result :
+            errors[index] = "Не удалось сгенерировать карточки"
+        else :
+            cardsByIndex[index] = result
+            metrics.CARDS.observe(len(result))
+
+    results = [
+        {
+            "index": i,
+            "source": sources[i],
+            "cards": cardsByIndex.get(i , []),
+            "total": len(cardsByIndex.get(i , [])),
+            "error": errors[i]
+        }
+        for i in range(len(sources))
+    ]
+    return ORJSONResponse({
+        "results": results,
+        "total": sum(r["total"] for r in results)
+    })
+
+class JobStatus(BaseModel) :
+    id : str
+    kind : str
+    status : str
+    error : Optional[str] = None
+    pagesParsed : int = 0
+    chunksTotal : int = 0
+    chunksDone : int = 0
+    cardsReady : int = 0
+
+@app.post("/jobs", response_model = JobStatus, status_code = 202, openapi_extra = {
+    "requestBody": {
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "text": {"type": "string"},
+                        "file": {"type": "string", "format": "binary"},
+                        "numCards": {"type": "integer", "default": 10}
+                    }
+                }
+            },
+            # задачу по тексту можно поставить и обычной формой, без multipart
+            "application/x-www-form-urlencoded": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "text": {"type": "string"},
+                        "numCards": {"type": "integer", "default": 10}
+                    },
+                    "required": ["text"]
+                }
+            }
+        }
+    }
+})
+async def createJob(request : Request) :
+    form = await receiveUpload(request)
+    numCards = formNumCards(form)
+    text = form.field("text")
+    if form.files.get("file") :
+        upload = pdfFromForm(form)
+
+        async def work(progress) :
+            # временный файл живёт до конца разбора в фоновой задаче
+            try :
+                parsed = await parsePool.parseDocument(upload, numCards)
+            finally :
+                form.close()
+            progress(pagesParsed = parsed["pages"])
+            if len(parsed["text"].strip()) < 50 :
+                raise ValueError("PDF содержит слишком мало текста")
+            return await cardGenerator.generateCards(
+                Document(parsed["text"], upload.hash, "pdf", parsed["pages"], upload.filename),
+                numCards = numCards,
+                onChunk = progress
+            )
+
+        return await jobRunner.submit("pdf", work)
+
+    form.close()
+    if text is None or len(text.strip()) < 50 :
+        raise HTTPException(
+            status_code=400,
+            detail="Нужен PDF файл или текст минимум из 50 символов"
+        )
+
+    # текст обрабатывается сразу: без пригодного текста задача не ставится
+    document = Document.fromText(text)
+    document.text = usableText(document.text)
+
+    async def work(progress) :
+        return await cardGenerator.generateCards(
+            document,
+            numCards = numCards,
+            onChunk = progress
+        )
+
+    return await jobRunner.submit("text", work)
+
+# обработчики, которые только читают и пишут SQLite, объявлены через def: FastAPI выполняет их в пуле потоков,
+# и ожидание блокировки базы другим воркером не останавливает цикл событий
+@app.get("/jobs/{jobId}", response_model = JobStatus)
+def getJob(jobId : str) :
+    job = jobRunner.store.get(jobId)
+    if job is None :
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+@app.get("/jobs/{jobId}/cards", response_model = None, responses = CARDS_RESPONSES)
+def getJobCards(jobId : str) :
+    job = jobRunner.store.get(jobId)
+    if job is None :
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if job["status"] == "failed" :
+        raise HTTPException(status_code=500, detail=f"Ошибка генерации:{job['error']}")
+    if job["status"] != "done" :
+        raise HTTPException(status_code=409, detail="Задача ещё выполняется")
+    return cardsResponse(jobRunner.store.getResult(jobId) or [])
+
+class DeckInput(BaseModel) :
+    cards : List[Flashcard]
+    title : Optional[str] = None
+    sourceHash : Optional[str] = None
+class DeckInfo(BaseModel) :
+    id : str
+    title : str
+    sourceHash : Optional[str] = None
+    sourceKind : Optional[str] = None
+    numCards : Optional[int] = None
+    total : int
+    created : float
+class DeckList(BaseModel) :
+    decks : List[DeckInfo]
+    nextCursor : Optional[str] = None
+class StoredCard(Flashcard) :
+    id : int
+    deckId : str
+    position : int
+class DeckCards(BaseModel) :
+    deck : DeckInfo
+    cards : List[StoredCard]
+    nextOffset : Optional[int] = None
+
+def findDeck(deckId : str) -> dict :
+    deck = deckStore.get(deckId)
+    if deck is None :
+        raise HTTPException(status_code=404, detail="Колода не найдена")
+    return deck
+
+@app.post("/decks", response_model = DeckInfo, status_code = 201)
+def saveDeck(deckInput : DeckInput) :
+    if not deckInput.cards :
+        raise HTTPException(status_code=400, detail="Колода не может быть пустой")
+    return deckStore.save(
+        [Card.fromDict({"type" : "manual", **card.model_dump(exclude_none = True)}) for card in deckInput.cards],
+        deckInput.title,
+        deckInput.sourceHash,
+        "manual"
+    )
+
+@app.get("/decks", response_model = DeckList)
+def listDecks(limit : int = Query(20, ge = 1, le = 100) , cursor : str = None , sourceHash : str = None) :
+    try :
+        decks , nextCursor = deckStore.list(limit, cursor, sourceHash)
+    except ValueError as e :
+        raise HTTPException(status_code=400, detail=str(e))
+    return DeckList(decks = decks, nextCursor = nextCursor)
+
+@app.get("/decks/{deckId}", response_model = DeckCards)
+def getDeck(deckId : str , offset : int = Query(0, ge = 0) , limit : int = Query(100, ge = 1, le = 1000)) :
+    deck = findDeck(deckId)
+    cards = deckStore.cards(deckId, offset, limit)
+    nextOffset = offset + limit if offset + limit < deck["total"] else None
+    return DeckCards(deck = deck, cards = cards, nextOffset = nextOffset)
+
+@app.get("/decks/{deckId}/export")
+def exportDeckFile(deckId : str , format : str = "csv") :
+    if format not in EXPORT_FORMATS :
+        raise HTTPException(
+            status_code=400,
+            detail=f"Формат экспорта должен быть одним из: {', '.join(EXPORT_FORMATS)}"
+        )
+    deck = findDeck(deckId)
+    mediaType , extension = {
+        "csv" : ("text/csv; charset=utf-8", "csv"),
+        "anki" : ("text/plain; charset=utf-8", "txt"),
+        "json" : ("application/json", "json"),
+    }[format]
+    return StreamingResponse(
+        exportDeck(deckStore, deck, format),
+        media_type = mediaType,
+        headers = {"Content-Disposition": f'attachment; filename="deck-{deckId}.{extension}"'}
+    )
+
+@app.delete("/decks/{deckId}", status_code = 204)
+def deleteDeck(deckId : str) :
+    cardIds = deckStore.cardIds(deckId)
+    if not deckStore.delete(deckId) :
+        raise HTTPException(status_code=404, detail="Колода не найдена")
+    # расписание удалённых карточек больше не нужно; due и stats их и так не показывают (JOIN с cards)
+    reviewStore.forget(cardIds)
+
+@app.get("/cards/{cardId}", response_model = StoredCard)
+def getCard(cardId : int) :
+    card = deckStore.card(cardId)
+    if card is None :
+        raise HTTPException(status_code=404, detail="Карточка не найдена")
+    return card
+
+class ReviewInput(BaseModel) :
+    grade : int = Field(ge = 0, le = 5)
+class ReviewState(BaseModel) :
+    cardId : int
+    due : float
+    interval : float
+    ease : float
+    reps : int
+    lapses : int
+    lastReview : Optional[float] = None
+class DueCard(StoredCard) :
+    due : float
+    interval : float
+    ease : float
+    reps : int
+class DueCards(BaseModel) :
+    cards : List[DueCard]
+    total : int
+
+@app.post("/reviews/{userId}/decks/{deckId}")
+def enrollDeck(userId : str , deckId : str) :
+    findDeck(deckId)
+    return {"enrolled": reviewStore.enroll(userId, deckStore.cardIds(deckId))}
+
+@app.get("/reviews/{userId}/due", response_model = DueCards)
+def dueCards(userId : str , limit : int = Query(20, ge = 1, le = 200)) :
+    schedule = reviewStore.due(userId, limit)
+    cardsById = deckStore.cardsByIds([s["cardId"] for s in schedule])
+    # карточки удалённых колод пропускаем
+    cards = [dict(cardsById[s["cardId"]], **s) for s in schedule if s["cardId"] in cardsById]
+    return DueCards(cards = cards, total = len(cards))
+
+@app.post("/reviews/{userId}/cards/{cardId}", response_model = ReviewState)
+def reviewCard(userId : str , cardId : int , reviewInput : ReviewInput) :
+    if deckStore.card(cardId) is None :
+        raise HTTPException(status_code=404, detail="Карточка не найдена")
+    return reviewStore.review(userId, cardId, reviewInput.grade)
+
+@app.get("/reviews/{userId}/stats")
+def reviewStats(userId : str) :
+    return reviewStore.stats(userId)
+
 if __name__ == "__main__" :
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,81 @@
+"""
+Сравнение классификатора шума с прежним циклом по шаблонам.
+
+    python -m benchmarks.benchNoise
+"""
+import random
+import re
+import time
+
+from utils.noiseFilter import NoiseClassifier
+
+LEGACY_PATTERNS = [
+    r'copyright|©|все права защищены|isbn',
+    r'издательство|publishing|press',
+    r'printed in|напечатано',
+    r'содержание|table of contents|оглавление',
+    r'глава \d+|chapter \d+',
+    r'часть \d+|part \d+',
+    r'раздел \d+|section \d+',
+    r'^\d+$',
+    r'страница \d+|page \d+',
+    r'автор:|author:|составитель',
+    r'редактор:|editor:|под редакцией',
+    r'^\s*$',
+    r'^[\d\s\.\-—–]+$',
+]
+
+
+def legacyIsNoise(text : str) -> bool :
+    if not text or len(text.strip()) < 20 :
+        return True
+    text_lower = text.lower().strip()
+    for pattern in LEGACY_PATTERNS :
+        if re.search(pattern, text_lower, re.IGNORECASE) :
+            return True
+    return False
+
+
+def makeParagraphs(count : int , seed : int = 0) :
+    rng = random.Random(seed)
+    words = ("клетка мембрана энергия процесс структура функция молекула система "
+             "cell membrane energy process structure function molecule system").split()
+    noise = ["Глава 3", "Copyright © 2020 Press", "Страница 12", "1.2.3 — 4", "Под редакцией И. И. Иванова"]
+    paragraphs = []
+    for _ in range(count) :
+        if rng.random() < 0.2 :
+            paragraphs.append(rng.choice(noise) + " " + " ".join(rng.choices(words, k = 5)))
+        else :
+            paragraphs.append(" ".join(rng.choices(words, k = rng.randint(15, 80))))
+    return paragraphs
+
+
+def run(count : int = 20000 , repeat : int = 5) -> dict :
+    paragraphs = makeParagraphs(count)
+    classifier = NoiseClassifier()
+
+    def best(fn) :
+        times = []
+        for _ in range(repeat) :
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    legacy = best(lambda : [legacyIsNoise(p) for p in paragraphs])
+    batched = best(lambda : classifier.classify(paragraphs))
+    assert [legacyIsNoise(p) for p in paragraphs] == classifier.classify(paragraphs)
+    return {
+        "paragraphs" : count,
+        "legacySeconds" : legacy,
+        "classifierSeconds" : batched,
+        "speedup" : legacy / batched,
+    }
+
+
+if __name__ == "__main__" :
+    result = run()
+    print(f"Абзацев: {result['paragraphs']}")
+    print(f"Старый цикл:    {result['legacySeconds'] * 1000:.1f} мс")
+    print(f"Классификатор:  {result['classifierSeconds'] * 1000:.1f} мс")
+    print(f"Ускорение:      x{result['speedup']:.1f}")
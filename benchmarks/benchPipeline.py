@@ -0,0 +1,228 @@
+"""
+Бенчмарк конвейера: parse_pdf, processText, generateSimple, aiResponse и сквозные вызовы API с заглушкой Gemini.
+Для каждого этапа и размера документа — перцентили задержки, пропускная способность и пиковая память (tracemalloc).
+
+    python -m benchmarks.benchPipeline --sizes 1,10,100,500 --out benchmarks/results/new.json
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+Кэши очищаются перед каждым прогоном, кроме кэша диапазона страниц внутри процессов парсера (e2e_pdf).
+Память для e2e считается только в главном процессе: парсинг идёт в пуле.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from benchmarks.corpus import LANGUAGES, SIZES, build
+from models.fakeLlm import FakeModel, fakeCompletion
+
+
+def percentile(samples : List[float] , q : float) -> float :
+    # nearest-rank
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def measure(fn : Callable , repeat : int , setup : Callable = None) -> Dict[str, float] :
+    samples = []
+    for _ in range(repeat) :
+        if setup :
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+
+    # память — отдельным прогоном: tracemalloc сильно замедляет выполнение
+    if setup :
+        setup()
+    tracemalloc.start()
+    try :
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally :
+        tracemalloc.stop()
+
+    return {
+        "runs" : repeat,
+        "mean" : statistics.fmean(samples),
+        "p50" : percentile(samples, 50),
+        "p95" : percentile(samples, 95),
+        "p99" : percentile(samples, 99),
+        "min" : min(samples),
+        "peakMemoryBytes" : peak,
+    }
+
+
+async def asgiRequest(application , method : str , path : str , body : bytes = b"" ,
+                      headers : Dict[str, str] = None , query : str = "") -> tuple :
+    scope = {
+        "type" : "http", "asgi" : {"version" : "3.0"}, "http_version" : "1.1",
+        "method" : method, "scheme" : "http", "path" : path, "raw_path" : path.encode(),
+        "query_string" : query.encode(), "root_path" : "",
+        "headers" : [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client" : ("bench", 0), "server" : ("bench", 80),
+    }
+    received = False
+
+    async def receive() :
+        nonlocal received
+        if not received :
+            received = True
+            return {"type" : "http.request", "body" : body, "more_body" : False}
+        # клиент «не отключается», пока приложение не ответит
+        await asyncio.Event().wait()
+
+    status = 0
+    chunks = []
+
+    async def send(message) :
+        nonlocal status
+        if message["type"] == "http.response.start" :
+            status = message["status"]
+        elif message["type"] == "http.response.body" :
+            chunks.append(message.get("body", b""))
+
+    await application(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+def multipartBody(field : str , filename : str , content : bytes , boundary : str = "benchBoundary") -> tuple :
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{field}\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"content-type" : f"multipart/form-data; boundary={boundary}", "content-length" : str(len(body))}
+
+
+def gitCommit() -> str :
+    try :
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr = subprocess.DEVNULL).decode().strip()
+    except Exception :
+        return "unknown"
+
+
+def run(sizes = SIZES , languages = LANGUAGES , repeat : int = 0 , numCards : int = 10 ,
+        latency : float = 0.0 , e2e : bool = True) -> dict :
+    from models.cardGenerator import CardGenerator
+    from models.geminiClient import GeminiClient
+    from utils import pdfParser
+    from utils.textProcessor import processText
+
+    with open(os.devnull, "w") as devnull , contextlib.redirect_stdout(devnull) :
+        generator = CardGenerator()
+        corpus = build(sizes, languages)
+        if e2e :
+            import app as api
+            api.cardGenerator.client = GeminiClient(
+                FakeModel(latency = latency, sigma = 0, chunkDelay = 0), maxConcurrency = 64
+            )
+            api.cardGenerator.use_ai = True
+
+    loop = asyncio.new_event_loop()
+    results = []
+
+    def add(stage : str , item : dict , stats : Dict[str, float] , inputChars : int) :
+        stats.update({
+            "stage" : stage,
+            "case" : item["name"],
+            "language" : item["language"],
+            "pages" : item["pages"],
+            "inputChars" : inputChars,
+            "charsPerSecond" : inputChars / stats["p50"] if stats["p50"] else 0.0,
+            "pagesPerSecond" : item["pages"] / stats["p50"] if stats["p50"] else 0.0,
+        })
+        results.append(stats)
+        print(f"⏱️ {stage:<16} {item['name']:<8} p50 {stats['p50'] * 1000:9.2f} мс  "
+              f"p95 {stats['p95'] * 1000:9.2f} мс  пик {stats['peakMemoryBytes'] / 1024 / 1024:7.1f} МБ")
+
+    try :
+        for item in corpus :
+            # меньше повторов для больших документов, чтобы прогон занимал минуты, а не часы
+            runs = repeat or max(3, min(30, 300 // item["pages"]))
+            text = item["text"]
+            processed = processText(text)
+            response = fakeCompletion(generator.createPrompt(processed, 50))
+
+            with open(os.devnull, "w") as devnull , contextlib.redirect_stdout(devnull) :
+                clearPageRange = pdfParser._PAGE_RANGE_CACHE.clear
+                measurements = [
+                    ("parse_pdf", lambda : pdfParser.parse_pdf(item["pdf"]), clearPageRange, len(item["pdf"])),
+                    ("parse_pdf_stop", lambda : pdfParser.parse_pdf(item["pdf"], numCards * 3000), clearPageRange, len(item["pdf"])),
+                    ("process_text", lambda : processText(text), None, len(text)),
+                    ("generate_simple", lambda : generator.generateSimple(processed, numCards), None, len(processed)),
+                    ("ai_response", lambda : generator.aiResponse(response), None, len(response)),
+                ]
+                if e2e :
+                    textBody = json.dumps({"text" : text, "numCards" : numCards}).encode()
+                    pdfBody, pdfHeaders = multipartBody("file", item["name"] + ".pdf", item["pdf"])
+
+                    def clearApiCaches() :
+                        api.cardGenerator.cache.clear()
+                        api.parsePool.cache.clear()
+
+                    def call(*args , **kwargs) :
+                        status, _ = loop.run_until_complete(asgiRequest(api.app, *args, **kwargs))
+                        if status != 200 :
+                            raise RuntimeError(f"{args[1]} вернул {status}")
+
+                    measurements += [
+                        ("e2e_text", lambda : call("POST", "/generate/text", textBody, {"content-type" : "application/json"}),
+                         clearApiCaches, len(text)),
+                        ("e2e_pdf", lambda : call("POST", "/generate/pdf", pdfBody, pdfHeaders, f"numCards={numCards}"),
+                         clearApiCaches, len(item["pdf"])),
+                    ]
+                stats = [(stage, measure(fn, runs, setup), size) for stage, fn, setup, size in measurements]
+            for stage, stat, size in stats :
+                add(stage, item, stat, size)
+    finally :
+        if e2e :
+            api.parsePool.shutdown()
+        loop.close()
+
+    return {
+        "meta" : {
+            "commit" : gitCommit(),
+            "python" : sys.version.split()[0],
+            "platform" : platform.platform(),
+            "cpus" : os.cpu_count(),
+            "timestamp" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "numCards" : numCards,
+            "geminiLatency" : latency,
+        },
+        "results" : results,
+    }
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = "Бенчмарк конвейера генерации карточек")
+    parser.add_argument("--sizes", default = ",".join(map(str, SIZES)), help = "размеры документов в страницах")
+    parser.add_argument("--languages", default = ",".join(LANGUAGES))
+    parser.add_argument("--repeat", type = int, default = 0, help = "повторов на этап (0 — по размеру документа)")
+    parser.add_argument("--num-cards", type = int, default = 10)
+    parser.add_argument("--latency", type = float, default = 0.0, help = "задержка заглушки Gemini, с")
+    parser.add_argument("--no-e2e", action = "store_true", help = "без сквозных вызовов API")
+    parser.add_argument("--out", default = None, help = "JSON с результатами (по умолчанию benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    report = run(
+        sizes = [int(s) for s in args.sizes.split(",") if s],
+        languages = [l for l in args.languages.split(",") if l],
+        repeat = args.repeat,
+        numCards = args.num_cards,
+        latency = args.latency,
+        e2e = not args.no_e2e,
+    )
+    out = args.out or os.path.join("benchmarks", "results", f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok = True)
+    with open(out, "w", encoding = "utf-8") as f :
+        json.dump(report, f, ensure_ascii = False, indent = 2)
+    print(f"💾 Результаты сохранены в {out}")
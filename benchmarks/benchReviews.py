@@ -0,0 +1,66 @@
+"""
+Нагрузочный бенчмарк расписания повторений: сотни тысяч карточек у одного пользователя.
+Замеряет выборку «что повторить» и запись ответа — обе должны идти по индексу (userId, due), без скана истории.
+
+    python -m benchmarks.benchReviews --cards 300000 --users 3
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.benchPipeline import measure
+from models.card import Card
+from utils.decks import DeckStore
+from utils.reviews import DAY, ReviewStore
+
+
+def populate(store : ReviewStore , decks : DeckStore , users : int , cards : int , seed : int = 0) -> list :
+    rnd = random.Random(seed)
+    now = time.time()
+    # выборка «что повторить» соединяется с таблицей карточек — колода нужна настоящая
+    deck = decks.save([Card(f"q{i}", f"a{i}") for i in range(cards)], "bench")
+    cardIds = decks.cardIds(deck["id"])
+    for user in range(users) :
+        userId = f"user{user}"
+        store.enroll(userId, cardIds, now)
+        # разносим сроки: примерно десятая часть карточек уже просрочена, остальные — в ближайший год
+        with store._db :
+            store._db.executemany(
+                "UPDATE schedule SET due = ?, reps = 2, interval = 6 WHERE userId = ? AND cardId = ?",
+                ((now + rnd.uniform(-0.1, 0.9) * 365 * DAY, userId, cardId) for cardId in cardIds)
+            )
+    return cardIds
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = "Бенчмарк выборки карточек к повторению")
+    parser.add_argument("--cards", type = int, default = 300000, help = "карточек у каждого пользователя")
+    parser.add_argument("--users", type = int, default = 3)
+    parser.add_argument("--repeat", type = int, default = 200)
+    parser.add_argument("--limit", type = int, default = 20, help = "карточек в одной выборке")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory :
+        path = os.path.join(directory, "reviews.db")
+        decks , store = DeckStore(path), ReviewStore(path)
+        started = time.perf_counter()
+        cardIds = populate(store, decks, args.users, args.cards)
+        print(f"📦 {args.users} × {args.cards} карточек за {time.perf_counter() - started:.1f} с")
+
+        plan = store._db.execute(
+            "EXPLAIN QUERY PLAN SELECT s.* FROM schedule s JOIN cards c ON c.id = s.cardId "
+            "WHERE s.userId = ? AND s.due <= ? ORDER BY s.due LIMIT ?",
+            ("user0", time.time(), args.limit)
+        ).fetchall()
+        print(f"🔎 {' / '.join(row[-1] for row in plan)}")
+
+        rnd = random.Random(1)
+        results = {
+            "due" : measure(lambda : store.due("user0", args.limit), args.repeat),
+            "review" : measure(lambda : store.review("user0", rnd.choice(cardIds), rnd.randint(0, 5)), args.repeat),
+            "due_after_reviews" : measure(lambda : store.due("user0", args.limit), args.repeat),
+        }
+        for name, stats in results.items() :
+            print(f"📊 {name:<18} p50 {stats['p50'] * 1000:7.3f}  p95 {stats['p95'] * 1000:7.3f}  p99 {stats['p99'] * 1000:7.3f} мс")
@@ -0,0 +1,93 @@
+"""
+Холодный старт API: время импорта app (в отдельном процессе) и время от запуска uvicorn до первого ответа /health.
+Дополнительно показывает, какие тяжёлые зависимости оказались загружены сразу после импорта.
+
+    python -m benchmarks.benchStartup --runs 5
+    GEMINI_API_KEY=fake WARMUP_ON_START=1 python -m benchmarks.benchStartup --runs 5 --out benchmarks/results/startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.benchPipeline import percentile
+
+HEAVY_MODULES = ('google.generativeai', 'grpc', 'PyPDF2', 'pdfplumber', 'pdfminer')
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds" : elapsed, "loaded" : [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def freePort() -> int :
+    with socket.socket() as s :
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def importTime(env : dict) -> dict :
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], env = env, capture_output = True, text = True, check = True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def healthTime(env : dict , timeout : float = 30) -> float :
+    port = freePort()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        env = env, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL
+    )
+    try :
+        while time.perf_counter() - started < timeout :
+            try :
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout = 1) as response :
+                    if response.status == 200 :
+                        return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError) :
+                time.sleep(0.005)
+        raise TimeoutError("/health не ответил")
+    finally :
+        server.terminate()
+        server.wait()
+
+
+def summary(samples : list) -> dict :
+    return {"p50" : percentile(samples, 50), "max" : max(samples), "min" : min(samples), "runs" : len(samples)}
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = "Бенчмарк холодного старта API")
+    parser.add_argument("--runs", type = int, default = 5)
+    parser.add_argument("--out", default = None, help = "сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory :
+        # базы колод и повторений — во временной папке, чтобы не создавать файлы в рабочей
+        pythonPath = os.pathsep.join(filter(None, (os.getcwd(), os.getenv("PYTHONPATH"))))
+        env = dict(os.environ, DECKS_DB = os.path.join(directory, "decks.db"), PYTHONPATH = pythonPath)
+        imports = [importTime(env) for _ in range(args.runs)]
+        health = [healthTime(env) for _ in range(args.runs)]
+
+    report = {
+        "import" : summary([run["seconds"] for run in imports]),
+        "health" : summary(health),
+        "loadedAtImport" : sorted({m for run in imports for m in run["loaded"]}),
+    }
+    print(f"📦 import app    p50 {report['import']['p50'] * 1000:7.0f} мс  max {report['import']['max'] * 1000:7.0f} мс")
+    print(f"🩺 первый /health p50 {report['health']['p50'] * 1000:7.0f} мс  max {report['health']['max'] * 1000:7.0f} мс")
+    print(f"🐘 загружено при импорте: {', '.join(report['loadedAtImport']) or 'ничего тяжёлого'}")
+    if args.out :
+        with open(args.out, "w", encoding = "utf-8") as f :
+            json.dump(report, f, ensure_ascii = False, indent = 2)
@@ -0,0 +1,55 @@
+"""
+Сравнение двух прогонов benchPipeline. Код возврата 1, если какой-то этап замедлился больше порога.
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json --threshold 0.1
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+
+def load(path : str) -> Tuple[dict, Dict[Tuple[str, str], dict]] :
+    with open(path, encoding = "utf-8") as f :
+        report = json.load(f)
+    return report["meta"], {(r["stage"], r["case"]) : r for r in report["results"]}
+
+
+def compare(old : Dict[tuple, dict] , new : Dict[tuple, dict] , threshold : float , metric : str = "p50") -> List[dict] :
+    rows = []
+    for key in sorted(old.keys() & new.keys()) :
+        before, after = old[key][metric], new[key][metric]
+        change = (after - before) / before if before else 0.0
+        rows.append({
+            "stage" : key[0],
+            "case" : key[1],
+            "before" : before,
+            "after" : after,
+            "change" : change,
+            "memoryBefore" : old[key]["peakMemoryBytes"],
+            "memoryAfter" : new[key]["peakMemoryBytes"],
+            "regression" : change > threshold,
+        })
+    return rows
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = "Сравнение результатов бенчмарка")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type = float, default = 0.1, help = "допустимое замедление, доля")
+    parser.add_argument("--metric", default = "p50", choices = ("p50", "p95", "p99", "mean", "min"))
+    args = parser.parse_args()
+
+    oldMeta, old = load(args.old)
+    newMeta, new = load(args.new)
+    print(f"{oldMeta['commit']} -> {newMeta['commit']} ({args.metric})")
+    rows = compare(old, new, args.threshold, args.metric)
+    for row in rows :
+        mark = "🔴" if row["regression"] else ("🟢" if row["change"] < -args.threshold else "  ")
+        print(f"{mark} {row['stage']:<16} {row['case']:<8} {row['before'] * 1000:9.2f} -> {row['after'] * 1000:9.2f} мс "
+              f"{row['change'] * 100:+6.1f}%  память {row['memoryBefore'] / 1024 / 1024:6.1f} -> {row['memoryAfter'] / 1024 / 1024:6.1f} МБ")
+    missing = old.keys() ^ new.keys()
+    if missing :
+        print(f"⚠️ Есть только в одном из прогонов: {', '.join(f'{s}/{c}' for s, c in sorted(missing))}")
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
@@ -0,0 +1,186 @@
+"""
+Синтетический корпус для бенчмарков: тексты и PDF на русском и английском от 1 до 500 страниц.
+Генерация детерминирована (seed), поэтому результаты разных коммитов сравнимы.
+"""
+import random
+from typing import Dict, List
+
+WORDS = {
+    'ru' : ("клетка мембрана энергия процесс структура функция молекула система белок фермент "
+            "реакция организм ткань ядро хромосома синтез обмен веществ растение свет кислород "
+            "углерод вода раствор концентрация температура давление скорость равновесие закон "
+            "теория модель эксперимент наблюдение результат анализ метод исследование развитие "
+            "эволюция популяция среда сигнал рецептор транспорт деление рост регуляция").split(),
+    'en' : ("cell membrane energy process structure function molecule system protein enzyme "
+            "reaction organism tissue nucleus chromosome synthesis metabolism plant light oxygen "
+            "carbon water solution concentration temperature pressure velocity equilibrium law "
+            "theory model experiment observation result analysis method research development "
+            "evolution population environment signal receptor transport division growth regulation").split(),
+}
+CONNECTORS = {
+    'ru' : "и в на с по для при через между после".split(),
+    'en' : "and in on with by for during through between after".split(),
+}
+FRONT_MATTER = {
+    'ru' : ["Учебное пособие\n\nИздательство «Наука»\n\nМосква 2020",
+            "Все права защищены © 2020\n\nISBN 978-5-02-000000-0\n\nПод редакцией И. И. Иванова",
+            "Содержание\n\nГлава 1 .......... 3\n\nГлава 2 .......... 17\n\nГлава 3 .......... 31"],
+    'en' : ["Textbook\n\nScience Press\n\nNew York 2020",
+            "Copyright © 2020. All rights reserved\n\nISBN 978-0-00-000000-0\n\nEditor: J. Smith",
+            "Table of Contents\n\nChapter 1 .......... 3\n\nChapter 2 .......... 17\n\nChapter 3 .......... 31"],
+}
+CHAPTER = {'ru' : "Глава {}", 'en' : "Chapter {}"}
+PAGE_FOOTER = {'ru' : "Страница {}", 'en' : "Page {}"}
+INTRODUCTION = {'ru' : "Введение", 'en' : "Introduction"}
+
+SIZES = (1, 10, 100, 500)
+LANGUAGES = ('ru', 'en')
+
+
+def _sentence(rng : random.Random , language : str) -> str :
+    words = WORDS[language]
+    parts = []
+    for i in range(rng.randint(8, 20)) :
+        parts.append(rng.choice(words))
+        if i % 4 == 3 :
+            parts.append(rng.choice(CONNECTORS[language]))
+    if rng.random() < 0.2 :
+        parts.insert(rng.randint(1, len(parts) - 1), rng.choice(words).capitalize())
+    sentence = " ".join(parts)
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def _paragraph(rng : random.Random , language : str) -> str :
+    return " ".join(_sentence(rng, language) for _ in range(rng.randint(3, 6)))
+
+
+def makePages(pages : int , language : str = 'ru' , seed : int = 0 , charsPerPage : int = 2500) -> List[str] :
+    """
+    Страницы книги: у документов от 10 страниц — титул, копирайт и оглавление, у всех — главы и колонтитулы
+    """
+    rng = random.Random(f"{seed}-{language}-{pages}")
+    result = []
+    frontMatter = FRONT_MATTER[language] if pages >= 10 else []
+    result.extend(frontMatter[:pages])
+
+    chapter = 0
+    for pageNum in range(len(result), pages) :
+        blocks = []
+        if pageNum == len(frontMatter) :
+            blocks.append(INTRODUCTION[language])
+        elif rng.random() < 0.1 :
+            chapter += 1
+            blocks.append(CHAPTER[language].format(chapter))
+        size = 0
+        while size < charsPerPage :
+            paragraph = _paragraph(rng, language)
+            blocks.append(paragraph)
+            size += len(paragraph)
+        blocks.append(PAGE_FOOTER[language].format(pageNum + 1))
+        result.append("\n\n".join(blocks))
+    return result
+
+
+def makeText(pages : int , language : str = 'ru' , seed : int = 0) -> str :
+    return "\n\n".join(makePages(pages, language, seed))
+
+
+# Cyrillic в cp1251 -> имена глифов Adobe (afii), чтобы обойтись стандартным шрифтом Helvetica без встраивания
+_UPPER = [10017 + i for i in range(6)] + [10024 + i for i in range(26)]
+_LOWER = [10065 + i for i in range(6)] + [10072 + i for i in range(26)]
+DIFFERENCES = (
+    "168 /afii10023 184 /afii10071 192 "
+    + " ".join(f"/afii{code}" for code in _UPPER + _LOWER)
+)
+
+
+def _escape(line : bytes) -> bytes :
+    return line.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _wrap(paragraph : str , width : int = 95) -> List[str] :
+    lines = []
+    current = ""
+    for word in paragraph.split() :
+        if current and len(current) + 1 + len(word) > width :
+            lines.append(current)
+            current = word
+        else :
+            current = f"{current} {word}" if current else word
+    if current :
+        lines.append(current)
+    return lines
+
+
+def _pageStream(text : str) -> bytes :
+    out = [b"BT /F1 9 Tf 11 TL 40 810 Td"]
+    for paragraph in text.split("\n\n") :
+        for line in _wrap(paragraph) :
+            out.append(b"(" + _escape(line.encode('cp1251', errors = 'replace')) + b") Tj T*")
+        out.append(b"( ) Tj T*")
+    out.append(b"ET")
+    return b"\n".join(out)
+
+
+def makePdf(pages : List[str]) -> bytes :
+    """
+    Минимальный PDF 1.4: по потоку текста на страницу, шрифт Helvetica с WinAnsi + /Differences для кириллицы
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        ("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding "
+         f"<< /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [{DIFFERENCES}] >> >>").encode('ascii'),
+    ]
+    pageRefs = []
+    for text in pages :
+        stream = _pageStream(text)
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        contentRef = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % contentRef
+        )
+        pageRefs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in pageRefs)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(pageRefs)} >>".encode('ascii')
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start = 1) :
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets :
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def build(sizes = SIZES , languages = LANGUAGES , seed : int = 0) -> List[Dict] :
+    corpus = []
+    for language in languages :
+        for pages in sizes :
+            pageTexts = makePages(pages, language, seed)
+            corpus.append({
+                "name" : f"{language}-{pages}p",
+                "language" : language,
+                "pages" : pages,
+                "text" : "\n\n".join(pageTexts),
+                "pdf" : makePdf(pageTexts),
+            })
+    return corpus
+
+
+if __name__ == "__main__" :
+    import os
+    import sys
+    target = sys.argv[1] if len(sys.argv) > 1 else "benchmarks/corpus"
+    os.makedirs(target, exist_ok = True)
+    for item in build() :
+        with open(os.path.join(target, item["name"] + ".pdf"), "wb") as f :
+            f.write(item["pdf"])
+        with open(os.path.join(target, item["name"] + ".txt"), "w", encoding = "utf-8") as f :
+            f.write(item["text"])
+        print(f"📄 {item['name']}: {len(item['pdf']) // 1024} КБ PDF, {len(item['text'])} символов")
@@ -0,0 +1,24 @@
+"""
+Запуск в несколько процессов: gunicorn -c gunicorn.conf.py app:app
+Кэш, лимит Gemini, задачи и single-flight воркеры делят через SQLite SHARED_STATE_DB
+"""
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# генерация длинного документа может идти дольше стандартных 30 с
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "180"))
+graceful_timeout = 30
+keepalive = 5
+
+# переменные окружения мастера наследуют все воркеры
+os.environ.setdefault("SHARED_STATE_DB", "shared.db")
+# у каждого воркера свой пул парсинга PDF: ядра делятся между воркерами, а не умножаются
+os.environ.setdefault("PDF_PARSE_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+
+
+def on_starting(server) :
+    # файл и режим WAL создаёт мастер до запуска воркеров, чтобы они не спорили за смену режима журнала
+    from utils.sharedState import SharedState
+    SharedState(os.environ["SHARED_STATE_DB"])
@@ -0,0 +1,57 @@
+import hashlib
+from dataclasses import dataclass, fields
+from typing import Dict, Iterable, List, Optional, Union
+
+
+@dataclass(slots = True)
+class Card :
+    """
+    Карточка внутри конвейера. orjson сериализует её напрямую, без промежуточного dict и pydantic.
+    start/end — смещения источника карточки в обработанном тексте документа (-1, если неизвестно)
+    """
+    question : str
+    answer : str
+    type : str = "ai"
+    difficulty : Optional[str] = None
+    start : int = -1
+    end : int = -1
+
+    def locate(self , base : int , length : int) :
+        # смещения внутри куска переводятся в смещения документа; без своих — карточка относится ко всему куску
+        if self.start < 0 :
+            self.start , self.end = base , base + length
+        else :
+            self.start += base
+            self.end += base
+
+    @classmethod
+    def fromDict(cls , data : Dict) -> "Card" :
+        return cls(**{name : data[name] for name in CARD_FIELDS if name in data})
+
+    @classmethod
+    def fromList(cls , items : Iterable[Dict]) -> List["Card"] :
+        return [cls.fromDict(item) for item in items]
+
+
+CARD_FIELDS = tuple(f.name for f in fields(Card))
+
+
+@dataclass(slots = True)
+class Document :
+    """
+    Обработанный текст документа и хэш исходника: хэш считается один раз и служит ключом кэша,
+    single-flight и поиска сохранённых колод, вместо повторного хэширования полного текста
+    """
+    text : str
+    hash : str
+    kind : str = "text"
+    pages : int = 0
+    filename : Optional[str] = None
+
+    @classmethod
+    def fromText(cls , text : str , kind : str = "text") -> "Document" :
+        return cls(text, hashlib.sha256(text.encode('utf-8')).hexdigest(), kind)
+
+
+def asDocument(source : Union[str, Document]) -> Document :
+    return source if isinstance(source, Document) else Document.fromText(source)
@@ -1,62 +1,449 @@
 import os
-from typing import List, Dict
-import google.generativeai as genai
+from typing import List, Dict, Tuple, Union
 from dotenv import load_dotenv
+import asyncio
+import contextlib
 import re
-import os
 import ssl
 import certifi
 
+from models.card import Card, Document, asDocument
+from models.fakeLlm import FakeModel
+from models.geminiClient import GeminiClient, LazyGeminiModel
+from utils import metrics
+from utils.cache import ResultCache, hashKey
+from utils.dedup import CardDeduplicator
+from utils.keywords import KeywordIndex
+from utils.textProcessor import chunkText
+
 os.environ['SSL_CERT_FILE'] = certifi.where()
 os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
 
 load_dotenv()
 
+BATCH_SECTION_PATTERN = re.compile(r'###\s*ДОКУМЕНТ\s*(\d+)', re.IGNORECASE)
+CARD_PATTERN = re.compile(r'Q:\s*(.*?)\s*A:\s*(.*?)(?=Q:|$)', re.DOTALL | re.IGNORECASE)
+SENTENCE_PATTERN = re.compile(r'[^.!?]+')
+COMPLETE_CARD_PATTERN = re.compile(r'Q:\s*(.*?)\s*A:\s*(.*?)(?=Q:)', re.DOTALL | re.IGNORECASE)
+
+GENERATION_CONFIG = {
+    'temperature' : 0.7 , 
+    'top_p' : 0.8 , 
+    'top_k' : 40 , 
+    'max_output_tokens' : 2048,
+}
+
+def _toCard(question : str , answer : str) -> Card :
+    q = question.strip()
+    a = answer.strip()
+
+    if q and a and len(q) > 5 and len(a) > 10 :
+        return Card(q , a)
+    return None
+
+class CardStreamParser :
+    """
+    Инкрементальный разбор ответа в формате Q:/A:. Карточка считается готовой, когда начинается следующая
+    """
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self , chunk : str) -> List[Card] :
+        self.buffer += chunk
+        cards = []
+        consumed = 0
+        for match in COMPLETE_CARD_PATTERN.finditer(self.buffer) :
+            consumed = match.end()
+            card = _toCard(*match.groups())
+            if card :
+                cards.append(card)
+        if consumed :
+            self.buffer = self.buffer[consumed:]
+        return cards
+
+    def close(self) -> List[Card] :
+        cards = [card for card in (_toCard(q , a) for q , a in CARD_PATTERN.findall(self.buffer)) if card]
+        self.buffer = ""
+        return cards
+
 class CardGenerator : 
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY")
         
-        if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
+        endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        self.client = None
+        self.backend = os.getenv("LLM_BACKEND", "gemini").lower()
+        
+        if self.backend == "fake":
+            # нагрузочные прогоны без квоты Gemini: тот же GeminiClient, но модель локальная
+            self.model = FakeModel.fromEnv()
+            self.client = GeminiClient.fromEnv(self.model)
+            self.use_ai = True
+            print("🧪 Используется фейковая модель (LLM_BACKEND=fake)")
+        elif self.api_key:
+            self.model = LazyGeminiModel(self.api_key, os.getenv("GEMINI_MODEL", "gemini-pro"), endpoint)
+            self.client = GeminiClient.fromEnv(self.model, useThreads = bool(endpoint))
             self.use_ai = True
             print("✅ Gemini API подключен!")
         else:
             self.use_ai = False
             print("⚠️ Gemini API ключ не найден.")
-    async def generateCards(self,  text : str , numCards : int = 10) -> List[Dict[str,str]]:
+
+        self.cache = ResultCache.fromEnv("cards", "CARDS", decode = Card.fromList)
+        self.chunkSize = int(os.getenv("GENERATION_CHUNK_CHARS", "4000"))
+        self.fanout = int(os.getenv("GENERATION_FANOUT", "4"))
+        self.mergeChars = max(self.chunkSize , int(os.getenv("GENERATION_MERGE_CHARS", str(4 * self.chunkSize))))
+        self.batchMaxCards = int(os.getenv("BATCH_MAX_CARDS_PER_PROMPT", "20"))
+
+    @property
+    def mode(self) -> str :
+        # имя генератора входит в ключ кэша: карточки фейковой модели не выдаются за ответ Gemini, и наоборот
+        return self.backend if self.use_ai else 'simple'
+
+    def warmUp(self) :
+        # модель и клиент Gemini загружаются заранее, чтобы первый запрос не платил за импорт
+        model = getattr(self , "model" , None)
+        if isinstance(model , LazyGeminiModel) :
+            model.load()
+
+    def geminiStats(self) -> Dict[str,float] :
+        if self.client is None :
+            return {"enabled" : False}
+        return self.client.stats()
+
+    async def callGemini(self , prompt : str , generation_config : dict = None) :
+        return await self.client.generate(prompt , generation_config)
+
+    def streamGemini(self , prompt : str , generation_config : dict = None) :
+        return self.client.stream(prompt , generation_config)
+
+    def planChunks(self , text : str , numCards : int) -> List[Tuple[str,int,int]] :
+        """
+        Куски текста, число карточек на каждый и смещение куска в тексте.
+        Если кусков больше, чем карточек, соседние куски склеиваются в numCards групп, и промпты покрывают весь документ.
+        Группа не длиннее mergeChars: у документа длиннее numCards * mergeChars от каждой группы идёт только начало,
+        остальное модель не видит — плата за ограниченное число и размер запросов
+        """
+        if not text.strip() :
+            return []
+        chunks = chunkText(text , self.chunkSize) or [text]
+        if len(chunks) > numCards :
+            groups = []
+            for i in range(numCards) :
+                group = chunks[i * len(chunks) // numCards : (i + 1) * len(chunks) // numCards]
+                merged = group[0]
+                for chunk in group[1:] :
+                    if len(merged) + 2 + len(chunk) > self.mergeChars :
+                        break
+                    merged += "\n\n" + chunk
+                groups.append(merged)
+            chunks = groups
+
+        # по одной карточке на кусок, остаток — пропорционально длине (метод наибольшего остатка)
+        budget = [1] * len(chunks)
+        extra = numCards - len(chunks)
+        if extra > 0 :
+            total = sum(len(c) for c in chunks)
+            shares = [extra * len(c) / total for c in chunks]
+            for i , share in enumerate(shares) :
+                budget[i] += int(share)
+            rest = numCards - sum(budget)
+            for i in sorted(range(len(chunks)) , key = lambda i : shares[i] - int(shares[i]) , reverse = True)[:rest] :
+                budget[i] += 1
+
+        # куски нормализованы (пробелы, склейка абзацев), поэтому начало ищется по первым символам
+        bases = []
+        cursor = 0
+        for chunk in chunks :
+            found = text.find(chunk[:32] , cursor)
+            if found >= 0 :
+                cursor = found
+            bases.append(cursor)
+        return list(zip(chunks , budget , bases))
+
+    def mergeCards(self , results : List[List[Card]] , numCards : int , dedup : CardDeduplicator = None) -> List[Card] :
+        dedup = dedup or CardDeduplicator.fromEnv()
+        cards = []
+        for chunkCards in results :
+            for card in chunkCards :
+                if len(cards) >= numCards :
+                    return cards
+                if dedup.add(card) :
+                    cards.append(card)
+                else :
+                    metrics.event("card_duplicate")
+        return cards
+
+    def locateCards(self , cards : List[Card] , chunk : str , base : int) -> List[Card] :
+        for card in cards :
+            card.locate(base , len(chunk))
+        return cards
+
+    def fillCards(self , cards : List[Card] , text : str , numCards : int , dedup : CardDeduplicator , index : KeywordIndex = None) -> List[Card] :
+        # после удаления дубликатов карточек может не хватить — добираем офлайн-генератором по всему тексту
+        if len(cards) < numCards :
+            cards = cards + list(self.iterSimple(text , numCards - len(cards) , index , dedup))
+        return cards
+
+    async def mapChunks(self , text : str , numCards : int , generateChunk , onChunk = None) -> Tuple[List[Card], bool] :
+        limiter = asyncio.Semaphore(self.fanout)
+        failures = []
+        progress = {"chunksDone" : 0, "cardsReady" : 0}
+
+        async def runChunk(chunk : str , n : int , base : int) :
+            async with limiter :
+                try :
+                    cards = await generateChunk(chunk , n)
+                except Exception as e :
+                    print(f"❌ Ошибка Gemini: {e}")
+                    print("Connecting to simple algorithm...")
+                    metrics.event("simple_fallback")
+                    failures.append(e)
+                    cards = self.generateSimple(chunk , n)
+            self.locateCards(cards , chunk , base)
+            if onChunk :
+                progress["chunksDone"] += 1
+                progress["cardsReady"] += len(cards)
+                onChunk(chunksTotal = len(plan) , **progress)
+            return cards
+
+        plan = self.planChunks(text , numCards)
+        if len(plan) > 1 :
+            print(f"🧩 Текст разбит на {len(plan)} частей")
+        results = await asyncio.gather(*(runChunk(chunk , n , base) for chunk , n , base in plan))
+        dedup = CardDeduplicator.fromEnv()
+        cards = self.fillCards(self.mergeCards(results , numCards , dedup) , text , numCards , dedup)
+        return cards , bool(failures)
+
+    async def streamChunk(self , chunk : str , numCards : int , failures : list) :
+        produced = 0
         if self.use_ai :
-            return await self.withGemini(text , numCards)
+            try :
+                parser = CardStreamParser()
+                with metrics.span("prompt_build") :
+                    prompt = self.createPrompt(chunk , numCards)
+                async with contextlib.aclosing(self.streamGemini(prompt , GENERATION_CONFIG)) as chunks :
+                    async for part in chunks :
+                        for card in parser.feed(part) :
+                            produced += 1
+                            yield card
+                        if produced >= numCards :
+                            return
+                for card in parser.close()[:numCards - produced] :
+                    produced += 1
+                    yield card
+                return
+            except Exception as e :
+                print(f"❌ Ошибка Gemini: {e}")
+                print("Connecting to simple algorithm...")
+                metrics.event("simple_fallback")
+                failures.append(e)
+        for card in self.iterSimple(chunk , numCards - produced) :
+            yield card
+
+    async def streamCards(self , document : Union[str, Document] , numCards : int = 10) :
+        document = asDocument(document)
+        text = document.text
+        key = hashKey(self.mode , numCards , document.hash)
+        cached = await self.cache.getAsync(key)
+        if cached is not None :
+            metrics.event("cards_cache_hit")
+            for card in cached :
+                yield card
+            return
+
+        queue = asyncio.Queue()
+        limiter = asyncio.Semaphore(self.fanout)
+        failures = []
+
+        async def produce(chunk : str , n : int , base : int) :
+            async with limiter :
+                async with contextlib.aclosing(self.streamChunk(chunk , n , failures)) as cards :
+                    async for card in cards :
+                        card.locate(base , len(chunk))
+                        await queue.put(card)
+
+        async def produceAll() :
+            try :
+                await asyncio.gather(*(produce(chunk , n , base) for chunk , n , base in self.planChunks(text , numCards)))
+            finally :
+                await queue.put(None)
+
+        producer = asyncio.create_task(produceAll())
+        cards = []
+        dedup = CardDeduplicator.fromEnv()
+        try :
+            while len(cards) < numCards :
+                card = await queue.get()
+                if card is None :
+                    break
+                if not dedup.add(card) :
+                    metrics.event("card_duplicate")
+                    continue
+                cards.append(card)
+                yield card
+        finally :
+            # клиент мог отключиться: поток Gemini закрывается до выхода из генератора, а не когда-нибудь потом
+            producer.cancel()
+            with contextlib.suppress(asyncio.CancelledError) :
+                await producer
+        for card in self.fillCards([] , text , numCards - len(cards) , dedup) :
+            cards.append(card)
+            yield card
+
+        if cards and not failures :
+            await self.cache.setAsync(key , cards)
+    async def generateCards(self,  document : Union[str, Document] , numCards : int = 10 , onChunk = None) -> List[Card]:
+        document = asDocument(document)
+        text = document.text
+        key = hashKey(self.mode , numCards , document.hash)
+        cached = await self.cache.getAsync(key)
+        if cached is not None :
+            print(f"♻️ Карточки взяты из кэша")
+            metrics.event("cards_cache_hit")
+            return cached
+
+        if self.use_ai :
+            cards , failed = await self.mapChunks(text , numCards , self.geminiCards , onChunk)
+            if failed :
+                # результат запасного генератора не кэшируем под ключом модели
+                return cards
         else : 
-            return self.generateSimple(text , numCards)
-    async def withGemini(self , text : str , numCards : int) -> List[Dict[str,str]]:
-        try : 
+            with metrics.span("simple_generate") :
+                plan = self.planChunks(text , numCards)
+                index = KeywordIndex(self.splitIntoSentences(text))
+                dedup = CardDeduplicator.fromEnv()
+                results = []
+                for chunk , n , base in plan :
+                    results.append(self.locateCards(self.generateSimple(chunk , n , index) , chunk , base))
+                    if onChunk :
+                        onChunk(chunksTotal = len(plan) , chunksDone = len(results) , cardsReady = sum(map(len , results)))
+                cards = self.fillCards(self.mergeCards(results , numCards , dedup) , text , numCards , dedup , index)
+
+        if cards :
+            await self.cache.setAsync(key , cards)
+        return cards
+    async def withGemini(self , text : str , numCards : int) -> List[Card]:
+        cards , _ = await self.mapChunks(text , numCards , self.geminiCards)
+        return cards
+    async def geminiCards(self , text : str , numCards : int) -> List[Card]:
+        with metrics.span("prompt_build") :
             prompt = self.createPrompt(text , numCards)
-            print(f"🔄 Отправляю запрос в Gemini...")
-            response = self.model.generate_content(
-                prompt , 
-                generation_config= {
-                    'temperature' : 0.7 , 
-                    'top_p' : 0.8 , 
-                    'top_k' : 40 , 
-                    'max_output_tokens' : 2048,
-                }
-            )
-            print(f"✅ Получен ответ от Gemini")
-            content = response.text
+        print(f"🔄 Отправляю запрос в Gemini...")
+        response = await self.callGemini(prompt , generation_config = GENERATION_CONFIG)
+        print(f"✅ Получен ответ от Gemini")
+        content = response.text
+        with metrics.span("response_parse") :
             cards = self.aiResponse(content)
-            print(f"📝 Сгенерировано {len(cards)} карточек") 
-            return cards[:numCards]
-        except Exception as e : 
-            print(f"❌ Ошибка Gemini: {e}")
-            print("Connecting to simple algorithm...")
-            return self.generateSimple(text,numCards)
+        print(f"📝 Сгенерировано {len(cards)} карточек") 
+        return cards[:numCards]
+    def packBatch(self , texts : List[str] , numCards : int) -> List[List[int]] :
+        groups = []
+        current = []
+        size = 0
+        for i , text in enumerate(texts) :
+            if len(text) > self.chunkSize // 2 :
+                continue
+            if current and (size + len(text) > self.chunkSize or (len(current) + 1) * numCards > self.batchMaxCards) :
+                groups.append(current)
+                current , size = [] , 0
+            current.append(i)
+            size += len(text)
+        if current :
+            groups.append(current)
+        return groups
+
+    async def generateBatch(self , documents : List[Union[str, Document]] , numCards : int = 10) -> List[object] :
+        """
+        Возвращает для каждого документа список карточек или исключение
+        """
+        documents = [asDocument(d) for d in documents]
+        texts = [d.text for d in documents]
+        results = [None] * len(texts)
+        pending = []
+        for i , document in enumerate(documents) :
+            cached = await self.cache.getAsync(hashKey(self.mode , numCards , document.hash))
+            if cached is not None :
+                results[i] = cached
+            else :
+                pending.append(i)
+
+        # маленькие тексты упаковываем в общий промпт, остальные идут обычным путём
+        groups = self.packBatch([texts[i] for i in pending] , numCards) if self.use_ai else []
+        grouped = {pending[j] for group in groups for j in group if len(group) > 1}
+
+        async def runGroup(indices : List[int]) :
+            try :
+                sections = await self.batchCards([texts[i] for i in indices] , numCards)
+            except Exception as e :
+                print(f"❌ Ошибка Gemini в пакете: {e}")
+                sections = [[] for _ in indices]
+            for i , cards in zip(indices , sections) :
+                if cards :
+                    self.locateCards(cards , texts[i] , 0)
+                    await self.cache.setAsync(hashKey(self.mode , numCards , documents[i].hash) , cards)
+                    results[i] = cards
+                else :
+                    await runSingle(i)
+
+        async def runSingle(i : int) :
+            try :
+                results[i] = await self.generateCards(documents[i] , numCards)
+            except Exception as e :
+                results[i] = e
+
+        await asyncio.gather(
+            *(runGroup([pending[j] for j in group]) for group in groups if len(group) > 1),
+            *(runSingle(i) for i in pending if i not in grouped)
+        )
+        return results
+
+    async def batchCards(self , texts : List[str] , numCards : int) -> List[List[Card]] :
+        print(f"🔄 Отправляю пакет из {len(texts)} текстов в Gemini...")
+        with metrics.span("prompt_build") :
+            prompt = self.createBatchPrompt(texts , numCards)
+        response = await self.callGemini(prompt , generation_config = GENERATION_CONFIG)
+        sections = {}
+        parts = BATCH_SECTION_PATTERN.split(response.text)
+        for number , content in zip(parts[1::2] , parts[2::2]) :
+            sections[int(number)] = self.mergeCards([self.aiResponse(content)] , numCards)
+        return [sections.get(i + 1 , []) for i in range(len(texts))]
+
+    def createBatchPrompt(self , texts : List[str] , numCards : int) -> str :
+        documents = "\n\n".join(
+            f"=== ДОКУМЕНТ {i + 1} ===\n{text}" for i , text in enumerate(texts)
+        )
+        return f"""Ты эксперт по созданию образовательных флэшкарт. 
+
+Ниже {len(texts)} независимых текстов. Для КАЖДОГО текста создай {numCards} флэшкарт только по его содержанию.
+
+{documents}
+
+ТРЕБОВАНИЯ:
+1. Каждая карточка должна иметь четкий ВОПРОС и полный ОТВЕТ
+2. Вопросы должны проверять понимание ключевых концепций
+3. Ответы должны быть краткими (2-4 предложения) но исчерпывающими
+
+ФОРМАТ ОТВЕТА (строго соблюдай):
+### ДОКУМЕНТ 1
+Q: [вопрос 1]
+A: [ответ 1]
+
+Q: [вопрос 2]
+A: [ответ 2]
+
+### ДОКУМЕНТ 2
+Q: [вопрос 1]
+A: [ответ 1]
+
+И так далее для всех документов.
+Не добавляй никаких дополнительных комментариев или текста - только заголовки документов, вопросы и ответы в указанном формате."""
     def createPrompt(self , text : str , numCards : int) -> str : 
         return f"""Ты эксперт по созданию образовательных флэшкарт. 
 
 На основе следующего текста создай {numCards} флэшкарт для эффективного обучения.
 ТЕКСТ:
-{text[:4000]}
+{text[:self.mergeChars]}
 
 ТРЕБОВАНИЯ:
 1. Каждая карточка должна иметь четкий ВОПРОС и полный ОТВЕТ
@@ -81,113 +468,86 @@ A: [ответ 3]
 
 И так далее для всех {numCards} карточек.
 Не добавляй никаких дополнительных комментариев или текста - только вопросы и ответы в указанном формате."""
-    def aiResponse(self , content : str) -> List[Dict[str,str]] : 
+    def aiResponse(self , content : str) -> List[Card] : 
         cards = []
-        pattern = r'Q:\s*(.*?)\s*A:\s*(.*?)(?=Q:|$)'
-        matches = re.findall(pattern , content , re.DOTALL | re.IGNORECASE)
-
-        for question , answer in matches : 
-            q = question.strip()
-            a = answer.strip()
-
-            if q and a and len(q) > 5 and len(a) > 10 :
-                cards.append({
-                    "question" : q,
-                    "answer" : a
-                })
+        for question , answer in CARD_PATTERN.findall(content) : 
+            card = _toCard(question , answer)
+            if card :
+                cards.append(card)
         return cards
-    def generateSimple(self , text : str , numCards : int) -> List[Dict[str,str]] :
-        cards = []
-        sentences = self.splitIntoSentences(text)
-        validSentences = [
-            s for s in sentences
+    def generateSimple(self , text : str , numCards : int , index : KeywordIndex = None) -> List[Card] :
+        return list(self.iterSimple(text , numCards , index))
+    def iterSimple(self , text : str , numCards : int , index : KeywordIndex = None , dedup : CardDeduplicator = None) :
+        count = 0
+        spans = [
+            (start , end , s) for start , end , s in self.sentenceSpans(text)
             if 30 < len(s) < 400 and not s.startswith('http')
         ]
+        if index is None :
+            index = KeywordIndex([s for _ , _ , s in spans])
+        if dedup is None :
+            dedup = CardDeduplicator.fromEnv()
         cardTypes = ['definition', 'fill_blank'] 
+        # если основной тип не подошёл или дал дубликат — пробуем остальные, а не общий вопрос «о чём говорится»
+        replacements = ['explanation', 'summary']
 
-        for i,sentence in enumerate(validSentences[:numCards * 2]):
-            if len(cards) >= numCards : 
+        for i,(start , end , sentence) in enumerate(spans):
+            if count >= numCards : 
                 break
-            cardType = cardTypes[i % len(cardTypes)]
-            card = self.createCard(sentence , cardType , i)
-
-            if card : 
-                cards.append(card)
-        
-        while len(cards) < min(numCards, len(validSentences)) : 
-            idx = len(cards)
-            if idx < len(validSentences) :
-                cards.append({
-                    "question" : f"О чем говорится в следующем утверждении?",
-                    "answer" : validSentences[idx][:200]
-                })
-
-        return cards[:numCards]
-    def createCard(self, sentence: str, card_type: str, index: int) -> Dict[str, str]:
+            keywords = index.keywords(sentence)
+            primary = cardTypes[i % len(cardTypes)]
+            for cardType in [primary] + [t for t in cardTypes if t != primary] + replacements :
+                card = self.createCard(sentence , cardType , i , keywords)
+                if card and dedup.add(card) :
+                    card.start , card.end = start , end
+                    count += 1
+                    yield card
+                    break
+    def createCard(self, sentence: str, card_type: str, index: int, keywords: List[str] = None) -> Card:
         if len(sentence) < 30:
             return None
-        if card_type == 'definition':
+        if keywords is None:
             keywords = self.extractKeywords(sentence)
+        if card_type == 'definition':
             if keywords and len(keywords) > 0:
-                return {
-                    "question": f"Что означает '{keywords[0]}'?",
-                    "answer": sentence
-                }
+                return Card(f"Что означает '{keywords[0]}'?", sentence, card_type)
             return None
         elif card_type == 'explanation':
             words = sentence.split()
             if len(words) > 10:
                 question_part = ' '.join(words[:6])
-                return {
-                    "question": f"Продолжи и объясни: '{question_part}...'",
-                    "answer": sentence
-                }
+                return Card(f"Продолжи и объясни: '{question_part}...'", sentence, card_type)
             return None
         
         elif card_type == 'fill_blank':
-            keywords = self.extractKeywords(sentence)
             if keywords and len(keywords) > 0:
                 keyword = keywords[0]
                 question = sentence.replace(keyword, "______", 1)
-                return {
-                    "question": f"Заполни пропуск: {question}",
-                    "answer": keyword
-                }
+                return Card(f"Заполни пропуск: {question}", keyword, card_type)
             return None
         
         elif card_type == 'summary':
             if len(sentence) > 100:
                 preview = sentence[:70] + "..."
-                return {
-                    "question": f"Перескажи своими словами: '{preview}'",
-                    "answer": sentence
-                }
+                return Card(f"Перескажи своими словами: '{preview}'", sentence, card_type)
             else:
-                return {
-                    "question": f"Объясни: {sentence[:50]}...",
-                    "answer": sentence
-                }
+                return Card(f"Объясни: {sentence[:50]}...", sentence, card_type)
         return None
     def splitIntoSentences(self , text : str) -> List[str] : 
         sentences = re.split(r'[.!?]+', text)
         return [s.strip() for s in sentences if s.strip()]
+    def sentenceSpans(self , text : str) -> List[Tuple[int,int,str]] :
+        # то же деление, что splitIntoSentences, но со смещениями предложений в тексте
+        spans = []
+        for match in SENTENCE_PATTERN.finditer(text) :
+            raw = match.group()
+            sentence = raw.strip()
+            if sentence :
+                start = match.start() + len(raw) - len(raw.lstrip())
+                spans.append((start , start + len(sentence) , sentence))
+        return spans
     def extractKeywords(self , sentence : str) -> List[str] : 
-        stopWords = {
-            'это', 'быть', 'в', 'на', 'с', 'по', 'для', 'от', 'к', 'и',
-            'а', 'но', 'или', 'что', 'как', 'так', 'вот', 'же', 'то',
-            'the', 'is', 'in', 'on', 'at', 'for', 'and', 'or', 'but',
-            'which', 'are', 'was', 'were', 'been', 'be', 'have', 'has'
-        }
-
-        words = sentence.split()
-        keywords = [
-            w.strip('.,;:!?()[]{}')
-            for w in words 
-            if len(w) > 4 
-            and w.lower() not in stopWords
-            and any(c.isupper() for c in w)
-        ]
-        return keywords[:5]
+        return KeywordIndex([sentence]).keywords(sentence)
 
 
 class advancedCardGenerator(CardGenerator) :
@@ -195,13 +555,29 @@ class advancedCardGenerator(CardGenerator) :
         super().__init__()
         self.difficulty_levels = ['easy' , 'medium' , 'hard']
     
-    async def generateDiff(self , text : str , numCards : int = 10 , difficulty : str = 'medium') -> List[Dict[str,str]] :
+    async def generateDiff(self , document : Union[str, Document] , numCards : int = 10 , difficulty : str = 'medium') -> List[Card] :
+        document = asDocument(document)
+        text = document.text
         if not self.use_ai :
             return self.generateSimple(text,numCards)
-        
+
+        key = hashKey(self.mode , difficulty , numCards , document.hash)
+        cached = await self.cache.getAsync(key)
+        if cached is not None :
+            return cached
+
+        cards , failed = await self.mapChunks(
+            text , numCards ,
+            lambda chunk , n : self.diffCards(chunk , n , difficulty)
+        )
+        if cards and not failed :
+            await self.cache.setAsync(key , cards)
+        return cards
+
+    async def diffCards(self , text : str , numCards : int , difficulty : str) -> List[Card] :
         prompt = f"""Создай {numCards} флэшкарт уровня сложности "{difficulty}" из текста:
 
-{text[:4000]}
+{text[:self.mergeChars]}
 
 Уровни сложности:
 - easy: простые вопросы на запоминание фактов
@@ -212,9 +588,8 @@ class advancedCardGenerator(CardGenerator) :
 Q: [вопрос]
 A: [ответ]
 """ 
-        try : 
-            response = self.model.generate_content(prompt)
-            cards = self.aiResponse(response.text)
-            return cards[:numCards]
-        except : 
-            return self.generateSimple(text, numCards)
\ No newline at end of file
+        response = await self.callGemini(prompt)
+        cards = self.aiResponse(response.text)[:numCards]
+        for card in cards :
+            card.difficulty = difficulty
+        return cards
@@ -0,0 +1,155 @@
+import asyncio
+import math
+import os
+import random
+import re
+import time
+from typing import List
+
+NUM_CARDS_PATTERN = re.compile(r'создай (\d+) флэшкарт')
+TEXT_PATTERN = re.compile(r'ТЕКСТ:\s*(.*?)\s*ТРЕБОВАНИЯ:', re.DOTALL)
+DOCUMENT_PATTERN = re.compile(r'=== ДОКУМЕНТ (\d+) ===\s*(.*?)(?==== ДОКУМЕНТ|\s*ТРЕБОВАНИЯ:)', re.DOTALL)
+DIFF_TEXT_PATTERN = re.compile(r'из текста:\s*(.*?)\s*Уровни сложности:', re.DOTALL)
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+
+def _sentences(text : str) -> List[str] :
+    return [s.strip() for s in SENTENCE_PATTERN.split(text) if len(s.strip()) > 20]
+
+
+def fakeCards(text : str , numCards : int) -> str :
+    sentences = _sentences(text) or [text.strip() or "Пустой текст без содержания."]
+    blocks = []
+    for i in range(numCards) :
+        sentence = sentences[i % len(sentences)]
+        words = sentence.split()
+        topic = ' '.join(words[:4]) if words else "текст"
+        blocks.append(f"Q: О чём говорится во фрагменте «{topic}» (карточка {i + 1})?\nA: {sentence}")
+    return "\n\n".join(blocks)
+
+
+def fakeCompletion(prompt : str) -> str :
+    """
+    Ответ в формате Q:/A:, правдоподобный для промптов CardGenerator (обычный, пакетный и по сложности)
+    """
+    match = NUM_CARDS_PATTERN.search(prompt)
+    numCards = int(match.group(1)) if match else 5
+
+    documents = DOCUMENT_PATTERN.findall(prompt)
+    if documents :
+        return "\n\n".join(
+            f"### ДОКУМЕНТ {number}\n{fakeCards(text , numCards)}" for number, text in documents
+        )
+
+    text = TEXT_PATTERN.search(prompt) or DIFF_TEXT_PATTERN.search(prompt)
+    return fakeCards(text.group(1) if text else prompt , numCards)
+
+
+class ResourceExhausted(Exception) :
+    pass
+
+
+class InternalServerError(Exception) :
+    pass
+
+
+class ServiceUnavailable(Exception) :
+    pass
+
+
+# имена классов совпадают с исключениями google.api_core — GeminiClient повторяет их так же, как настоящие
+FAKE_ERRORS = {
+    429 : ResourceExhausted,
+    500 : InternalServerError,
+    503 : ServiceUnavailable,
+}
+
+
+class FakeResponse :
+    def __init__(self , text : str):
+        self.text = text
+
+
+class FakeStream :
+    def __init__(self , model : "FakeModel" , text : str):
+        self.model = model
+        self.text = text
+        self._offset = 0
+
+    def __aiter__(self) :
+        return self
+
+    async def __anext__(self) -> FakeResponse :
+        if self._offset >= len(self.text) :
+            raise StopAsyncIteration
+        await asyncio.sleep(self.model.chunkDelay)
+        chunk = self.text[self._offset:self._offset + self.model.chunkChars]
+        self._offset += self.model.chunkChars
+        return FakeResponse(chunk)
+
+
+class FakeModel :
+    """
+    Локальная замена GenerativeModel (LLM_BACKEND=fake): логнормальная задержка до первого токена,
+    выдача кусками с паузой, доля ошибок 429/5xx
+    """
+    def __init__(self , latency : float = 1.5 , sigma : float = 0.5 , errorRate : float = 0.0 ,
+                 errorCodes : List[int] = (429, 503) , chunkChars : int = 200 , chunkDelay : float = 0.05 ,
+                 seed : int = None , callLog : str = None):
+        self.latency = latency
+        self.sigma = sigma
+        self.errorRate = errorRate
+        self.errorCodes = list(errorCodes)
+        self.chunkChars = max(1, chunkChars)
+        self.chunkDelay = chunkDelay
+        self.random = random.Random(seed)
+        # файл, куда каждый вызов дописывает строку «время pid»: проверка считает вызовы модели по всем воркерам
+        self.callLog = callLog
+
+    @classmethod
+    def fromEnv(cls) -> "FakeModel" :
+        return cls(
+            latency = float(os.getenv("FAKE_LLM_LATENCY", "1.5")),
+            sigma = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5")),
+            errorRate = float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            errorCodes = [int(c) for c in os.getenv("FAKE_LLM_ERROR_CODES", "429,503").split(',') if c],
+            chunkChars = int(os.getenv("FAKE_LLM_CHUNK_CHARS", "200")),
+            chunkDelay = float(os.getenv("FAKE_LLM_CHUNK_DELAY", "0.05")),
+            callLog = os.getenv("FAKE_LLM_CALL_LOG") or None,
+        )
+
+    def _firstTokenDelay(self) -> float :
+        # медиана = latency, длинный хвост как у реального API
+        return self.latency * math.exp(self.random.gauss(0, self.sigma)) if self.latency > 0 else 0.0
+
+    def _logCall(self) :
+        if self.callLog :
+            with open(self.callLog, "a", encoding = "utf-8") as f :
+                f.write(f"{time.time():.6f} {os.getpid()}\n")
+
+    def _maybeFail(self) :
+        if self.errorCodes and self.random.random() < self.errorRate :
+            code = self.random.choice(self.errorCodes)
+            raise FAKE_ERRORS.get(code, InternalServerError)(f"{code} fake error")
+
+    def _totalDelay(self , text : str) -> float :
+        chunks = math.ceil(len(text) / self.chunkChars)
+        return self._firstTokenDelay() + chunks * self.chunkDelay
+
+    async def generate_content_async(self , prompt : str , generation_config : dict = None , stream : bool = False) :
+        self._logCall()
+        text = fakeCompletion(prompt)
+        if stream :
+            await asyncio.sleep(self._firstTokenDelay())
+            self._maybeFail()
+            return FakeStream(self , text)
+        await asyncio.sleep(self._totalDelay(text))
+        self._maybeFail()
+        return FakeResponse(text)
+
+    def generate_content(self , prompt : str , generation_config : dict = None) :
+        self._logCall()
+        text = fakeCompletion(prompt)
+        time.sleep(self._totalDelay(text))
+        self._maybeFail()
+        return FakeResponse(text)
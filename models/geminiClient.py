@@ -0,0 +1,350 @@
+import asyncio
+import contextlib
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+from utils import metrics
+from utils.sharedState import SharedState, SharedTokenBucket
+
+class CircuitOpenError(Exception) :
+    pass
+
+
+RETRYABLE_ERRORS = (
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable',
+    'InternalServerError', 'DeadlineExceeded', 'GatewayTimeout', 'Aborted',
+    'TimeoutError', 'ConnectionError', 'ClientConnectorError',
+)
+RATE_LIMIT_ERRORS = ('ResourceExhausted', 'TooManyRequests')
+
+
+def _errorName(error : Exception) -> str :
+    return type(error).__name__
+
+
+def isRetryable(error : Exception) -> bool :
+    return any(name in RETRYABLE_ERRORS for name in (c.__name__ for c in type(error).__mro__))
+
+
+class TokenBucket :
+    def __init__(self , rate : float , capacity : float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.pausedUntil = 0.0
+
+    def _refill(self) :
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self , seconds : float) :
+        # после 429 не отправляем ничего, пока не пройдёт пауза
+        self.pausedUntil = max(self.pausedUntil, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self) :
+        while True :
+            now = time.monotonic()
+            if now < self.pausedUntil :
+                await asyncio.sleep(self.pausedUntil - now)
+                continue
+            if self.rate <= 0 :
+                return
+            self._refill()
+            if self.tokens >= 1 :
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# порядок задаёт числовое значение состояния в /metrics: 0 — closed, 1 — half-open, 2 — open
+BREAKER_STATES = ("closed", "half-open", "open")
+
+
+class CircuitBreaker :
+    """
+    closed -> open после failureThreshold ошибок подряд; через resetTimeout пропускает один пробный вызов (half-open).
+    Проба, которая не завершилась за probeTimeout, больше не держит breaker: следующий вызов станет новой пробой
+    """
+    def __init__(self , failureThreshold : int = 5 , resetTimeout : float = 30 , probeTimeout : float = 60):
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.probeTimeout = probeTimeout
+        self.state = "closed"
+        self.failures = 0
+        self.openedAt = 0.0
+        self.opens = 0
+        self.probeStarted = 0.0
+        self._probing = False
+
+    def allow(self) -> bool :
+        if self.state == "closed" :
+            return True
+        now = time.monotonic()
+        if self.state == "open" and now - self.openedAt >= self.resetTimeout :
+            self.state = "half-open"
+        if self.state == "half-open" and (not self._probing or now - self.probeStarted >= self.probeTimeout) :
+            self._probing = True
+            self.probeStarted = now
+            return True
+        return False
+
+    def release(self , probeStarted : float) :
+        # проба отменена или брошена без результата: состояние не меняется, следующий вызов станет новой пробой
+        if self._probing and self.probeStarted == probeStarted :
+            self._probing = False
+
+    def recordSuccess(self) :
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def recordFailure(self) :
+        self.failures += 1
+        self._probing = False
+        if self.state == "half-open" or self.failures >= self.failureThreshold :
+            if self.state != "open" :
+                self.opens += 1
+            self.state = "open"
+            self.openedAt = time.monotonic()
+
+
+class LazyGeminiModel :
+    """
+    google.generativeai импортируется и настраивается при первом запросе (или прогреве), а не при старте процесса:
+    сам импорт занимает заметную часть холодного старта
+    """
+    def __init__(self , apiKey : str , name : str = "gemini-pro" , endpoint : str = None):
+        self.apiKey = apiKey
+        self.name = name
+        self.endpoint = endpoint
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self) :
+        with self._lock :
+            if self._model is None :
+                import google.generativeai as genai
+                if self.endpoint :
+                    # например локальный фейковый сервер для тестов и нагрузочных прогонов
+                    genai.configure(api_key = self.apiKey, transport = "rest", client_options = {"api_endpoint" : self.endpoint})
+                else :
+                    genai.configure(api_key = self.apiKey)
+                self._model = genai.GenerativeModel(self.name)
+        return self._model
+
+    def generate_content(self , *args , **kwargs) :
+        return self.load().generate_content(*args, **kwargs)
+
+    async def generate_content_async(self , *args , **kwargs) :
+        model = self._model or await asyncio.to_thread(self.load)
+        return await model.generate_content_async(*args, **kwargs)
+
+
+class GeminiClient :
+    """
+    Обёртка над GenerativeModel: лимит параллельных вызовов, token bucket, повторы с джиттером и circuit breaker
+    """
+    def __init__(self , model , maxConcurrency : int = 8 , timeout : float = 60 ,
+                 retries : int = 3 , backoffBase : float = 0.5 , backoffMax : float = 8 ,
+                 rate : float = 0 , burst : float = 10 ,
+                 failureThreshold : int = 5 , resetTimeout : float = 30 , useThreads : bool = False ,
+                 bucket = None):
+        self.model = model
+        self.maxConcurrency = maxConcurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoffBase = backoffBase
+        self.backoffMax = backoffMax
+        # bucket можно передать готовым, например SharedTokenBucket, общий для воркеров gunicorn
+        self.bucket = bucket or TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failureThreshold, resetTimeout, probeTimeout = timeout)
+        # REST-транспорт (например локальный фейковый сервер) не умеет async — вызываем sync API в потоке
+        self.useThreads = useThreads
+        self._semaphore = None
+        self.inFlight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.timeouts = 0
+        self.retried = 0
+        self.failures = 0
+        self.rateLimited = 0
+        self.rejected = 0
+
+    @classmethod
+    def fromEnv(cls , model , useThreads : bool = False) -> "GeminiClient" :
+        rate = float(os.getenv("GEMINI_RATE_LIMIT", "0"))
+        burst = float(os.getenv("GEMINI_RATE_BURST", "10"))
+        state = SharedState.fromEnv()
+        return cls(
+            model,
+            maxConcurrency = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+            timeout = float(os.getenv("GEMINI_TIMEOUT", "60")),
+            retries = int(os.getenv("GEMINI_RETRIES", "3")),
+            backoffBase = float(os.getenv("GEMINI_BACKOFF_BASE", "0.5")),
+            backoffMax = float(os.getenv("GEMINI_BACKOFF_MAX", "8")),
+            rate = rate,
+            burst = burst,
+            failureThreshold = int(os.getenv("GEMINI_BREAKER_FAILURES", "5")),
+            resetTimeout = float(os.getenv("GEMINI_BREAKER_RESET", "30")),
+            useThreads = useThreads,
+            bucket = SharedTokenBucket(state, "gemini", rate, burst) if state else None,
+        )
+
+    def stats(self) -> Dict[str, float] :
+        return {
+            "maxConcurrency" : self.maxConcurrency,
+            "inFlight" : self.inFlight,
+            "queueDepth" : self.waiting,
+            "calls" : self.calls,
+            "timeouts" : self.timeouts,
+            "retries" : self.retried,
+            "failures" : self.failures,
+            "rateLimited" : self.rateLimited,
+            "breakerState" : self.breaker.state,
+            "breakerOpens" : self.breaker.opens,
+            "breakerRejected" : self.rejected,
+        }
+
+    @contextlib.asynccontextmanager
+    async def _slot(self) :
+        # семафор создаётся лениво, чтобы привязаться к циклу uvicorn
+        if self._semaphore is None :
+            self._semaphore = asyncio.Semaphore(self.maxConcurrency)
+
+        self.waiting += 1
+        started = time.perf_counter()
+        try :
+            await self._semaphore.acquire()
+        finally :
+            self.waiting -= 1
+            metrics.record("gemini_queue", time.perf_counter() - started)
+
+        self.inFlight += 1
+        try :
+            yield
+        except asyncio.TimeoutError :
+            self.timeouts += 1
+            raise TimeoutError(f"Gemini не ответил за {self.timeout} с")
+        finally :
+            self.inFlight -= 1
+            self._semaphore.release()
+
+    def _checkBreaker(self) -> Optional[float] :
+        """
+        Возвращает метку пробного вызова (half-open) или None для обычного вызова
+        """
+        if not self.breaker.allow() :
+            self.rejected += 1
+            metrics.event("gemini_circuit_open")
+            raise CircuitOpenError("Gemini временно недоступен, используется офлайн-генератор")
+        return self.breaker.probeStarted if self.breaker.state == "half-open" else None
+
+    def _releaseProbe(self , probe : Optional[float]) :
+        if probe is not None :
+            self.breaker.release(probe)
+
+    def _backoff(self , attempt : int) -> float :
+        # full jitter: случайная пауза в [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoffMax, self.backoffBase * 2 ** attempt))
+
+    async def _handleFailure(self , error : Exception , attempt : int) -> bool :
+        retryable = isRetryable(error)
+        # ошибки запроса (400 и т.п.) не меняют состояние breaker: сервер ответил, но и успехом это не считается
+        if retryable :
+            self.breaker.recordFailure()
+        if any(c.__name__ in RATE_LIMIT_ERRORS for c in type(error).__mro__) :
+            self.rateLimited += 1
+            self.bucket.pause(self._backoff(attempt + 1))
+        if attempt >= self.retries or not retryable or self.breaker.state == "open" :
+            self.failures += 1
+            return False
+        self.retried += 1
+        metrics.event("gemini_retry")
+        delay = self._backoff(attempt)
+        print(f"🔁 Повтор запроса к Gemini через {delay:.1f} с ({_errorName(error)})")
+        await asyncio.sleep(delay)
+        return True
+
+    async def _request(self , prompt : str , generation_config : dict , stream : bool) :
+        if self.useThreads :
+            return await asyncio.to_thread(
+                self.model.generate_content , prompt , generation_config = generation_config
+            )
+        return await self.model.generate_content_async(
+            prompt , generation_config = generation_config , stream = stream
+        )
+
+    async def generate(self , prompt : str , generation_config : dict = None) :
+        attempt = 0
+        while True :
+            probe = self._checkBreaker()
+            try :
+                await self.bucket.acquire()
+                self.calls += 1
+                async with self._slot() :
+                    with metrics.span("gemini") :
+                        response = await asyncio.wait_for(
+                            self._request(prompt , generation_config , False),
+                            timeout = self.timeout
+                        )
+                self.breaker.recordSuccess()
+                return response
+            except Exception as e :
+                if not await self._handleFailure(e , attempt) :
+                    raise
+                attempt += 1
+            finally :
+                # отмена (CancelledError) не доходит до except Exception — проба освобождается здесь
+                self._releaseProbe(probe)
+
+    async def stream(self , prompt : str , generation_config : dict = None) :
+        if self.useThreads :
+            response = await self.generate(prompt , generation_config)
+            yield response.text
+            return
+
+        # повторяем только до первого куска: после него ответ уже ушёл клиенту
+        attempt = 0
+        while True :
+            probe = self._checkBreaker()
+            started = False
+            try :
+                await self.bucket.acquire()
+                self.calls += 1
+                async with self._slot() :
+                    requested = time.perf_counter()
+                    response = await asyncio.wait_for(
+                        self._request(prompt , generation_config , True),
+                        timeout = self.timeout
+                    )
+                    chunks = response.__aiter__()
+                    while True :
+                        try :
+                            chunk = await asyncio.wait_for(chunks.__anext__() , timeout = self.timeout)
+                        except StopAsyncIteration :
+                            break
+                        if not started :
+                            metrics.record("gemini_first_chunk", time.perf_counter() - requested)
+                        started = True
+                        yield chunk.text
+                self.breaker.recordSuccess()
+                return
+            except GeneratorExit :
+                # клиент закрыл поток (например отключился от SSE): куски уже пришли, API отвечает
+                self.breaker.recordSuccess()
+                raise
+            except Exception as e :
+                if started or not await self._handleFailure(e , attempt) :
+                    if started :
+                        self.breaker.recordFailure()
+                        self.failures += 1
+                    raise
+                attempt += 1
+            finally :
+                self._releaseProbe(probe)
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import tempfile
+from urllib.parse import urlencode
+
+import orjson
+import pytest
+
+# тесты не ходят в Gemini: без ключа работает офлайн-генератор
+os.environ.pop("GEMINI_API_KEY", None)
+# колоды приложения пишутся во временный каталог, а не в decks.db рабочего каталога
+os.environ["DECKS_DB"] = os.path.join(tempfile.mkdtemp(prefix = "flashcards-tests-"), "decks.db")
+
+BOUNDARY = "testboundary"
+
+
+class Response :
+    def __init__(self , status : int , headers : dict , body : bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) :
+        return orjson.loads(self.body)
+
+    def lines(self) -> list :
+        return [orjson.loads(line) for line in self.body.splitlines() if line]
+
+
+def items(parts) -> list :
+    # словарь или список пар: повторяющиеся поля формы задаются списком
+    return list(parts.items()) if isinstance(parts, dict) else list(parts or ())
+
+
+def multipart(fields = None , files = None) -> bytes :
+    body = b""
+    for name , value in items(fields) :
+        body += f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+    for name , (filename , content) in items(files) :
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                 'Content-Type: application/octet-stream\r\n\r\n').encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+class Client :
+    """
+    Вызывает ASGI-приложение напрямую в своём цикле событий (httpx для TestClient не установлен)
+    """
+    def __init__(self , app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.run(app.router.startup())
+
+    def run(self , coroutine) :
+        return self.loop.run_until_complete(coroutine)
+
+    def close(self) :
+        self.run(self.app.router.shutdown())
+        self.loop.close()
+
+    def request(self , method : str , path : str , params : dict = None , json = None , fields = None ,
+                files = None , form = None) -> Response :
+        headers = []
+        body = b""
+        if json is not None :
+            body = orjson.dumps(json)
+            headers.append((b"content-type", b"application/json"))
+        elif form is not None :
+            body = urlencode(items(form)).encode()
+            headers.append((b"content-type", b"application/x-www-form-urlencoded"))
+        elif fields is not None or files is not None :
+            body = multipart(fields, files)
+            headers.append((b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+        scope = {
+            "type" : "http", "asgi" : {"version" : "3.0"}, "http_version" : "1.1", "method" : method,
+            "scheme" : "http", "path" : path, "raw_path" : path.encode(), "root_path" : "",
+            "query_string" : urlencode(params or {}).encode(), "headers" : headers,
+            "client" : ("test", 1), "server" : ("test", 80),
+        }
+        return self.run(self._call(scope, body))
+
+    async def _call(self , scope : dict , body : bytes) -> Response :
+        sent = False
+        status = None
+        headers = {}
+        chunks = []
+
+        async def receive() :
+            nonlocal sent
+            if not sent :
+                sent = True
+                return {"type" : "http.request", "body" : body, "more_body" : False}
+            # клиент не отключается: ответ дочитывается до конца
+            await asyncio.Event().wait()
+
+        async def send(message) :
+            nonlocal status
+            if message["type"] == "http.response.start" :
+                status = message["status"]
+                headers.update((k.decode().lower(), v.decode()) for k , v in message.get("headers", []))
+            elif message["type"] == "http.response.body" :
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return Response(status, headers, b"".join(chunks))
+
+    def get(self , path : str , **kwargs) -> Response :
+        return self.request("GET", path, **kwargs)
+
+    def post(self , path : str , **kwargs) -> Response :
+        return self.request("POST", path, **kwargs)
+
+    def delete(self , path : str , **kwargs) -> Response :
+        return self.request("DELETE", path, **kwargs)
+
+
+@pytest.fixture(scope = "session")
+def client() :
+    from app import app
+    client = Client(app)
+    yield client
+    client.close()
@@ -0,0 +1,38 @@
+TEXT = (
+    "Митохондрии вырабатывают энергию клетки в форме АТФ. "
+    "Рибосомы собирают белки по матрице информационной РНК. "
+    "Ядро хранит наследственную информацию в молекулах ДНК. "
+    "Мембрана отделяет содержимое клетки от внешней среды."
+)
+
+
+def test_cards_are_sent_with_every_field(client) :
+    response = client.post("/generate/text", json = {"text" : TEXT, "numCards" : 2})
+    assert response.status == 200
+    body = response.json()
+    assert body["total"] == len(body["cards"]) > 0 and body["deckId"] is None
+    card = body["cards"][0]
+    assert set(card) == {"question", "answer", "type", "difficulty", "start", "end"}
+    assert 0 <= card["start"] < card["end"] <= len(TEXT)
+
+
+def test_card_schemas_stay_in_openapi(client) :
+    # ответы собираются без pydantic, но схема для документации прежняя
+    paths = client.get("/openapi.json").json()["paths"]
+    def schema(path , method = "post") :
+        return paths[path][method]["responses"]["200"]["content"]["application/json"]["schema"]["$ref"]
+    assert schema("/generate/text") == schema("/generate/pdf") == "#/components/schemas/FlashcardsResponse"
+    assert schema("/jobs/{jobId}/cards", "get") == "#/components/schemas/FlashcardsResponse"
+    assert schema("/generate/batch") == "#/components/schemas/BatchResponse"
+
+
+def test_text_without_usable_content_is_rejected(client) :
+    # после удаления номеров страниц от такого текста ничего не остаётся
+    noise = "Страница 1\n" * 10
+    detail = "После очистки не осталось текста для карточек"
+    for path in ("/generate/text", "/generate/text/stream") :
+        response = client.post(path, json = {"text" : noise, "numCards" : 3})
+        assert (response.status, response.json()["detail"]) == (400, detail)
+    assert client.post("/jobs", fields = {"text" : noise}).status == 400
+    results = client.post("/generate/batch", fields = {"texts" : noise}).json()["results"]
+    assert results[0]["error"] == detail
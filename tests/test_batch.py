@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from models.card import Card
+from models.cardGenerator import CardGenerator
+
+TEXT = (
+    "Гликолиз расщепляет глюкозу до двух молекул пирувата в цитоплазме клетки. "
+    "Цикл Кребса окисляет ацетил-КоА в матриксе митохондрий. "
+    "Дыхательная цепь на внутренней мембране даёт основную часть АТФ. "
+    "Конечным акцептором электронов в дыхательной цепи служит кислород."
+)
+BATCH_ANSWER = (
+    "### ДОКУМЕНТ 2\nQ: Что такое гликолиз?\nA: Расщепление глюкозы до пирувата.\n\n"
+    "### документ 1\nQ: Где идёт цикл Кребса?\nA: В матриксе митохондрий.\n\n"
+    "Q: Что даёт дыхательная цепь?\nA: Основную часть АТФ клетки.\n"
+)
+
+
+@pytest.fixture
+def generator(monkeypatch) :
+    monkeypatch.setenv("GENERATION_CHUNK_CHARS", "1000")
+    monkeypatch.setenv("BATCH_MAX_CARDS_PER_PROMPT", "6")
+    generator = CardGenerator()
+    generator.use_ai = True
+    return generator
+
+
+def test_pack_batch_respects_card_budget_and_prompt_size(generator) :
+    texts = ["а" * 100] * 5 + ["б" * 600] + ["в" * 300] * 3
+    # 600 символов больше половины куска — такой текст идёт отдельным запросом
+    assert generator.packBatch(texts, 2) == [[0, 1, 2], [3, 4, 6], [7, 8]]
+    assert generator.packBatch(["г" * 400] * 4, 1) == [[0, 1], [2, 3]]
+
+
+def test_batch_cards_maps_sections_to_texts(generator , monkeypatch) :
+    async def fakeCall(prompt , generation_config = None) :
+        assert "ДОКУМЕНТ 3" in prompt
+        return SimpleNamespace(text = BATCH_ANSWER)
+    monkeypatch.setattr(generator, "callGemini", fakeCall)
+
+    sections = asyncio.run(generator.batchCards(["первый", "второй", "третий"], 1))
+    assert [[card.question for card in cards] for cards in sections] == [
+        ["Где идёт цикл Кребса?"], ["Что такое гликолиз?"], []
+    ]
+
+
+def test_text_missing_from_batch_answer_is_generated_alone(generator , monkeypatch) :
+    prompts = []
+
+    async def fakeCall(prompt , generation_config = None) :
+        prompts.append(prompt)
+        if len(prompts) == 1 :
+            return SimpleNamespace(text = BATCH_ANSWER.split("### документ 1")[0])
+        raise RuntimeError("quota exceeded")
+    monkeypatch.setattr(generator, "callGemini", fakeCall)
+
+    results = asyncio.run(generator.generateBatch([TEXT, TEXT[:200]], numCards = 1))
+    assert len(prompts) == 2
+    assert results[1] == [Card("Что такое гликолиз?", "Расщепление глюкозы до пирувата.", start = 0, end = 200)]
+    # у первого текста секции нет: он ушёл отдельным запросом и после ошибки Gemini получил офлайн-карточки
+    assert len(results[0]) == 1
+
+
+def test_batch_endpoint_reports_errors_per_item(client) :
+    response = client.post(
+        "/generate/batch",
+        fields = [("texts", TEXT), ("texts", "коротко"), ("numCards", "2")],
+        files = [("files", ("notes.txt", b"plain text"))]
+    )
+    assert response.status == 200
+    results = response.json()["results"]
+    assert [item["source"] for item in results] == ["text[0]", "text[1]", "notes.txt"]
+    assert results[0]["total"] == len(results[0]["cards"]) > 0 and results[0]["error"] is None
+    assert results[1]["error"] == "Текст слишком короткий.Минимум 50 символов"
+    assert results[2]["error"] == "Разрешены только PDF файлы"
+    assert response.json()["total"] == results[0]["total"]
+
+
+def test_batch_of_texts_from_urlencoded_form(client) :
+    response = client.post("/generate/batch", form = [("texts", TEXT), ("texts", "коротко"), ("numCards", "2")])
+    assert response.status == 200
+    results = response.json()["results"]
+    assert [item["source"] for item in results] == ["text[0]", "text[1]"]
+    assert results[0]["total"] > 0 and results[1]["error"] == "Текст слишком короткий.Минимум 50 символов"
+
+
+def test_batch_endpoint_needs_a_source(client) :
+    assert client.post("/generate/batch", fields = {"numCards" : "2"}).status == 400
@@ -0,0 +1,50 @@
+from models.card import Card
+from utils.cache import ResultCache, hashKey
+
+
+def test_hash_key_separates_parts() :
+    assert hashKey("ab", "c") != hashKey("a", "bc")
+    assert hashKey(b"raw", 1) == hashKey("raw", "1")
+
+
+def test_memory_tier_evicts_least_recently_used() :
+    cache = ResultCache("cards", maxItems = 2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_misses() :
+    cache = ResultCache("cards", ttl = -1)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_disk_tier_survives_restart(tmp_path) :
+    path = str(tmp_path / "cards.db")
+    ResultCache("cards", path = path, decode = Card.fromList).set("k", [Card("q", "a", difficulty = "hard")])
+    restarted = ResultCache("cards", path = path, decode = Card.fromList)
+    assert restarted.get("k") == [Card("q", "a", difficulty = "hard")]
+    assert restarted.diskHits == 1
+
+
+def test_caches_sharing_a_file_keep_separate_tables(tmp_path) :
+    path = str(tmp_path / "shared.db")
+    ResultCache("cards", path = path).set("k", "cards")
+    ResultCache("pdf", path = path).set("k", "text")
+    assert ResultCache("cards", path = path).get("k") == "cards"
+    assert ResultCache("pdf", path = path).get("k") == "text"
+
+
+def test_disk_tier_keeps_most_recently_used_rows(tmp_path) :
+    cache = ResultCache("cards", maxItems = 1, path = str(tmp_path / "cards.db"), maxDiskItems = 2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    restarted = ResultCache("cards", path = str(tmp_path / "cards.db"))
+    assert (restarted.get("a"), restarted.get("b"), restarted.get("c")) == (1, None, 3)
@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from models.cardGenerator import CardGenerator
+
+PARAGRAPHS = [f"Абзац номер {i}. " + "слово " * 12 for i in range(40)]
+TEXT = "\n\n".join(p.strip() for p in PARAGRAPHS)
+
+
+@pytest.fixture
+def generator(monkeypatch) :
+    monkeypatch.delenv("GEMINI_API_KEY", raising = False)
+    monkeypatch.setenv("LLM_BACKEND", "gemini")
+    monkeypatch.setenv("GENERATION_CHUNK_CHARS", "200")
+
+    def make(mergeChars : int) -> CardGenerator :
+        monkeypatch.setenv("GENERATION_MERGE_CHARS", str(mergeChars))
+        return CardGenerator()
+    return make
+
+
+def test_plan_covers_every_chunk_when_merged_groups_fit(generator) :
+    plan = generator(2000).planChunks(TEXT , 4)
+    assert [n for _ , n , _ in plan] == [1] * 4
+    merged = "\n\n".join(chunk for chunk , _ , _ in plan)
+    for paragraph in PARAGRAPHS :
+        assert paragraph.strip() in merged
+    for chunk , _ , base in plan :
+        assert TEXT[base:].startswith(chunk[:32])
+
+
+def test_plan_caps_group_size_for_long_documents(generator) :
+    plan = generator(400).planChunks(TEXT , 4)
+    assert len(plan) == 4
+    assert all(len(chunk) <= 400 for chunk , _ , _ in plan)
+    # от каждой группы есть начало: выборка идёт по всему документу
+    assert [chunk.split(".")[0] for chunk , _ , _ in plan] == [f"Абзац номер {i}" for i in (0, 10, 20, 30)]
+
+
+def test_plan_splits_budget_when_cards_exceed_chunks(generator) :
+    plan = generator(2000).planChunks(TEXT , 100)
+    assert sum(n for _ , n , _ in plan) == 100
+    assert all(len(chunk) <= 200 for chunk , _ , _ in plan)
+
+
+def test_empty_text_gives_no_plan_and_no_cards(generator) :
+    generator = generator(2000)
+    assert generator.planChunks("" , 5) == generator.planChunks("\n\n" , 5) == []
+    assert asyncio.run(generator.generateCards("" , 5)) == []
+
+
+def test_backends_do_not_share_cached_cards(monkeypatch) :
+    monkeypatch.setenv("LLM_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_LLM_LATENCY", "0")
+    monkeypatch.setenv("FAKE_LLM_CHUNK_DELAY", "0")
+    fake = CardGenerator()
+    monkeypatch.setenv("LLM_BACKEND", "gemini")
+    gemini = CardGenerator()
+    gemini.use_ai = True
+    gemini.cache = fake.cache
+    prompts = []
+
+    async def callGemini(prompt , generation_config = None) :
+        prompts.append(prompt)
+        return SimpleNamespace(text = "Q: Что такое абзац номер ноль?\nA: Первый абзац текста.")
+    monkeypatch.setattr(gemini, "callGemini", callGemini)
+
+    async def run() :
+        fakeCards = await fake.generateCards(TEXT , 1)
+        # тот же документ и тот же кэш, но другая модель: ответ фейковой модели не подходит
+        geminiCards = await gemini.generateCards(TEXT , 1)
+        return fakeCards , geminiCards , await fake.generateCards(TEXT , 1)
+
+    fakeCards , geminiCards , cached = asyncio.run(run())
+    assert (fake.mode, gemini.mode) == ("fake", "gemini")
+    assert len(prompts) == 1 and geminiCards[0].question == "Что такое абзац номер ноль?"
+    assert cached == fakeCards != geminiCards
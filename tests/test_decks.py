@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+from models.card import CARD_FIELDS, Card
+from utils.decks import DeckStore
+
+
+def test_save_and_load_keep_all_card_fields(tmp_path) :
+    store = DeckStore(str(tmp_path / "decks.db"))
+    cards = [Card("q1", "a1", "definition", "easy", 10, 42), Card("q2", "a2")]
+    deck = store.save(cards, "deck", "hash", "text", 2)
+
+    assert store.findBySource("hash", 2)["id"] == deck["id"]
+    assert Card.fromList(store.cards(deck["id"])) == cards
+    stored = store.card(store.cardIds(deck["id"])[0])
+    assert {name : stored[name] for name in CARD_FIELDS} == {
+        "question" : "q1", "answer" : "a1", "type" : "definition", "difficulty" : "easy", "start" : 10, "end" : 42,
+    }
+
+
+def test_importing_the_app_creates_no_database(tmp_path) :
+    # база колод появляется при старте сервера, а не при импорте (инструменты, мастер gunicorn)
+    env = {name : value for name , value in os.environ.items() if name not in ("DECKS_DB", "REVIEWS_DB")}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (os.getcwd(), env.get("PYTHONPATH"))))
+    subprocess.run([sys.executable, "-c", "import app"], cwd = tmp_path, env = env, check = True, capture_output = True)
+    assert os.listdir(tmp_path) == []
+
+
+def test_deck_round_trip_over_http(client) :
+    response = client.post("/decks", json = {"title" : "Клетка", "cards" : [{"question" : "q1", "answer" : "a1"}]})
+    assert response.status == 201
+    deckId = response.json()["id"]
+    assert client.get(f"/decks/{deckId}").json()["cards"][0]["question"] == "q1"
+    assert client.delete(f"/decks/{deckId}").status == 204
+    assert client.get(f"/decks/{deckId}").status == 404
@@ -0,0 +1,66 @@
+from models.card import Card
+from models.cardGenerator import CardGenerator
+from utils.dedup import CardDeduplicator, NearDuplicateIndex, shingles
+
+SHORT_ANSWER = "В клетке."
+
+
+def card(question : str , answer : str = SHORT_ANSWER) -> Card :
+    return Card(question, answer)
+
+
+def test_shingles_are_stemmed_words_and_neighbour_pairs() :
+    assert shingles("Что такое митохондрии?") == {"такое", "митох", "такое митох"}
+    assert shingles("ДНК") == {"днк"}
+    assert shingles("Что? Как?") == frozenset()
+
+
+def test_index_threshold_is_inclusive() :
+    base = frozenset(f"w{i}" for i in range(12))
+    # 12 общих из 16 — коэффициент Жаккара ровно 0.75
+    other = base | {"x1", "x2", "x3", "x4"}
+    for threshold , expected in ((0.75, True), (0.8, False)) :
+        # одна строка в полосе: кандидатом становится почти любое пересекающееся множество
+        index = NearDuplicateIndex(threshold, bins = 48, bands = 48)
+        index.add(base, index.keys(base))
+        assert index.contains(other, index.keys(other)) is expected
+
+
+def test_disjoint_sets_are_not_candidates() :
+    index = NearDuplicateIndex()
+    base = frozenset(f"w{i}" for i in range(20))
+    index.add(base, index.keys(base))
+    other = frozenset(f"v{i}" for i in range(20))
+    assert not index.contains(other, index.keys(other))
+
+
+def test_questions_that_differ_only_in_endings_are_duplicates() :
+    dedup = CardDeduplicator()
+    assert dedup.add(card("Что такое митохондрии клетки?"))
+    assert not dedup.add(card("Что такое митохондрия клетки."))
+    assert dedup.add(card("Что такое рибосомы клетки?"))
+
+
+def test_short_answers_are_not_compared_but_long_ones_are() :
+    dedup = CardDeduplicator()
+    assert dedup.add(card("Где находится ядро?"))
+    assert dedup.add(card("Где идёт синтез белка?"))
+    answer = "Световые реакции фотосинтеза идут в мембранах тилакоидов хлоропласта"
+    assert dedup.add(card("Где идут световые реакции?", answer))
+    assert not dedup.add(card("Что происходит в тилакоидах?", answer + "."))
+
+
+def test_stop_word_only_questions_fall_back_to_exact_text() :
+    dedup = CardDeduplicator()
+    assert dedup.add(card("Что это?"))
+    assert not dedup.add(card(" что это? "))
+    assert dedup.add(card("Как так?"))
+
+
+def test_merge_keeps_the_first_card_of_each_group() :
+    first = [card("Что такое митохондрии клетки?"), card("Что такое фотосинтез растений?")]
+    second = [card("Что такое митохондрия клетки."), card("Что такое хлорофилл листа?")]
+    merged = CardGenerator().mergeCards([first, second], 10)
+    assert [c.question for c in merged] == [
+        "Что такое митохондрии клетки?", "Что такое фотосинтез растений?", "Что такое хлорофилл листа?"
+    ]
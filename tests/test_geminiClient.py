@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import pytest
+
+from models.geminiClient import CircuitBreaker, GeminiClient
+
+
+class Chunk :
+    def __init__(self , text : str):
+        self.text = text
+
+
+class ChunkStream :
+    def __init__(self , parts):
+        self.parts = list(parts)
+
+    def __aiter__(self) :
+        return self
+
+    async def __anext__(self) :
+        if not self.parts :
+            raise StopAsyncIteration
+        return Chunk(self.parts.pop(0))
+
+
+class ScriptedModel :
+    """
+    Модель для тестов: поток из кусков, зависание или ошибка
+    """
+    def __init__(self , parts = ("a", "b", "c") , hang : bool = False , error : Exception = None):
+        self.parts = parts
+        self.hang = hang
+        self.error = error
+
+    async def generate_content_async(self , prompt , generation_config = None , stream = False) :
+        if self.hang :
+            await asyncio.sleep(3600)
+        if self.error :
+            raise self.error
+        return ChunkStream(self.parts) if stream else Chunk("".join(self.parts))
+
+
+def halfOpenClient(model) -> GeminiClient :
+    client = GeminiClient(model, retries = 0, failureThreshold = 1, resetTimeout = 0)
+    client.breaker.recordFailure()
+    assert client.breaker.state == "open"
+    return client
+
+
+def test_breaker_half_open_lets_one_probe_through() :
+    breaker = CircuitBreaker(failureThreshold = 2, resetTimeout = 0.05)
+    breaker.recordFailure()
+    assert breaker.state == "closed"
+    breaker.recordFailure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half-open" and not breaker.allow()
+    breaker.recordFailure()
+    assert breaker.state == "open" and breaker.opens == 2
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.recordSuccess()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+def test_early_closed_stream_probe_closes_breaker() :
+    client = halfOpenClient(ScriptedModel())
+
+    async def run() :
+        stream = client.stream("prompt")
+        assert await stream.__anext__() == "a"
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert client.breaker.state == "closed"
+    assert client.breaker.allow()
+
+
+def test_cancelled_probe_is_released() :
+    client = halfOpenClient(ScriptedModel(hang = True))
+
+    async def run() :
+        task = asyncio.create_task(client.generate("prompt"))
+        await asyncio.sleep(0.01)
+        assert client.breaker._probing
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError) :
+            await task
+
+    asyncio.run(run())
+    assert client.breaker.state == "half-open"
+    assert client.breaker.allow()
+
+
+def test_timed_out_probe_is_released() :
+    client = halfOpenClient(ScriptedModel(hang = True))
+    client.timeout = 0.01
+    with pytest.raises(TimeoutError) :
+        asyncio.run(client.generate("prompt"))
+    assert not client.breaker._probing
+
+
+def test_non_retryable_error_keeps_breaker_half_open() :
+    client = halfOpenClient(ScriptedModel(error = ValueError("400 bad request")))
+    with pytest.raises(ValueError) :
+        asyncio.run(client.generate("prompt"))
+    assert client.breaker.state == "half-open"
+    assert client.breaker.allow()
+
+
+def test_stuck_probe_expires_after_probe_timeout() :
+    breaker = CircuitBreaker(failureThreshold = 1, resetTimeout = 0, probeTimeout = 0.05)
+    breaker.recordFailure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_stale_probe_release_keeps_new_probe() :
+    breaker = CircuitBreaker(failureThreshold = 1, resetTimeout = 0, probeTimeout = 0)
+    breaker.recordFailure()
+    assert breaker.allow()
+    first = breaker.probeStarted
+    time.sleep(0.001)
+    assert breaker.allow()
+    breaker.release(first)
+    assert breaker._probing
@@ -0,0 +1,116 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from models.card import Card
+from utils.jobs import JobRunner, MemoryJobStore, SqliteJobStore
+
+TEXT = (
+    "Митохондрии производят большую часть АТФ клетки в ходе окислительного фосфорилирования. "
+    "Внутренняя мембрана митохондрий образует кристы, на которых идёт дыхательная цепь. "
+    "Митохондрии имеют собственную кольцевую ДНК и рибосомы. "
+    "По теории симбиогенеза они произошли от свободноживущих бактерий."
+)
+
+
+class FlakyStore(MemoryJobStore) :
+    """
+    Первая отметка «running» падает, как SQLite под нагрузкой нескольких воркеров
+    """
+    def __init__(self):
+        super().__init__()
+        self.locked = True
+
+    def update(self , jobId , **fields) :
+        if fields.get("status") == "running" and self.locked :
+            self.locked = False
+            raise sqlite3.OperationalError("database is locked")
+        super().update(jobId, **fields)
+
+
+def runJobs(store , *works) -> list :
+    runner = JobRunner(store, workers = 1)
+
+    async def run() :
+        runner.start()
+        jobs = [await runner.submit("text", work) for work in works]
+        await asyncio.wait_for(runner._queue.join(), timeout = 5)
+        await runner.stop()
+        return [job["id"] for job in jobs]
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(params = ["memory", "sqlite"])
+def store(request , tmp_path) :
+    if request.param == "memory" :
+        return MemoryJobStore()
+    return SqliteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_runner_records_progress_result_and_errors(store) :
+    async def work(progress) :
+        progress(chunksTotal = 2)
+        progress(chunksDone = 2)
+        return [Card("q", "a")]
+
+    async def broken(progress) :
+        raise ValueError("PDF содержит слишком мало текста")
+
+    done, failed = runJobs(store, work, broken)
+    assert store.get(done)["status"] == "done"
+    assert (store.get(done)["chunksDone"], store.get(done)["cardsReady"]) == (2, 1)
+    assert store.getResult(done) == [Card("q", "a")]
+    assert store.get(failed)["status"] == "failed"
+    assert store.get(failed)["error"] == "PDF содержит слишком мало текста"
+
+
+def test_store_error_fails_the_job_and_keeps_the_worker() :
+    store = FlakyStore()
+
+    async def work(progress) :
+        return [Card("q", "a")]
+
+    first, second = runJobs(store, work, work)
+    assert store.get(first)["status"] == "failed"
+    assert "database is locked" in store.get(first)["error"]
+    assert store.get(second)["status"] == "done"
+    assert store.getResult(second) == [Card("q", "a")]
+
+
+def waitForJob(client , jobId : str) -> dict :
+    for _ in range(250) :
+        job = client.get(f"/jobs/{jobId}").json()
+        if job["status"] in ("done", "failed") :
+            return job
+        client.run(asyncio.sleep(0.02))
+    raise AssertionError(f"задача {jobId} не завершилась")
+
+
+def test_text_job_over_http(client) :
+    response = client.post("/jobs", fields = {"text" : TEXT, "numCards" : 3})
+    assert response.status == 202
+    jobId = response.json()["id"]
+    assert client.get(f"/jobs/{jobId}/cards").status in (200, 409)
+
+    job = waitForJob(client, jobId)
+    assert job["status"] == "done"
+    cards = client.get(f"/jobs/{jobId}/cards").json()
+    assert cards["total"] == job["cardsReady"] > 0
+    # офлайн-генератор тоже отчитывается по кускам
+    assert job["chunksDone"] == job["chunksTotal"] > 0
+
+
+def test_text_job_from_urlencoded_form(client) :
+    response = client.post("/jobs", form = {"text" : TEXT, "numCards" : 2})
+    assert response.status == 202
+    assert waitForJob(client, response.json()["id"])["status"] == "done"
+    assert client.post("/jobs", form = {"text" : "коротко"}).status == 400
+
+
+def test_job_errors_over_http(client) :
+    assert client.post("/jobs", fields = {"text" : "коротко"}).status == 400
+    assert client.post("/jobs", files = {"file" : ("notes.txt", b"plain text")}).status == 400
+    assert client.get("/jobs/missing").status == 404
+    assert client.get("/jobs/missing/cards").status == 404
@@ -0,0 +1,22 @@
+from utils.keywords import KeywordIndex, tokenize
+
+
+def test_tokenize_drops_short_words_stop_words_and_numbers() :
+    assert tokenize("Которые клетки делятся митозом с 2024 года") == ["клетки", "делятся", "митозом"]
+
+
+def test_terms_shared_by_every_sentence_rank_last() :
+    sentences = ["Клетка содержит рибосомы.", "Клетка делится митозом.", "Клетка окружена мембраной."]
+    index = KeywordIndex(sentences)
+    assert index.keywords(sentences[1]) == ["делится", "митозом", "Клетка"]
+    assert index.topTerms(1) == ["клетка"]
+
+
+def test_capitalized_terms_inside_sentence_get_a_bonus() :
+    index = KeywordIndex(["Деление клеток описал Флемминг.", "Деление клеток идёт митозом."])
+    assert index.keywords("Деление клеток описал Флемминг.", topN = 2) == ["Флемминг", "описал"]
+
+
+def test_words_outside_the_index_count_as_rarest() :
+    index = KeywordIndex(["Клетка делится митозом."])
+    assert index.keywords("Клетка содержит хлорофилл.") == ["содержит", "хлорофилл", "Клетка"]
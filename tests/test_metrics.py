@@ -0,0 +1,59 @@
+from utils import metrics
+
+TEXT = (
+    "Ферменты ускоряют химические реакции, снижая энергию активации. "
+    "Активный центр фермента связывает субстрат по принципу комплементарности. "
+    "Скорость ферментативной реакции зависит от температуры и кислотности среды. "
+    "Ингибиторы занимают активный центр или меняют форму фермента."
+)
+
+
+def test_histogram_buckets_are_cumulative() :
+    histogram = metrics.Histogram("test_seconds", "Тестовая гистограмма", (1, 5))
+    for value in (0.5, 1, 3, 10) :
+        histogram.observe(value, stage = "parse")
+    assert list(histogram.render())[2:] == [
+        'test_seconds_bucket{stage="parse",le="1"} 2',
+        'test_seconds_bucket{stage="parse",le="5"} 3',
+        'test_seconds_bucket{stage="parse",le="+Inf"} 4',
+        'test_seconds_sum{stage="parse"} 14.5',
+        'test_seconds_count{stage="parse"} 4',
+    ]
+
+
+def test_spans_add_up_per_request_and_go_to_registry_on_finish() :
+    key = (("event", "test_event"),)
+    before = metrics.EVENTS._values.get(key, 0)
+    with metrics.collect() as spans :
+        metrics.record("test_stage", 0.25)
+        metrics.record("test_stage", 0.5)
+        metrics.event("test_event")
+    assert spans.export() == {"stages" : {"test_stage" : 0.75}, "events" : {"test_event" : 1}}
+    assert metrics.EVENTS._values.get(key, 0) == before
+
+    spans.finish()
+    assert metrics.EVENTS._values[key] == before + 1
+    # без активного запроса событие сразу попадает в счётчик
+    metrics.event("test_event")
+    assert metrics.EVENTS._values[key] == before + 2
+
+
+def test_requests_get_server_timing_and_counters(client) :
+    response = client.post("/generate/text", json = {"text" : TEXT, "numCards" : 2})
+    assert response.status == 200
+    stages = [part.split(";")[0] for part in response.headers["server-timing"].split(", ")]
+    assert "process_text" in stages and "simple_generate" in stages
+
+    body = client.get("/metrics").body.decode()
+    assert 'flashcards_http_requests_total{endpoint="generateFromText",method="POST",status="200"}' in body
+    assert 'flashcards_stage_seconds_count{stage="process_text"}' in body
+    assert "# TYPE flashcards_cards_hits gauge" in body
+
+
+def test_breaker_state_is_a_numeric_gauge(client , monkeypatch) :
+    from app import cardGenerator
+    for state , value in (("closed", 0), ("half-open", 1), ("open", 2)) :
+        monkeypatch.setattr(cardGenerator, "geminiStats", lambda : {"calls" : 3, "breakerState" : state})
+        body = client.get("/metrics").body.decode()
+        assert f"flashcards_gemini_breakerState {value}\n" in body
+        assert "flashcards_gemini_calls 3\n" in body
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.corpus import makePages
+from tools.multiWorkerCheck import Cluster, checkRateLimit, checkWorkers
+
+WORKERS = 2
+RATE = 5
+BURST = 2
+
+
+@pytest.fixture(scope = "module")
+def cluster(tmp_path_factory) :
+    # отдельные процессы приложения с фейковой моделью и общим SHARED_STATE_DB, как воркеры gunicorn
+    server = Cluster(WORKERS, str(tmp_path_factory.mktemp("workers")), RATE, BURST)
+    try :
+        server.waitReady()
+        yield server
+    finally :
+        server.stop()
+
+
+def test_requests_reach_every_worker(cluster) :
+    ok, detail = checkWorkers(cluster, WORKERS)
+    assert ok, detail
+
+
+def test_identical_requests_in_different_workers_call_model_once(cluster) :
+    text = "\n".join(makePages(1, "ru", seed = 42))[:3000]
+    before = len(cluster.calls())
+    # запросы раздаются по кругу: половина попадает в один воркер, половина — в другой
+    with ThreadPoolExecutor(4) as pool :
+        results = list(pool.map(lambda _ : cluster.postJson("/generate/text", {"text" : text, "numCards" : 3}), range(4)))
+    assert len(cluster.calls()) - before == 1
+    assert all(result["cards"] == results[0]["cards"] for result in results)
+
+
+def test_rate_limit_is_shared_by_workers(cluster) :
+    ok, detail = checkRateLimit(cluster, 10, RATE, BURST)
+    assert ok, detail
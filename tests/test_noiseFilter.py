@@ -0,0 +1,37 @@
+import pytest
+
+from benchmarks.benchNoise import legacyIsNoise, makeParagraphs
+from utils.noiseFilter import NOISE_RULES, NoiseClassifier
+
+EDGE_CASES = [
+    "", "   ", "Короткий абзац",
+    "Глава 12. Клеточное дыхание и его стадии",
+    "глава без номера, дальше обычный текст",
+    "CHAPTER 3 Photosynthesis in plant cells",
+    "Страница 4 из 10, остальное — текст",
+    "1.2.3 — 4.5.6 — 7.8.9 — 10",
+    "123456789012345678901",
+    "Edited by editor: J. Smith and colleagues",
+    "ISBN 978-5-00000-000-0 and more words",
+    "Митохондрии — энергетические станции клетки.",
+]
+
+
+def test_classifier_matches_the_legacy_pattern_chain() :
+    classifier = NoiseClassifier()
+    paragraphs = makeParagraphs(2000, seed = 1) + EDGE_CASES
+    expected = [legacyIsNoise(p) for p in paragraphs]
+    assert classifier.classify(paragraphs) == expected
+    assert [classifier.isNoise(p) for p in paragraphs] == expected
+
+
+def test_only_selected_languages_are_checked() :
+    text = "Глава 3 о строении клетки и её органоидах"
+    assert NoiseClassifier(["en"]).isNoise(text) is False
+    assert NoiseClassifier(["ru"]).isNoise(text) is True
+
+
+def test_rule_without_literal_prefix_is_rejected(monkeypatch) :
+    monkeypatch.setitem(NOISE_RULES, "xx", [r"\d+ стр"])
+    with pytest.raises(ValueError) :
+        NoiseClassifier(["xx"])
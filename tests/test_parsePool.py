@@ -0,0 +1,93 @@
+import asyncio
+import signal
+import time
+
+import pytest
+
+from utils import parsePool
+from utils.parsePool import ParsePool
+from utils.pdfParser import PdfDocument
+
+
+class ScriptedDocument(PdfDocument) :
+    """
+    Вместо PDF: b"hang" крутит цикл на Python, b"stuck" ещё и блокирует SIGALRM (как зависание в C-коде)
+    """
+    def __init__(self , content):
+        if content == b"stuck" :
+            signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+        if content in (b"hang", b"stuck") :
+            while True :
+                pass
+        super().__init__(content)
+
+    @property
+    def numPages(self) -> int :
+        return 1
+
+
+@pytest.fixture
+def pool(monkeypatch) :
+    # процессы пула создаются fork-ом после подмены и видят её
+    monkeypatch.setattr(parsePool, "PdfDocument", ScriptedDocument)
+    monkeypatch.setattr(parsePool, "process_pdf", lambda document, maxChars = None : document.content.decode())
+    monkeypatch.setattr(parsePool, "preload", lambda : None)
+    pool = ParsePool(workers = 1, timeout = 0.5, maxMemoryMb = 0, killGrace = 0.5)
+    yield pool
+    pool.shutdown()
+
+
+def test_timeout_frees_the_worker(pool) :
+    async def run() :
+        with pytest.raises(TimeoutError) :
+            await pool.parseDocument(b"hang")
+        started = time.perf_counter()
+        parsed = await pool.parseDocument(b"next document")
+        return parsed, time.perf_counter() - started
+
+    parsed, elapsed = asyncio.run(run())
+    assert parsed["text"] == "next document"
+    assert elapsed < 0.5
+
+
+def test_unresponsive_worker_is_killed(pool) :
+    async def run() :
+        with pytest.raises(TimeoutError) :
+            await pool.parseDocument(b"stuck")
+        return await pool.parseDocument(b"after restart")
+
+    assert asyncio.run(run())["text"] == "after restart"
+
+
+class SlowDocument(PdfDocument) :
+    """
+    Каждая страница извлекается дольше таймаута; reader нет, поэтому закладки и метки страниц не находятся
+    """
+    @property
+    def hash(self) -> str :
+        return "slow-document"
+
+    @property
+    def reader(self) :
+        raise ValueError("не PDF")
+
+    @property
+    def numPages(self) -> int :
+        return 3
+
+    def pageText(self , pageNum : int) -> str :
+        time.sleep(5)
+        return ""
+
+    def iterPages(self , startPage : int = 0 , endPage : int = None) :
+        for pageNum in range(startPage, endPage or self.numPages) :
+            yield self.pageText(pageNum)
+
+
+def test_timeout_is_not_swallowed_by_parser(monkeypatch) :
+    # таймаут прерывает и поиск диапазона страниц, и чтение страниц, хотя оба ловят исключения
+    monkeypatch.setattr(parsePool, "PdfDocument", SlowDocument)
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError) :
+        parsePool._parseJob(b"slow", None, 0.2)
+    assert time.perf_counter() - started < 1
@@ -0,0 +1,102 @@
+import io
+
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import ArrayObject, DictionaryObject, NameObject, NumberObject
+
+from utils.pdfParser import PdfDocument, _smart_page_range_detection, _start_from_page_labels, parse_pdf, process_pdf
+from utils.textProcessor import processText
+
+
+def labelRange(style : str) -> DictionaryObject :
+    return DictionaryObject({NameObject("/S") : NameObject(style)})
+
+
+def pdfWithLabels(pages : int , labels : DictionaryObject = None) -> bytes :
+    writer = PdfWriter()
+    for _ in range(pages) :
+        writer.add_blank_page(width = 200, height = 200)
+    if labels is not None :
+        writer._root_object[NameObject("/PageLabels")] = labels
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def numbers(*pairs) -> DictionaryObject :
+    items = []
+    for start, style in pairs :
+        items += [NumberObject(start), labelRange(style)]
+    return DictionaryObject({NameObject("/Nums") : ArrayObject(items)})
+
+
+def test_roman_front_matter_is_skipped() :
+    content = pdfWithLabels(8, numbers((0, "/r"), (3, "/D")))
+    assert _start_from_page_labels(PdfDocument(content)) == 3
+    assert _smart_page_range_detection(content) == (3, 8)
+
+
+def test_labels_in_number_tree_kids() :
+    labels = DictionaryObject({NameObject("/Kids") : ArrayObject([numbers((0, "/R")), numbers((5, "/D"))])})
+    assert _start_from_page_labels(PdfDocument(pdfWithLabels(8, labels))) == 5
+
+
+def test_arabic_only_or_missing_labels_are_ignored() :
+    assert _start_from_page_labels(PdfDocument(pdfWithLabels(4, numbers((0, "/D"))))) is None
+    assert _start_from_page_labels(PdfDocument(pdfWithLabels(4))) is None
+
+
+def test_documents_opened_from_a_path_are_unmapped(tmp_path , monkeypatch) :
+    path = tmp_path / "book.pdf"
+    path.write_bytes(pdfWithLabels(2))
+    with PdfDocument(str(path)) as document :
+        assert document.numPages == 2
+        mapped = document._map
+    assert mapped.closed and document._map is None
+
+    # parse_pdf закрывает документ, который открыл сам, и не трогает переданный
+    closed = []
+    monkeypatch.setattr(PdfDocument, "close", lambda self : closed.append(self.content))
+    parse_pdf(str(path))
+    assert closed == [str(path)]
+    parse_pdf(PdfDocument(str(path)))
+    assert closed == [str(path)]
+
+
+class TextDocument(PdfDocument) :
+    """
+    Страницы задаются текстом: проверяется конвейер абзацев, а не извлечение PyPDF2
+    """
+    def __init__(self , pages : list):
+        super().__init__("\f".join(pages).encode())
+        self.texts = pages
+
+    @property
+    def reader(self) :
+        raise ValueError("не PDF")
+
+    @property
+    def numPages(self) -> int :
+        return len(self.texts)
+
+    def pageText(self , pageNum : int) -> str :
+        return self.texts[pageNum]
+
+    def iterPages(self , startPage : int = 0 , endPage : int = None) :
+        yield from self.texts[startPage:endPage]
+
+
+PROSE = (
+    "Хлоропласты , как и митохондрии , имеют собственную ДНК и делятся независимо от клетки ;"
+    "по «теории симбиогенеза» они произошли от поглощённых бактерий ."
+)
+
+
+def test_process_pdf_matches_process_text_of_parse_pdf() :
+    pages = [f"{PROSE} Страница {i}\n\n{PROSE}\n{PROSE}\n\nСтраница {i}\n" for i in range(6)]
+    text = parse_pdf(TextDocument(pages))
+    assert text and process_pdf(TextDocument(pages)) == processText(text)
+    # полезного текста мало: возвращается весь очищенный текст, и обработка та же
+    short = ["Оглавление , часть первая\n\nГлава 1 , введение в предмет курса\n\n"
+             "Глава 2 , основы и определения курса\n\nГлава 3 , методы и инструменты анализа"]
+    text = parse_pdf(TextDocument(short))
+    assert text.startswith("Оглавление , часть первая") and process_pdf(TextDocument(short)) == processText(text)
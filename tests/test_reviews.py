@@ -0,0 +1,78 @@
+import pytest
+
+from models.card import Card
+from utils.decks import DeckStore
+from utils.reviews import DAY, ReviewStore, sm2
+
+NEW = dict(userId = "u", cardId = 1, due = 0.0, interval = 0.0, ease = 2.5, reps = 0, lapses = 0, lastReview = None)
+
+
+def test_sm2_intervals_grow_after_correct_answers() :
+    state = NEW
+    intervals = []
+    for _ in range(4) :
+        state = sm2(state, 4, 0.0)
+        intervals.append(state["interval"])
+    assert intervals[:2] == [1.0, 6.0]
+    assert intervals[2] == pytest.approx(6.0 * 2.5, abs = 0.01)
+    assert intervals[3] > intervals[2]
+    assert state["reps"] == 4 and state["ease"] == pytest.approx(2.5)
+    assert state["due"] == state["interval"] * DAY
+
+
+def test_sm2_lapse_resets_and_lowers_ease() :
+    state = sm2(sm2(sm2(NEW, 5, 0.0), 5, 0.0), 1, 100.0)
+    assert state["reps"] == 0 and state["interval"] == 1.0 and state["lapses"] == 1
+    assert state["ease"] < 2.7
+    assert state["lastReview"] == 100.0 and state["due"] == 100.0 + DAY
+
+
+def test_sm2_ease_has_floor() :
+    state = NEW
+    for _ in range(10) :
+        state = sm2(state, 0, 0.0)
+    assert state["ease"] == 1.3
+
+
+@pytest.fixture
+def stores(tmp_path) :
+    path = str(tmp_path / "decks.db")
+    return DeckStore(path), ReviewStore(path, path)
+
+
+def deckOf(decks : DeckStore , count : int) -> list :
+    deck = decks.save([Card(f"q{i}", f"a{i}") for i in range(count)], "deck")
+    return decks.cardIds(deck["id"])
+
+
+def test_deleted_deck_does_not_fill_due_limit(stores) :
+    decks, reviews = stores
+    old, live = deckOf(decks, 5), deckOf(decks, 3)
+    reviews.enroll("u", old, now = 1.0)
+    reviews.enroll("u", live, now = 2.0)
+    decks.delete(decks.card(old[0])["deckId"])
+
+    assert [s["cardId"] for s in reviews.due("u", limit = 3, now = 10.0)] == live
+    assert reviews.stats("u", now = 10.0)["total"] == 3
+
+
+def test_card_ids_are_not_reused_and_schedule_is_forgotten(stores) :
+    decks, reviews = stores
+    old = deckOf(decks, 3)
+    reviews.enroll("u", old, now = 1.0)
+    reviews.review("u", old[-1], 4, now = 1.0)
+    decks.delete(decks.card(old[0])["deckId"])
+    assert reviews.forget(old) == 4
+
+    new = deckOf(decks, 3)
+    assert not set(new) & set(old)
+    assert reviews.due("u", now = 10.0 * DAY) == []
+    assert reviews.history("u", old[-1]) == []
+
+
+def test_reviews_in_separate_file_join_attached_decks(tmp_path) :
+    decks = DeckStore(str(tmp_path / "decks.db"))
+    reviews = ReviewStore(str(tmp_path / "reviews.db"), str(tmp_path / "decks.db"))
+    ids = deckOf(decks, 2)
+    reviews.enroll("u", ids + [10 ** 6], now = 1.0)
+    assert [s["cardId"] for s in reviews.due("u", now = 2.0)] == ids
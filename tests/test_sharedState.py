@@ -0,0 +1,15 @@
+from utils.cache import ResultCache
+from utils.decks import DeckStore
+from utils.jobs import SqliteJobStore
+from utils.reviews import ReviewStore
+from utils.sharedState import BUSY_TIMEOUT, SharedState
+
+
+def test_every_store_uses_wal_and_busy_timeout(tmp_path) :
+    path = str(tmp_path / "shared.db")
+    stores = [
+        ResultCache("cards", path = path), SqliteJobStore(path), DeckStore(path), ReviewStore(path), SharedState(path),
+    ]
+    for store in stores :
+        assert store._db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert store._db.execute("PRAGMA busy_timeout").fetchone()[0] == int(BUSY_TIMEOUT * 1000)
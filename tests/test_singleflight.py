@@ -0,0 +1,153 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+class BusyLease :
+    """
+    Аренда занята другим воркером, пока её не отпустят в тесте
+    """
+    def __init__(self):
+        self.free = False
+        self.writes = 0
+        self.reads = 0
+
+    def tryLease(self , key , ttl) :
+        self.writes += 1
+        return self.free
+
+    def isLeased(self , key) :
+        self.reads += 1
+        return not self.free
+
+    def release(self , key) :
+        pass
+
+
+class Upload :
+    def __init__(self):
+        self.closed = 0
+
+    def close(self) :
+        self.closed += 1
+
+    def read(self) :
+        if self.closed :
+            raise AttributeError("upload already closed")
+        return "content"
+
+
+def test_creator_disconnect_keeps_upload_until_computed() :
+    lease = BusyLease()
+    flight = SingleFlight("test", lease, pollInterval = 0.01)
+    creatorUpload, joinerUpload = Upload(), Upload()
+
+    async def compute() :
+        return creatorUpload.read()
+
+    async def run() :
+        creator = asyncio.create_task(flight.do("doc", compute, release = creatorUpload.close))
+        await asyncio.sleep(0.02)
+        joiner = asyncio.create_task(flight.do("doc", compute, release = joinerUpload.close))
+        await asyncio.sleep(0.02)
+        # запрос-создатель отключился, пока вычисление ждёт аренду другого воркера
+        creator.cancel()
+        with pytest.raises(asyncio.CancelledError) :
+            await creator
+        assert creatorUpload.closed == 0
+        assert joinerUpload.closed == 1
+        lease.free = True
+        return await joiner
+
+    assert asyncio.run(run()) == "content"
+    assert creatorUpload.closed == 1
+
+
+def test_release_runs_when_computation_fails() :
+    flight = SingleFlight("test")
+    upload = Upload()
+
+    async def fail() :
+        raise ValueError("broken pdf")
+
+    with pytest.raises(ValueError) :
+        asyncio.run(flight.do("doc", fail, release = upload.close))
+    assert upload.closed == 1
+
+
+def test_identical_calls_share_one_computation() :
+    flight = SingleFlight("test")
+    calls = []
+
+    async def compute() :
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def run() :
+        return await asyncio.gather(*(flight.do("doc", compute) for _ in range(5)))
+
+    assert asyncio.run(run()) == [1] * 5
+    assert flight.stats()["shared"] == 4
+
+
+def test_lease_is_renewed_while_computing(tmp_path) :
+    from utils.sharedState import SharedState
+
+    path = str(tmp_path / "shared.db")
+    worker, other = SharedState(path), SharedState(path)
+    flight = SingleFlight("test", worker, leaseTtl = 0.15, pollInterval = 0.01)
+    stolen = []
+
+    async def slowCompute() :
+        # вычисление идёт в несколько раз дольше TTL аренды; второй воркер не должен её перехватить
+        for _ in range(10) :
+            await asyncio.sleep(0.05)
+            stolen.append(other.tryLease("doc", 0.15))
+        return "cards"
+
+    assert asyncio.run(flight.do("doc", slowCompute)) == "cards"
+    assert not any(stolen)
+    assert other.tryLease("doc", 0.15)
+
+
+def test_waiters_poll_busy_lease_by_reading_with_backoff() :
+    lease = BusyLease()
+    flight = SingleFlight("test", lease, pollInterval = 0.01, maxPollInterval = 0.08)
+
+    async def compute() :
+        return "cards"
+
+    async def run() :
+        waiter = asyncio.create_task(flight.do("doc", compute))
+        await asyncio.sleep(0.4)
+        lease.free = True
+        return await waiter
+
+    assert asyncio.run(run()) == "cards"
+    # блокировку записи берут только первая попытка и попытка после освобождения
+    assert lease.writes == 2
+    # паузы 0.01, 0.02, 0.04 и дальше по 0.08: за 0.4 с — около восьми чтений, а не сорок
+    assert 4 <= lease.reads <= 10
+    assert flight.stats()["remote"] == 1
+
+
+def test_lease_check_does_not_wait_for_the_write_lock(tmp_path) :
+    from utils.sharedState import SharedState
+
+    path = str(tmp_path / "shared.db")
+    owner, writer, waiter = SharedState(path), SharedState(path), SharedState(path)
+    assert owner.tryLease("doc", 30)
+    with writer.transaction() :
+        # другой воркер держит BEGIN IMMEDIATE: проверка аренды чтением не ждёт busy_timeout
+        started = time.perf_counter()
+        assert waiter.isLeased("doc")
+        assert time.perf_counter() - started < 0.5
+    owner.release("doc")
+    assert not waiter.isLeased("doc")
+    assert owner.tryLease("short", 0.01)
+    time.sleep(0.02)
+    assert not waiter.isLeased("short")
@@ -0,0 +1,115 @@
+import asyncio
+import contextlib
+
+import pytest
+
+from models.card import Card
+from models.cardGenerator import CardGenerator, CardStreamParser
+
+TEXT = (
+    "Фотосинтез превращает энергию света в химическую энергию органических веществ. "
+    "Хлорофилл поглощает в основном синий и красный свет и отражает зелёный. "
+    "Световые реакции идут в мембранах тилакоидов и дают АТФ и НАДФН. "
+    "Цикл Кальвина связывает углекислый газ в строме хлоропласта. "
+    "Кислород при фотосинтезе выделяется из молекул воды."
+)
+GEMINI_OUTPUT = (
+    "Q: Что делает фотосинтез?\nA: Превращает энергию света в химическую.\n\n"
+    "Q: Какой свет поглощает хлорофилл?\nA: В основном синий и красный.\n\n"
+    "Q: Где идёт цикл Кальвина?\nA: В строме хлоропласта."
+)
+
+
+def test_parser_emits_a_card_once_the_next_one_starts() :
+    parser = CardStreamParser()
+    assert parser.feed("Q: Что делает фотосинтез?\nA: Превращает энергию") == []
+    assert parser.feed(" света в химическую.\nQ: Где идёт") == [
+        Card("Что делает фотосинтез?", "Превращает энергию света в химическую.")
+    ]
+    assert parser.feed(" цикл Кальвина?\nA: В строме хлоропласта.") == []
+    assert parser.close() == [Card("Где идёт цикл Кальвина?", "В строме хлоропласта.")]
+
+
+def test_parser_drops_too_short_cards() :
+    parser = CardStreamParser()
+    assert parser.feed("Q: Кто?\nA: Он.\nQ: Что?\nA: Это.\n") == []
+    assert parser.close() == []
+
+
+def collect(generator : CardGenerator , numCards : int) -> list :
+    async def run() :
+        return [card async for card in generator.streamCards(TEXT, numCards = numCards)]
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def generator() :
+    generator = CardGenerator()
+    generator.use_ai = True
+    return generator
+
+
+def test_stream_cards_yields_gemini_cards_up_to_num_cards(generator , monkeypatch) :
+    async def fakeStream(prompt , generation_config = None) :
+        for i in range(0, len(GEMINI_OUTPUT), 7) :
+            yield GEMINI_OUTPUT[i:i + 7]
+    monkeypatch.setattr(generator, "streamGemini", fakeStream)
+
+    cards = collect(generator, 2)
+    assert [card.question for card in cards] == ["Что делает фотосинтез?", "Какой свет поглощает хлорофилл?"]
+
+
+def test_stream_cards_falls_back_to_offline_cards(generator , monkeypatch) :
+    async def brokenStream(prompt , generation_config = None) :
+        yield "Q: Что делает фотосинтез?\nA: Превращает энергию света в химическую.\nQ: "
+        raise RuntimeError("quota exceeded")
+    monkeypatch.setattr(generator, "streamGemini", brokenStream)
+
+    cards = collect(generator, 3)
+    assert len(cards) == 3
+    assert cards[0].question == "Что делает фотосинтез?"
+
+
+def test_closed_stream_finishes_its_producer(generator , monkeypatch) :
+    closed = []
+
+    async def hangingStream(prompt , generation_config = None) :
+        try :
+            yield "Q: Что делает фотосинтез?\nA: Превращает энергию света в химическую.\nQ: "
+            await asyncio.Event().wait()
+        finally :
+            closed.append(prompt)
+    monkeypatch.setattr(generator, "streamGemini", hangingStream)
+
+    async def run() :
+        # клиент забрал одну карточку и отключился
+        async with contextlib.aclosing(generator.streamCards(TEXT, numCards = 3)) as cards :
+            async for card in cards :
+                break
+        return card , [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    card , pending = asyncio.run(run())
+    assert card.question == "Что делает фотосинтез?"
+    assert pending == [] and len(closed) == 1
+
+
+def test_text_stream_as_ndjson(client) :
+    response = client.post("/generate/text/stream", json = {"text" : TEXT, "numCards" : 3})
+    assert response.status == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = response.lines()
+    assert events[-1] == {"done" : True, "total" : 3}
+    assert all(event["question"] and event["answer"] for event in events[:-1])
+
+
+def test_text_stream_as_sse(client) :
+    response = client.post("/generate/text/stream", params = {"format" : "sse"}, json = {"text" : TEXT, "numCards" : 2})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = response.body.decode().split("\n\n")
+    assert [event.split("\n")[0] for event in events if event] == ["event: card", "event: card", "event: done"]
+
+
+def test_stream_rejects_unknown_format_and_non_pdf(client) :
+    assert client.post("/generate/text/stream", params = {"format" : "xml"}, json = {"text" : TEXT}).status == 400
+    response = client.post("/generate/pdf/stream", files = {"file" : ("notes.txt", b"plain text")})
+    assert response.status == 400
@@ -0,0 +1,33 @@
+import random
+
+from utils.textProcessor import processText, processTextStream
+
+PIECES = (
+    "Слово", "word", "Page", "Страница", "12", "7", " ", "  ", "\t", "\n", "\n\n", "\n \n", "\x00", "\x0c",
+    ".", ",", "!", "?", ";", ":", "«", "»", "http://example.com/a", "mail@example.com", "a", "б",
+)
+
+
+def streamed(chunks) -> str :
+    return "\n\n".join(processTextStream(chunks))
+
+
+def test_paragraph_starting_with_punctuation() :
+    text = "Первый абзац\n\n. Второй абзац"
+    assert streamed(["Первый абзац\n\n", ". Второй абзац"]) == processText(text)
+
+
+def test_stream_matches_process_text_on_random_input() :
+    rnd = random.Random(7)
+    for _ in range(3000) :
+        text = "".join(rnd.choice(PIECES) for _ in range(rnd.randint(1, 40)))
+        if not text.strip() :
+            continue
+        cuts = sorted(rnd.sample(range(len(text) + 1), min(len(text) + 1, rnd.randint(0, 6))))
+        chunks = [text[a:b] for a , b in zip([0] + cuts, cuts + [len(text)])]
+        assert streamed(chunks) == processText(text), repr(chunks)
+
+
+def test_stream_still_splits_plain_paragraphs() :
+    blocks = list(processTextStream(["Первый абзац.\n\nВторой", " абзац.\n\n", "Третий абзац."]))
+    assert blocks == ["Первый абзац.", "Второй абзац.", "Третий абзац."]
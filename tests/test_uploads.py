@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from utils.uploads import UploadError, receiveForm
+
+BOUNDARY = "xyz"
+PDF = b"%PDF-1.4\n" + b"x" * 3000
+
+
+class FakeRequest :
+    def __init__(self , body : bytes , chunkSize : int = 64):
+        self.body = body
+        self.chunkSize = chunkSize
+        self.read = 0
+        # без Content-Length, как при chunked-передаче
+        self.headers = {"content-type" : f"multipart/form-data; boundary={BOUNDARY}"}
+
+    async def stream(self) :
+        for i in range(0, len(self.body), self.chunkSize) :
+            self.read = i + self.chunkSize
+            yield self.body[i:i + self.chunkSize]
+
+
+def multipart(fields = () , files = ()) -> bytes :
+    body = b""
+    for name , value in fields :
+        body += f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+    for name , filename , content in files :
+        body += (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                 'Content-Type: application/pdf\r\n\r\n').encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def receive(body : bytes , failFast : bool = False , **limits) :
+    return asyncio.run(receiveForm(FakeRequest(body), failFast = failFast, **limits))
+
+
+def test_small_pdf_stays_in_memory() :
+    form = receive(multipart([("numCards", "5")], [("file", "a.pdf", PDF)]), spoolBytes = 10000)
+    upload = form.files["file"][0]
+    assert form.field("numCards") == "5"
+    assert (upload.error, upload.path, upload.size) == (None, None, len(PDF))
+    assert upload.source == PDF
+    assert upload.hash == hashlib.sha256(PDF).hexdigest()
+
+
+def test_large_pdf_is_spooled_to_a_file_and_removed_on_close(tmp_path , monkeypatch) :
+    monkeypatch.setenv("UPLOAD_TMP_DIR", str(tmp_path))
+    form = receive(multipart(files = [("file", "a.pdf", PDF)]), spoolBytes = 1000)
+    upload = form.files["file"][0]
+    assert upload.source == upload.path and os.path.dirname(upload.path) == str(tmp_path)
+    assert open(upload.path, "rb").read() == PDF
+    form.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_pdf_signature_may_follow_a_short_preamble() :
+    assert receive(multipart(files = [("file", "a.pdf", b"\x00" * 500 + PDF)])).files["file"][0].error is None
+    for content in (b"x" * 2000, b"plain text") :
+        assert receive(multipart(files = [("file", "a.pdf", content)])).files["file"][0].error == "Файл не является PDF"
+
+
+def test_fail_fast_stops_reading_at_the_size_limit() :
+    request = FakeRequest(multipart(files = [("file", "a.pdf", PDF + b"x" * 100000)]))
+    with pytest.raises(UploadError, match = "Файл слишком большой") :
+        asyncio.run(receiveForm(request, maxFileBytes = 5000))
+    assert request.read < 6000
+
+
+def test_fail_fast_rejects_wrong_suffix_before_the_content() :
+    request = FakeRequest(multipart(files = [("file", "a.txt", PDF)]))
+    with pytest.raises(UploadError, match = "Разрешены только PDF файлы") :
+        asyncio.run(receiveForm(request))
+    assert request.read < len(PDF)
+
+
+def test_batch_keeps_per_file_errors() :
+    form = receive(multipart([("texts", "t")], [("files", "a.pdf", b"%PDF-1.4 x"), ("files", "b.txt", b"x")]))
+    assert form.fields == {"texts" : ["t"]}
+    assert [upload.error for upload in form.files["files"]] == [None, "Разрешены только PDF файлы"]
+    form.close()
+
+
+def test_total_request_bytes_are_limited_without_fail_fast() :
+    # каждый файл меньше своего лимита, но вместе больше лимита запроса
+    files = [("files", f"{i}.pdf", b"%PDF-" + b"x" * 1000) for i in range(5)]
+    with pytest.raises(UploadError, match = "Запрос слишком большой") :
+        receive(multipart(files = files), maxFileBytes = 2000, maxRequestBytes = 3000)
+
+
+def test_part_count_is_limited_without_fail_fast() :
+    with pytest.raises(UploadError, match = "Слишком много файлов и полей") :
+        receive(multipart(fields = [("texts", "t")] * 4), maxParts = 3)
+
+
+def test_urlencoded_form_has_only_fields_and_the_same_limits() :
+    def receiveUrlencoded(body : bytes , **limits) :
+        request = FakeRequest(body)
+        request.headers = {"content-type" : "application/x-www-form-urlencoded"}
+        return asyncio.run(receiveForm(request, **limits))
+
+    form = receiveUrlencoded(b"texts=%D1%82%D0%B5%D0%BA%D1%81%D1%82&texts=b+c&numCards=2")
+    assert (form.fields, form.files) == ({"texts" : ["текст", "b c"], "numCards" : ["2"]}, {})
+    with pytest.raises(UploadError, match = "Слишком много файлов и полей") :
+        receiveUrlencoded(b"texts=t&" * 4, maxParts = 3)
+    with pytest.raises(UploadError, match = "Поле texts слишком большое") :
+        receiveUrlencoded(b"texts=" + b"x" * 100, maxFieldBytes = 50)
+
+
+def test_pdf_endpoint_rejects_bad_uploads(client , monkeypatch) :
+    response = client.post("/generate/pdf", files = {"file" : ("notes.pdf", b"plain text, not a pdf")})
+    assert (response.status, response.json()["detail"]) == (400, "Файл не является PDF")
+    monkeypatch.setenv("UPLOAD_MAX_BYTES", "1000")
+    response = client.post("/generate/pdf", files = {"file" : ("big.pdf", PDF)})
+    assert response.status == 400 and response.json()["detail"].startswith("Файл слишком большой")
+    assert client.post("/generate/pdf", fields = {"numCards" : "3"}).status == 400
@@ -0,0 +1,84 @@
+"""
+Локальный фейковый сервер Gemini REST API для тестов GeminiClient (повторы, rate limit, circuit breaker).
+
+    python -m tools.fakeGeminiServer --port 8090 --error-rate 0.2 --latency 0.5
+    GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=http://127.0.0.1:8090 uvicorn app:app
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from models.fakeLlm import fakeCompletion
+
+ERRORS = {
+    429 : "RESOURCE_EXHAUSTED",
+    500 : "INTERNAL",
+    503 : "UNAVAILABLE",
+}
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler) :
+    settings = argparse.Namespace(latency = 0.3, jitter = 0.2, errorRate = 0.0, errorCodes = [429, 503])
+
+    def _send(self , status : int , payload) :
+        body = json.dumps(payload, ensure_ascii = False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) :
+        length = int(self.headers.get("Content-Length", "0"))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        settings = self.settings
+
+        time.sleep(max(0.0, random.gauss(settings.latency, settings.jitter)))
+        if random.random() < settings.errorRate :
+            code = random.choice(settings.errorCodes)
+            self._send(code, {"error" : {"code" : code, "message" : "fake error", "status" : ERRORS.get(code, "UNKNOWN")}})
+            return
+
+        prompt = "".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        candidate = {
+            "content" : {"parts" : [{"text" : fakeCompletion(prompt)}], "role" : "model"},
+            "finishReason" : 1,
+            "index" : 0,
+        }
+        payload = {"candidates" : [candidate]}
+        # streamGenerateContent в REST отдаёт JSON-массив ответов
+        self._send(200, [payload] if ":streamGenerateContent" in self.path else payload)
+
+    def log_message(self , format , *args) :
+        pass
+
+
+def main() :
+    parser = argparse.ArgumentParser(description = "Фейковый Gemini REST сервер")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8090)
+    parser.add_argument("--latency", type = float, default = 0.3, help = "средняя задержка ответа, с")
+    parser.add_argument("--jitter", type = float, default = 0.2, help = "стандартное отклонение задержки, с")
+    parser.add_argument("--error-rate", type = float, default = 0.0, help = "доля ответов с ошибкой")
+    parser.add_argument("--error-codes", default = "429,503", help = "HTTP коды ошибок через запятую")
+    args = parser.parse_args()
+
+    FakeGeminiHandler.settings = argparse.Namespace(
+        latency = args.latency,
+        jitter = args.jitter,
+        errorRate = args.error_rate,
+        errorCodes = [int(c) for c in args.error_codes.split(',')],
+    )
+    server = ThreadingHTTPServer((args.host, args.port), FakeGeminiHandler)
+    print(f"🧪 Фейковый Gemini слушает http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__" :
+    main()
@@ -0,0 +1,198 @@
+"""
+Генератор нагрузки для API: смесь запросов с текстом и PDF (и потоковых) с заданной параллельностью.
+Отчёт: запросы в секунду, перцентили задержки и доля ошибок по каждому виду запроса.
+
+    LLM_BACKEND=fake FAKE_LLM_ERROR_RATE=0.05 uvicorn app:app --port 8004
+    python -m tools.loadTest --url http://127.0.0.1:8004 --concurrency 32 --duration 60 --pdf-share 0.3
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from benchmarks.benchPipeline import multipartBody
+from benchmarks.corpus import makePages, makePdf
+
+
+class Workload :
+    """
+    Готовит тела запросов заранее, чтобы генерация документов не попадала в замер
+    """
+    def __init__(self , pages : List[int] , languages : List[str] , numCards : int , uniqueShare : float , seed : int = 0):
+        self.numCards = numCards
+        self.uniqueShare = uniqueShare
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.documents = [
+            makePages(size, language, seed)
+            for size in pages for language in languages
+        ]
+        self._pdfs = [makePdf(document) for document in self.documents]
+
+    def _variant(self , index : int) -> tuple :
+        # уникальная добавка, чтобы запрос не попал в кэш и не склеился с соседним (single-flight)
+        with self._lock :
+            unique = self.random.random() < self.uniqueShare
+            nonce = self.random.getrandbits(64) if unique else None
+        return index, nonce
+
+    def pick(self) -> int :
+        with self._lock :
+            return self.random.randrange(len(self.documents))
+
+    def textRequest(self , stream : bool = False) -> tuple :
+        index, nonce = self._variant(self.pick())
+        text = "\n\n".join(self.documents[index])
+        if nonce is not None :
+            text += f"\n\nЗапрос {nonce}. Уникальный хвост документа для обхода кэша."
+        body = json.dumps({"text" : text, "numCards" : self.numCards}, ensure_ascii = False).encode('utf-8')
+        path = "/generate/text/stream" if stream else "/generate/text"
+        return path, body, {"Content-Type" : "application/json"}
+
+    def pdfRequest(self , stream : bool = False) -> tuple :
+        index, nonce = self._variant(self.pick())
+        if nonce is not None :
+            pdf = makePdf(self.documents[index] + [f"Request {nonce}. Unique trailing page."])
+        else :
+            pdf = self._pdfs[index]
+        body, headers = multipartBody("file", "load.pdf", pdf)
+        path = "/generate/pdf/stream" if stream else "/generate/pdf"
+        return f"{path}?numCards={self.numCards}", body, headers
+
+
+def percentile(samples : List[float] , q : float) -> float :
+    if not samples :
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def send(url : str , path : str , body : bytes , headers : Dict[str, str] , timeout : float) -> tuple :
+    request = urllib.request.Request(url + path, data = body, headers = headers, method = "POST")
+    started = time.perf_counter()
+    firstByte = None
+    try :
+        with urllib.request.urlopen(request, timeout = timeout) as response :
+            response.read(1)
+            firstByte = time.perf_counter() - started
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e :
+        status = e.code
+    except Exception as e :
+        status = type(e).__name__
+    return status, time.perf_counter() - started, firstByte
+
+
+def run(url : str , concurrency : int , duration : float , requests : int , workload : Workload ,
+        pdfShare : float , streamShare : float , timeout : float) -> dict :
+    results = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+    issued = 0
+    chooser = random.Random(1)
+
+    def nextRequest() :
+        nonlocal issued
+        with lock :
+            if (requests and issued >= requests) or (deadline and time.perf_counter() >= deadline) :
+                return None
+            issued += 1
+            isPdf = chooser.random() < pdfShare
+            stream = chooser.random() < streamShare
+        kind = ("pdf" if isPdf else "text") + ("_stream" if stream else "")
+        build = workload.pdfRequest if isPdf else workload.textRequest
+        return (kind,) + build(stream)
+
+    def worker() :
+        while True :
+            request = nextRequest()
+            if request is None :
+                return
+            kind, path, body, headers = request
+            status, elapsed, firstByte = send(url, path, body, headers, timeout)
+            with lock :
+                results[kind].append((status, elapsed, firstByte))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers = concurrency) as pool :
+        for _ in range(concurrency) :
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+
+    report = {"concurrency" : concurrency, "seconds" : wall, "kinds" : {}}
+    allSamples = []
+    for kind, samples in sorted(results.items()) :
+        latencies = [elapsed for status, elapsed, _ in samples if status == 200]
+        firstBytes = [first for status, _, first in samples if status == 200 and first is not None]
+        statuses = Counter(str(status) for status, _, _ in samples)
+        errors = sum(count for status, count in statuses.items() if status != "200")
+        allSamples.extend(samples)
+        report["kinds"][kind] = {
+            "requests" : len(samples),
+            "rps" : len(samples) / wall if wall else 0.0,
+            "errorRate" : errors / len(samples) if samples else 0.0,
+            "statuses" : dict(statuses),
+            "p50" : percentile(latencies, 50),
+            "p90" : percentile(latencies, 90),
+            "p95" : percentile(latencies, 95),
+            "p99" : percentile(latencies, 99),
+            "max" : max(latencies, default = 0.0),
+            "firstByteP50" : percentile(firstBytes, 50),
+        }
+    errors = sum(1 for status, _, _ in allSamples if status != 200)
+    report["total"] = {
+        "requests" : len(allSamples),
+        "rps" : len(allSamples) / wall if wall else 0.0,
+        "errorRate" : errors / len(allSamples) if allSamples else 0.0,
+        "p50" : percentile([e for s, e, _ in allSamples if s == 200], 50),
+        "p99" : percentile([e for s, e, _ in allSamples if s == 200], 99),
+    }
+    return report
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = "Нагрузочный тест API генерации карточек")
+    parser.add_argument("--url", default = "http://127.0.0.1:8004")
+    parser.add_argument("--concurrency", type = int, default = 16)
+    parser.add_argument("--duration", type = float, default = 30, help = "длительность, с (0 — до --requests)")
+    parser.add_argument("--requests", type = int, default = 0, help = "число запросов (0 — без ограничения)")
+    parser.add_argument("--pdf-share", type = float, default = 0.3, help = "доля запросов с PDF")
+    parser.add_argument("--stream-share", type = float, default = 0.0, help = "доля потоковых запросов")
+    parser.add_argument("--unique-share", type = float, default = 1.0, help = "доля уникальных документов (остальные повторяются)")
+    parser.add_argument("--pages", default = "1,10", help = "размеры документов в страницах")
+    parser.add_argument("--languages", default = "ru,en")
+    parser.add_argument("--num-cards", type = int, default = 10)
+    parser.add_argument("--timeout", type = float, default = 120)
+    parser.add_argument("--out", default = None, help = "сохранить отчёт в JSON")
+    args = parser.parse_args()
+    if not args.duration and not args.requests :
+        parser.error("нужен --duration или --requests")
+
+    workload = Workload(
+        [int(p) for p in args.pages.split(',') if p],
+        [l for l in args.languages.split(',') if l],
+        args.num_cards,
+        args.unique_share,
+    )
+    print(f"🚀 {args.url}: параллельность {args.concurrency}, PDF {args.pdf_share:.0%}, поток {args.stream_share:.0%}")
+    report = run(args.url, args.concurrency, args.duration, args.requests, workload,
+                 args.pdf_share, args.stream_share, args.timeout)
+
+    for kind, stats in report["kinds"].items() :
+        print(f"📊 {kind:<12} {stats['requests']:6d} запр. {stats['rps']:7.1f} rps  "
+              f"p50 {stats['p50'] * 1000:8.0f}  p95 {stats['p95'] * 1000:8.0f}  p99 {stats['p99'] * 1000:8.0f} мс  "
+              f"ошибки {stats['errorRate']:.1%} {stats['statuses']}")
+    total = report["total"]
+    print(f"✅ Всего {total['requests']} запросов, {total['rps']:.1f} rps, ошибки {total['errorRate']:.1%}, "
+          f"p50 {total['p50'] * 1000:.0f} мс, p99 {total['p99'] * 1000:.0f} мс")
+    if args.out :
+        with open(args.out, "w", encoding = "utf-8") as f :
+            json.dump(report, f, ensure_ascii = False, indent = 2)
@@ -0,0 +1,200 @@
+"""
+Проверка режима с несколькими воркерами: поднимает несколько процессов приложения с фейковой моделью и общим
+SHARED_STATE_DB и убеждается, что
+  - одинаковые одновременные запросы, попавшие в разные воркеры, вызывают модель один раз;
+  - лимит GEMINI_RATE_LIMIT соблюдается суммарно по всем воркерам;
+  - задачу, созданную в одном воркере, видно из любого;
+  - gunicorn.conf.py поднимает заданное число воркеров.
+Код выхода 1, если что-то не так.
+
+    python -m tools.multiWorkerCheck --workers 3
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.benchStartup import freePort
+from benchmarks.corpus import makePages
+
+
+class Cluster :
+    """
+    N процессов приложения на своих портах с общим SHARED_STATE_DB. Как и воркеры gunicorn, они не делят память,
+    но запросы раздаются по кругу детерминированно: проверка не зависит от того, какой воркер ядро разбудит на accept
+    """
+    def __init__(self , workers : int , directory : str , rate : float , burst : float):
+        self.callLog = os.path.join(directory, "calls.log")
+        self.env = dict(
+            os.environ,
+            PYTHONPATH = os.pathsep.join(filter(None, (os.getcwd(), os.getenv("PYTHONPATH")))),
+            LLM_BACKEND = "fake",
+            FAKE_LLM_LATENCY = "1",
+            FAKE_LLM_LATENCY_SIGMA = "0",
+            FAKE_LLM_CHUNK_DELAY = "0",
+            FAKE_LLM_ERROR_RATE = "0",
+            FAKE_LLM_CALL_LOG = self.callLog,
+            GEMINI_RATE_LIMIT = str(rate),
+            GEMINI_RATE_BURST = str(burst),
+            SHARED_STATE_DB = os.path.join(directory, "shared.db"),
+            DECKS_DB = os.path.join(directory, "decks.db"),
+            PDF_PARSE_WORKERS = "1",
+        )
+        self.ports = [freePort() for _ in range(workers)]
+        self.processes = [
+            subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+                env = self.env, stdout = subprocess.DEVNULL
+            )
+            for port in self.ports
+        ]
+        self._next = itertools.count()
+
+    def waitReady(self , timeout : float = 60) :
+        for port in self.ports :
+            waitHealth(port, timeout)
+
+    def request(self , method : str , path : str , body : bytes = None , headers : dict = None) -> dict :
+        port = self.ports[next(self._next) % len(self.ports)]
+        return call(port, method, path, body, headers)
+
+    def postJson(self , path : str , payload : dict) -> dict :
+        return self.request("POST", path, json.dumps(payload).encode(), {"content-type" : "application/json"})
+
+    def calls(self) -> list :
+        if not os.path.exists(self.callLog) :
+            return []
+        with open(self.callLog, encoding = "utf-8") as f :
+            return [float(line.split()[0]) for line in f if line.strip()]
+
+    def stop(self) :
+        for process in self.processes :
+            process.terminate()
+        for process in self.processes :
+            process.wait(timeout = 30)
+
+
+def call(port : int , method : str , path : str , body : bytes = None , headers : dict = None) -> dict :
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data = body, method = method, headers = headers or {})
+    with urllib.request.urlopen(request, timeout = 120) as response :
+        return json.loads(response.read())
+
+
+def waitHealth(port : int , timeout : float = 60) -> dict :
+    started = time.time()
+    while time.time() - started < timeout :
+        try :
+            return call(port, "GET", "/health")
+        except (urllib.error.URLError, ConnectionError) :
+            time.sleep(0.1)
+    raise TimeoutError(f"сервер на порту {port} не поднялся")
+
+
+def textForm(text : str , numCards : int , boundary : str = "checkBoundary") -> tuple :
+    body = "".join(
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n"
+        for name, value in (("text", text), ("numCards", numCards))
+    ) + f"--{boundary}--\r\n"
+    return body.encode(), {"content-type" : f"multipart/form-data; boundary={boundary}"}
+
+
+def checkWorkers(server : Cluster , workers : int) -> tuple :
+    pids = {server.request("GET", "/health")["worker"] for _ in range(workers)}
+    return len(pids) == workers, f"ответили воркеры {sorted(pids)}"
+
+
+def checkGunicorn(env : dict , workers : int) -> tuple :
+    # сам конфиг: gunicorn поднимает заданное число воркеров и отвечает на /health
+    port = freePort()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app", "--log-level", "warning"],
+        env = dict(env, PORT = str(port), WEB_CONCURRENCY = str(workers)), stdout = subprocess.DEVNULL
+    )
+    try :
+        health = waitHealth(port)
+        children = subprocess.run(["pgrep", "-P", str(process.pid)], capture_output = True, text = True).stdout.split()
+        return len(children) == workers, f"gunicorn: {len(children)} воркеров, /health ответил воркер {health['worker']}"
+    finally :
+        process.terminate()
+        process.wait(timeout = 30)
+
+
+def checkCoalescing(server : Cluster , concurrency : int) -> tuple :
+    text = "\n".join(makePages(1, "ru", seed = 42))[:3000]
+    before = len(server.calls())
+    with ThreadPoolExecutor(concurrency) as pool :
+        results = list(pool.map(lambda _ : server.postJson("/generate/text", {"text" : text, "numCards" : 5}), range(concurrency)))
+    calls = len(server.calls()) - before
+    # эталон: сколько вызовов модели нужно одному запросу с другим документом той же длины
+    before = len(server.calls())
+    server.postJson("/generate/text", {"text" : "\n".join(makePages(1, "ru", seed = 43))[:3000], "numCards" : 5})
+    single = len(server.calls()) - before
+    same = all(r["cards"] == results[0]["cards"] for r in results)
+    return calls <= single and same, f"{concurrency} одинаковых запросов → {calls} вызовов модели (один запрос — {single})"
+
+
+def checkRateLimit(server : Cluster , requests : int , rate : float , burst : float) -> tuple :
+    texts = ["\n".join(makePages(1, "en", seed = 100 + i))[:2000] for i in range(requests)]
+    before = len(server.calls())
+    with ThreadPoolExecutor(requests) as pool :
+        list(pool.map(lambda text : server.postJson("/generate/text", {"text" : text, "numCards" : 3}), texts))
+    stamps = sorted(server.calls()[before:])
+    span = stamps[-1] - stamps[0]
+    observed = (len(stamps) - burst) / span if span > 0 else float("inf")
+    # небольшой запас на округление времени между процессами
+    return observed <= rate * 1.15, f"{len(stamps)} вызовов за {span:.2f} с → {observed:.1f}/с при лимите {rate:g}/с"
+
+
+def checkJobs(server : Cluster , polls : int) -> tuple :
+    body, headers = textForm("\n".join(makePages(1, "ru", seed = 7))[:2000], 3)
+    job = server.request("POST", "/jobs", body, headers)
+    deadline = time.time() + 60
+    seen = 0
+    while time.time() < deadline :
+        try :
+            status = server.request("GET", f"/jobs/{job['id']}")
+        except urllib.error.HTTPError as e :
+            return False, f"задачу {job['id'][:8]} не нашёл воркер после {seen} опросов (HTTP {e.code})"
+        seen += 1
+        if status["status"] == "done" and seen >= polls :
+            break
+        time.sleep(0.05)
+    cards = server.request("GET", f"/jobs/{job['id']}/cards")["cards"]
+    return bool(cards), f"задачу {job['id'][:8]} нашли все {seen} опросов, карточек: {len(cards)}"
+
+
+if __name__ == "__main__" :
+    parser = argparse.ArgumentParser(description = "Проверка общего состояния нескольких воркеров")
+    parser.add_argument("--workers", type = int, default = 3)
+    parser.add_argument("--concurrency", type = int, default = 12)
+    parser.add_argument("--rate", type = float, default = 5)
+    parser.add_argument("--burst", type = float, default = 2)
+    parser.add_argument("--rate-requests", type = int, default = 20)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory :
+        server = Cluster(args.workers, directory, args.rate, args.burst)
+        try :
+            server.waitReady()
+            checks = (
+                ("воркеры", lambda : checkWorkers(server, args.workers)),
+                ("single-flight", lambda : checkCoalescing(server, args.concurrency)),
+                ("лимит Gemini", lambda : checkRateLimit(server, args.rate_requests, args.rate, args.burst)),
+                ("задачи", lambda : checkJobs(server, args.workers * 10)),
+                ("gunicorn.conf.py", lambda : checkGunicorn(server.env, args.workers)),
+            )
+            for name, check in checks :
+                ok, detail = check()
+                failed = failed or not ok
+                print(f"{'✅' if ok else '❌'} {name}: {detail}")
+        finally :
+            server.stop()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+import orjson
+
+from utils.sharedState import connect, sharedPath
+
+
+def hashKey(*parts) -> str :
+    digest = hashlib.sha256()
+    for part in parts :
+        if not isinstance(part, bytes) :
+            part = str(part).encode('utf-8')
+        digest.update(part)
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class ResultCache :
+    """
+    Двухуровневый кэш: LRU в памяти + необязательный SQLite на диске (TTL и лимит по количеству записей)
+    """
+    def __init__(self , name : str , maxItems : int = 256 , ttl : float = 24 * 3600 , path : str = None , maxDiskItems : int = 10000 ,
+                 decode : Callable = None):
+        self.name = name
+        self.maxItems = maxItems
+        self.ttl = ttl
+        self.maxDiskItems = maxDiskItems
+        # восстанавливает объекты (например карточки) из JSON дискового уровня
+        self.decode = decode
+        self.hits = 0
+        self.misses = 0
+        self.diskHits = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # у каждого кэша своя таблица: несколько кэшей могут жить в одном файле (SHARED_STATE_DB)
+        self.table = f"cache_{name}"
+        self._db = None
+        if path :
+            self._db = connect(path)
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table}(accessed)")
+            self._db.commit()
+
+    @classmethod
+    def fromEnv(cls , name : str , prefix : str , decode : Callable = None) -> "ResultCache" :
+        return cls(
+            name,
+            maxItems = int(os.getenv(f"{prefix}_CACHE_SIZE", "256")),
+            ttl = float(os.getenv(f"{prefix}_CACHE_TTL", str(24 * 3600))),
+            path = sharedPath(f"{prefix}_CACHE_DB"),
+            maxDiskItems = int(os.getenv(f"{prefix}_CACHE_DISK_ITEMS", "10000")),
+            decode = decode,
+        )
+
+    def get(self , key : str) -> Optional[Any] :
+        now = time.time()
+        with self._lock :
+            entry = self._memory.get(key)
+            if entry is not None :
+                created, value = entry
+                if now - created <= self.ttl :
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None :
+                row = self._db.execute(
+                    f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl :
+                    self._db.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    value = orjson.loads(row[0])
+                    if self.decode :
+                        value = self.decode(value)
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    self.diskHits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self , key : str , value : Any) :
+        now = time.time()
+        with self._lock :
+            self._remember(key, now, value)
+            if self._db is not None :
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, orjson.dumps(value).decode('utf-8'), now, now)
+                )
+                self._evictDisk(now)
+                self._db.commit()
+
+    # дисковый уровень может ждать блокировку другого воркера: из асинхронного кода — через поток
+    async def getAsync(self , key : str) -> Optional[Any] :
+        if self._db is None :
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def setAsync(self , key : str , value : Any) :
+        if self._db is None :
+            return self.set(key, value)
+        await asyncio.to_thread(self.set, key, value)
+
+    def _remember(self , key : str , created : float , value : Any) :
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxItems :
+            self._memory.popitem(last = False)
+
+    def _evictDisk(self , now : float) :
+        self._db.execute(f"DELETE FROM {self.table} WHERE created < ?", (now - self.ttl,))
+        count = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.maxDiskItems :
+            self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY accessed LIMIT ?)",
+                (count - self.maxDiskItems,)
+            )
+
+    def clear(self) :
+        with self._lock :
+            self._memory.clear()
+            if self._db is not None :
+                self._db.execute(f"DELETE FROM {self.table}")
+                self._db.commit()
+
+    def stats(self) -> dict :
+        total = self.hits + self.misses
+        return {
+            "name" : self.name,
+            "hits" : self.hits,
+            "misses" : self.misses,
+            "diskHits" : self.diskHits,
+            "hitRate" : self.hits / total if total else 0.0,
+            "size" : len(self._memory),
+        }
@@ -0,0 +1,194 @@
+import csv
+import io
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from models.card import Card
+from utils.sharedState import connect
+
+DECK_COLUMNS = ('id', 'title', 'sourceHash', 'sourceKind', 'numCards', 'total', 'created')
+CARD_COLUMNS = ('id', 'deckId', 'position', 'question', 'answer', 'type', 'difficulty', 'start', 'end')
+# end — ключевое слово SQL, поэтому имена колонок в кавычках
+CARD_SELECT = ', '.join(f'"{c}"' for c in CARD_COLUMNS)
+EXPORT_FORMATS = ('csv', 'anki', 'json')
+
+
+class DeckStore :
+    """
+    Сохранённые колоды в SQLite. Список колод листается по ключу (created, id), карточки — по (deckId, position),
+    поэтому ни страница списка, ни экспорт не читают таблицу целиком
+    """
+    def __init__(self , path : str , exportBatch : int = 500):
+        self.exportBatch = exportBatch
+        self._lock = threading.Lock()
+        self._db = connect(path)
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS decks ("
+            "id TEXT PRIMARY KEY, title TEXT NOT NULL, sourceHash TEXT, sourceKind TEXT, "
+            "numCards INTEGER, total INTEGER NOT NULL, created REAL NOT NULL)"
+        )
+        # AUTOINCREMENT: id удалённой карточки не достаётся новой, и ссылки на карточки по id не указывают на чужую
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cards ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, deckId TEXT NOT NULL REFERENCES decks(id) ON DELETE CASCADE, "
+            "position INTEGER NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, "
+            'type TEXT, difficulty TEXT, start INTEGER NOT NULL DEFAULT -1, "end" INTEGER NOT NULL DEFAULT -1)'
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS decks_created ON decks(created, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS decks_source ON decks(sourceHash, numCards, created)")
+        self._db.execute("CREATE UNIQUE INDEX IF NOT EXISTS cards_deck ON cards(deckId, position)")
+        self._db.commit()
+
+    @classmethod
+    def fromEnv(cls) -> "DeckStore" :
+        return cls(os.getenv("DECKS_DB", "decks.db"))
+
+    def save(self , cards : List[Card] , title : str = None , sourceHash : str = None ,
+             sourceKind : str = None , numCards : int = None) -> Dict[str, Any] :
+        deck = {
+            "id" : uuid.uuid4().hex,
+            "title" : title or f"Колода от {time.strftime('%Y-%m-%d %H:%M')}",
+            "sourceHash" : sourceHash,
+            "sourceKind" : sourceKind,
+            "numCards" : numCards,
+            "total" : len(cards),
+            "created" : time.time(),
+        }
+        with self._lock :
+            with self._db :
+                self._db.execute(
+                    f"INSERT INTO decks ({', '.join(DECK_COLUMNS)}) VALUES ({', '.join('?' * len(DECK_COLUMNS))})",
+                    [deck[c] for c in DECK_COLUMNS]
+                )
+                self._db.executemany(
+                    'INSERT INTO cards (deckId, position, question, answer, type, difficulty, start, "end") '
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        (deck["id"], position, card.question, card.answer, card.type, card.difficulty, card.start, card.end)
+                        for position, card in enumerate(cards)
+                    )
+                )
+        return deck
+
+    def get(self , deckId : str) -> Optional[Dict[str, Any]] :
+        with self._lock :
+            row = self._db.execute(f"SELECT {', '.join(DECK_COLUMNS)} FROM decks WHERE id = ?", (deckId,)).fetchone()
+        return dict(zip(DECK_COLUMNS, row)) if row else None
+
+    def findBySource(self , sourceHash : str , numCards : int = None) -> Optional[Dict[str, Any]] :
+        query = f"SELECT {', '.join(DECK_COLUMNS)} FROM decks WHERE sourceHash = ?"
+        params = [sourceHash]
+        if numCards is not None :
+            query += " AND numCards = ?"
+            params.append(numCards)
+        with self._lock :
+            row = self._db.execute(query + " ORDER BY created DESC LIMIT 1", params).fetchone()
+        return dict(zip(DECK_COLUMNS, row)) if row else None
+
+    def list(self , limit : int = 20 , cursor : str = None , sourceHash : str = None) -> Tuple[List[Dict[str, Any]], Optional[str]] :
+        """
+        Новые колоды первыми. cursor — значение nextCursor с предыдущей страницы
+        """
+        query = f"SELECT {', '.join(DECK_COLUMNS)} FROM decks"
+        conditions, params = [], []
+        if sourceHash :
+            conditions.append("sourceHash = ?")
+            params.append(sourceHash)
+        if cursor :
+            created, deckId = decodeCursor(cursor)
+            conditions.append("(created < ? OR (created = ? AND id < ?))")
+            params += [created, created, deckId]
+        if conditions :
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY created DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock :
+            rows = self._db.execute(query, params).fetchall()
+        decks = [dict(zip(DECK_COLUMNS, row)) for row in rows[:limit]]
+        nextCursor = f"{decks[-1]['created']!r}:{decks[-1]['id']}" if len(rows) > limit else None
+        return decks, nextCursor
+
+    def cards(self , deckId : str , offset : int = 0 , limit : int = None) -> List[Dict[str, Any]] :
+        query = f"SELECT {CARD_SELECT} FROM cards WHERE deckId = ? AND position >= ? ORDER BY position"
+        params = [deckId, offset]
+        if limit is not None :
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock :
+            rows = self._db.execute(query, params).fetchall()
+        return [dict(zip(CARD_COLUMNS, row)) for row in rows]
+
+    def card(self , cardId : int) -> Optional[Dict[str, Any]] :
+        with self._lock :
+            row = self._db.execute(f"SELECT {CARD_SELECT} FROM cards WHERE id = ?", (cardId,)).fetchone()
+        return dict(zip(CARD_COLUMNS, row)) if row else None
+
+    def cardsByIds(self , cardIds : List[int]) -> Dict[int, Dict[str, Any]] :
+        if not cardIds :
+            return {}
+        with self._lock :
+            rows = self._db.execute(
+                f"SELECT {CARD_SELECT} FROM cards WHERE id IN ({', '.join('?' * len(cardIds))})", cardIds
+            ).fetchall()
+        return {row[0] : dict(zip(CARD_COLUMNS, row)) for row in rows}
+
+    def cardIds(self , deckId : str) -> List[int] :
+        with self._lock :
+            return [row[0] for row in self._db.execute("SELECT id FROM cards WHERE deckId = ? ORDER BY position", (deckId,))]
+
+    def iterCards(self , deckId : str) -> Iterator[Dict[str, Any]] :
+        # порциями по exportBatch: блокировка не держится, пока клиент читает ответ
+        position = 0
+        while True :
+            batch = self.cards(deckId, position, self.exportBatch)
+            yield from batch
+            if len(batch) < self.exportBatch :
+                return
+            position = batch[-1]["position"] + 1
+
+    def delete(self , deckId : str) -> bool :
+        with self._lock :
+            with self._db :
+                deleted = self._db.execute("DELETE FROM decks WHERE id = ?", (deckId,)).rowcount
+        return bool(deleted)
+
+
+def decodeCursor(cursor : str) -> Tuple[float, str] :
+    created, _, deckId = cursor.partition(':')
+    try :
+        return float(created), deckId
+    except ValueError :
+        raise ValueError("Некорректный курсор")
+
+
+def exportDeck(store : DeckStore , deck : Dict[str, Any] , fmt : str) -> Iterator[str] :
+    """
+    Экспорт колоды построчно; для anki — текстовый формат импорта Anki (поля через табуляцию)
+    """
+    cards = store.iterCards(deck["id"])
+    if fmt == "json" :
+        yield '{"deck": ' + json.dumps(deck, ensure_ascii = False) + ', "cards": ['
+        for i, card in enumerate(cards) :
+            yield ("," if i else "") + json.dumps({"question" : card["question"], "answer" : card["answer"]}, ensure_ascii = False)
+        yield "]}"
+        return
+
+    buffer = io.StringIO()
+    if fmt == "anki" :
+        yield "#separator:tab\n#html:false\n"
+        writer = csv.writer(buffer, delimiter = '\t', lineterminator = '\n')
+    else :
+        writer = csv.writer(buffer, lineterminator = '\n')
+        writer.writerow(("question", "answer"))
+    for card in cards :
+        writer.writerow((card["question"], card["answer"]))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell() :
+        yield buffer.getvalue()
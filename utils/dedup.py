@@ -0,0 +1,99 @@
+import os
+import re
+from typing import Dict, FrozenSet, List
+
+from utils.keywords import STOP_WORDS
+
+WORD_PATTERN = re.compile(r'\w+')
+MASK = (1 << 61) - 1
+
+
+def shingles(text : str , stem : int = 5) -> FrozenSet[str] :
+    """
+    Нормализованные слова (обрезанные до stem символов — грубая замена стемминга для падежей) и пары соседних слов
+    """
+    words = [w[:stem] for w in WORD_PATTERN.findall(text.lower()) if w not in STOP_WORDS]
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+class NearDuplicateIndex :
+    """
+    MinHash с одной перестановкой (хэш шингла раскладывается по bins корзинам) + LSH по полосам.
+    Кандидаты ищутся по совпадению полосы, точный коэффициент Жаккара считается только для них — без O(n²)
+    """
+    def __init__(self , threshold : float = 0.7 , bins : int = 48 , bands : int = 12):
+        self.threshold = threshold
+        self.bins = bins
+        self.bands = bands
+        self.rows = bins // bands
+        self._buckets : Dict[tuple, List[int]] = {}
+        self._sets : List[FrozenSet[str]] = []
+
+    def keys(self , items : FrozenSet[str]) -> List[tuple] :
+        bins, rows = self.bins, self.rows
+        signature = [MASK] * bins
+        for item in items :
+            h = hash(item) & MASK
+            slot = h % bins
+            if h < signature[slot] :
+                signature[slot] = h
+        # уплотнение: пустая корзина берёт значение ближайшей заполненной справа, чтобы короткие тексты тоже попадали в полосы
+        carry = MASK
+        for i in range(2 * bins - 1, -1, -1) :
+            value = signature[i % bins]
+            if value != MASK :
+                carry = value
+            elif i < bins :
+                signature[i] = carry ^ i
+        return [(band, tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def contains(self , items : FrozenSet[str] , keys : List[tuple]) -> bool :
+        checked = set()
+        for key in keys :
+            for candidate in self._buckets.get(key, ()) :
+                if candidate in checked :
+                    continue
+                checked.add(candidate)
+                other = self._sets[candidate]
+                if len(items & other) / len(items | other) >= self.threshold :
+                    return True
+        return False
+
+    def add(self , items : FrozenSet[str] , keys : List[tuple]) :
+        position = len(self._sets)
+        self._sets.append(items)
+        for key in keys :
+            self._buckets.setdefault(key, []).append(position)
+
+
+class CardDeduplicator :
+    """
+    Отбрасывает карточки с почти одинаковым вопросом или (для развёрнутых ответов) почти одинаковым ответом
+    """
+    def __init__(self , threshold : float = 0.7 , minAnswerLen : int = 40):
+        self.minAnswerLen = minAnswerLen
+        self._exact = set()
+        self._questions = NearDuplicateIndex(threshold)
+        self._answers = NearDuplicateIndex(threshold)
+
+    @classmethod
+    def fromEnv(cls) -> "CardDeduplicator" :
+        return cls(threshold = float(os.getenv("CARD_DEDUP_THRESHOLD", "0.7")))
+
+    def add(self , card) -> bool :
+        question = shingles(card.question)
+        # короткие ответы (одно слово в «заполни пропуск») совпадают у разных карточек — их не сравниваем
+        answer = shingles(card.answer) if len(card.answer) >= self.minAnswerLen else frozenset()
+        exact = " ".join(sorted(question)) or card.question.lower().strip()
+        if exact in self._exact :
+            return False
+        questionKeys = self._questions.keys(question) if question else None
+        answerKeys = self._answers.keys(answer) if answer else None
+        if (question and self._questions.contains(question, questionKeys)) or (answer and self._answers.contains(answer, answerKeys)) :
+            return False
+        self._exact.add(exact)
+        if question :
+            self._questions.add(question, questionKeys)
+        if answer :
+            self._answers.add(answer, answerKeys)
+        return True
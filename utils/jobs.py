@@ -0,0 +1,202 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+
+from models.card import Card
+from utils.sharedState import connect, sharedPath
+
+PROGRESS_FIELDS = ('pagesParsed', 'chunksTotal', 'chunksDone', 'cardsReady')
+
+
+def _newJob(kind : str) -> Dict[str, Any] :
+    now = time.time()
+    job = {
+        "id" : uuid.uuid4().hex,
+        "kind" : kind,
+        "status" : "queued",
+        "error" : None,
+        "created" : now,
+        "updated" : now,
+    }
+    job.update({field : 0 for field in PROGRESS_FIELDS})
+    return job
+
+
+class MemoryJobStore :
+    def __init__(self , ttl : float = 24 * 3600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._results = {}
+
+    def create(self , kind : str) -> Dict[str, Any] :
+        self.purge()
+        job = _newJob(kind)
+        self._jobs[job["id"]] = job
+        return dict(job)
+
+    def get(self , jobId : str) -> Optional[Dict[str, Any]] :
+        job = self._jobs.get(jobId)
+        return dict(job) if job else None
+
+    def update(self , jobId : str , **fields) :
+        job = self._jobs.get(jobId)
+        if job :
+            job.update(fields)
+            job["updated"] = time.time()
+
+    def setResult(self , jobId : str , cards : List[Card]) :
+        self._results[jobId] = cards
+        self.update(jobId, status = "done", cardsReady = len(cards))
+
+    def getResult(self , jobId : str) -> Optional[List[Card]] :
+        return self._results.get(jobId)
+
+    def purge(self) :
+        deadline = time.time() - self.ttl
+        for jobId in [j for j, job in self._jobs.items() if job["updated"] < deadline] :
+            self._jobs.pop(jobId, None)
+            self._results.pop(jobId, None)
+
+
+class SqliteJobStore :
+    COLUMNS = ('id', 'kind', 'status', 'error', 'created', 'updated') + PROGRESS_FIELDS
+
+    def __init__(self , path : str , ttl : float = 24 * 3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # задачу создаёт и выполняет один воркер, а статус могут спросить у любого — общий файл в WAL
+        self._db = connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, error TEXT, "
+            "created REAL NOT NULL, updated REAL NOT NULL, "
+            "pagesParsed INTEGER DEFAULT 0, chunksTotal INTEGER DEFAULT 0, "
+            "chunksDone INTEGER DEFAULT 0, cardsReady INTEGER DEFAULT 0, result TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs(updated)")
+        self._db.commit()
+
+    def create(self , kind : str) -> Dict[str, Any] :
+        self.purge()
+        job = _newJob(kind)
+        with self._lock :
+            self._db.execute(
+                f"INSERT INTO jobs ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                [job[c] for c in self.COLUMNS]
+            )
+            self._db.commit()
+        return job
+
+    def get(self , jobId : str) -> Optional[Dict[str, Any]] :
+        with self._lock :
+            row = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (jobId,)
+            ).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def update(self , jobId : str , **fields) :
+        fields = {k : v for k, v in fields.items() if k in self.COLUMNS}
+        fields["updated"] = time.time()
+        with self._lock :
+            self._db.execute(
+                f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                list(fields.values()) + [jobId]
+            )
+            self._db.commit()
+
+    def setResult(self , jobId : str , cards : List[Card]) :
+        with self._lock :
+            self._db.execute(
+                "UPDATE jobs SET result = ?, status = 'done', cardsReady = ?, updated = ? WHERE id = ?",
+                (orjson.dumps(cards).decode('utf-8'), len(cards), time.time(), jobId)
+            )
+            self._db.commit()
+
+    def getResult(self , jobId : str) -> Optional[List[Card]] :
+        with self._lock :
+            row = self._db.execute("SELECT result FROM jobs WHERE id = ?", (jobId,)).fetchone()
+        return Card.fromList(orjson.loads(row[0])) if row and row[0] else None
+
+    def purge(self) :
+        with self._lock :
+            self._db.execute("DELETE FROM jobs WHERE updated < ?", (time.time() - self.ttl,))
+            self._db.commit()
+
+
+def jobStoreFromEnv() :
+    ttl = float(os.getenv("JOBS_TTL", str(24 * 3600)))
+    path = sharedPath("JOBS_DB")
+    if path :
+        return SqliteJobStore(path, ttl = ttl)
+    return MemoryJobStore(ttl = ttl)
+
+
+class JobRunner :
+    """
+    Локальный пул воркеров: задачи выполняются в фоне, статус и результат пишутся в store
+    """
+    def __init__(self , store , workers : int = None):
+        self.store = store
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self._queue = None
+        self._tasks = []
+        # записи в store идут по очереди в одном потоке: ожидание блокировки SQLite не держит цикл событий,
+        # а прогресс не обгоняет итоговый статус
+        self._writer = ThreadPoolExecutor(max_workers = 1, thread_name_prefix = "jobs-store")
+
+    async def _write(self , method : Callable , *args , **fields) :
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, functools.partial(method, *args, **fields))
+
+    def _progress(self , jobId : str) -> Callable :
+        loop = asyncio.get_running_loop()
+        return lambda **fields : loop.run_in_executor(self._writer, functools.partial(self._saveProgress, jobId, fields))
+
+    def _saveProgress(self , jobId : str , fields : dict) :
+        # прогресс — не повод ронять задачу: следующая отметка или итог всё равно запишутся
+        try :
+            self.store.update(jobId, **fields)
+        except Exception as e :
+            print(f"⚠️ Не удалось записать прогресс задачи {jobId}: {e}")
+
+    def start(self) :
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) :
+        for task in self._tasks :
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions = True)
+        self._tasks = []
+
+    async def submit(self , kind : str , work : Callable) -> Dict[str, Any] :
+        if self._queue is None :
+            self.start()
+        job = await self._write(self.store.create, kind)
+        self._queue.put_nowait((job["id"], work))
+        return job
+
+    async def _worker(self) :
+        while True :
+            jobId, work = await self._queue.get()
+            try :
+                # ошибка store (например «database is locked») — тоже ошибка задачи, а не конец воркера
+                await self._write(self.store.update, jobId, status = "running")
+                cards = await work(self._progress(jobId))
+                await self._write(self.store.setResult, jobId, cards)
+            except Exception as e :
+                detail = getattr(e, "detail", None) or str(e)
+                print(f"❌ Задача {jobId} завершилась ошибкой: {detail}")
+                try :
+                    await self._write(self.store.update, jobId, status = "failed", error = detail)
+                except Exception as storeError :
+                    print(f"❌ Не удалось записать статус задачи {jobId}: {storeError}")
+            finally :
+                self._queue.task_done()
@@ -0,0 +1,76 @@
+import math
+import re
+from collections import Counter
+from typing import Iterable, List
+
+STOP_WORDS = frozenset({
+    'это', 'быть', 'в', 'на', 'с', 'по', 'для', 'от', 'к', 'и',
+    'а', 'но', 'или', 'что', 'как', 'так', 'вот', 'же', 'то',
+    'который', 'которые', 'которая', 'которое', 'также', 'может', 'можно',
+    'the', 'is', 'in', 'on', 'at', 'for', 'and', 'or', 'but', 'a',
+    'which', 'are', 'was', 'were', 'been', 'be', 'have', 'has',
+    'there', 'their', 'these', 'those', 'where', 'while', 'about',
+})
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_][\w'-]*")
+
+
+def tokenize(text : str , minLen : int = 5) -> List[str] :
+    return [
+        w for w in TOKEN_PATTERN.findall(text)
+        if len(w) >= minLen and w.lower() not in STOP_WORDS
+    ]
+
+
+class KeywordIndex :
+    """
+    TF-IDF по предложениям документа: текст токенизируется один раз, ключевые слова предложения берутся из индекса
+    """
+    def __init__(self , sentences : Iterable[str]):
+        self._tokens = {}
+        documentFreq = Counter()
+        for sentence in sentences :
+            if sentence in self._tokens :
+                continue
+            tokens = tokenize(sentence)
+            self._tokens[sentence] = tokens
+            documentFreq.update({t.lower() for t in tokens})
+
+        total = len(self._tokens)
+        self._unknownIdf = math.log(1 + total) + 1
+        self.idf = {
+            word : math.log((1 + total) / (1 + freq)) + 1
+            for word, freq in documentFreq.items()
+        }
+        self._keywords = {}
+
+    def keywords(self , sentence : str , topN : int = 5) -> List[str] :
+        cached = self._keywords.get(sentence)
+        if cached is None :
+            cached = self._rank(sentence)
+            self._keywords[sentence] = cached
+        return cached[:topN]
+
+    def _rank(self , sentence : str) -> List[str] :
+        tokens = self._tokens.get(sentence)
+        if tokens is None :
+            tokens = tokenize(sentence)
+
+        termFreq = Counter(t.lower() for t in tokens)
+        scores = {}
+        for position, token in enumerate(tokens) :
+            if token in scores :
+                continue
+            score = termFreq[token.lower()] * self.idf.get(token.lower(), self._unknownIdf)
+            # имена собственные и термины с заглавной буквы (не в начале предложения) важнее
+            if position > 0 and not token.islower() :
+                score *= 1.5
+            scores[token] = score
+        return sorted(scores, key = scores.get, reverse = True)
+
+    def topTerms(self , topN : int = 10) -> List[str] :
+        frequency = Counter()
+        for tokens in self._tokens.values() :
+            frequency.update(t.lower() for t in tokens)
+        scores = {word : freq * self.idf[word] for word, freq in frequency.items()}
+        return sorted(scores, key = scores.get, reverse = True)[:topN]
@@ -0,0 +1,174 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7)
+PAGE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+CARD_BUCKETS = (0, 1, 5, 10, 20, 50, 100)
+
+_LOCK = threading.Lock()
+
+
+def _labelText(labels : Tuple[Tuple[str, str], ...] , extra : str = "") -> str :
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra :
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter :
+    def __init__(self , name : str , description : str):
+        self.name = name
+        self.description = description
+        self._values : Dict[tuple, float] = {}
+
+    def inc(self , amount : float = 1 , **labels) :
+        key = tuple(sorted(labels.items()))
+        with _LOCK :
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> Iterable[str] :
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self._values.items()) :
+            yield f"{self.name}{_labelText(key)} {value}"
+
+
+class Histogram :
+    def __init__(self , name : str , description : str , buckets : Tuple[float, ...]):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        # по ключу меток: [счётчики по корзинам..., +Inf], сумма
+        self._values : Dict[tuple, list] = {}
+
+    def observe(self , value : float , **labels) :
+        key = tuple(sorted(labels.items()))
+        with _LOCK :
+            entry = self._values.get(key)
+            if entry is None :
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def render(self) -> Iterable[str] :
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total) in sorted(self._values.items()) :
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts) :
+                cumulative += count
+                le = 'le="' + ("+Inf" if bound == float('inf') else f"{bound:g}") + '"'
+                yield f"{self.name}_bucket{_labelText(key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labelText(key)} {total}"
+            yield f"{self.name}_count{_labelText(key)} {cumulative}"
+
+
+STAGE_SECONDS = Histogram("flashcards_stage_seconds", "Время этапа конвейера на один запрос", LATENCY_BUCKETS)
+EVENTS = Counter("flashcards_events_total", "События конвейера: запасные пути, попадания в кэш")
+HTTP_REQUESTS = Counter("flashcards_http_requests_total", "HTTP запросы")
+HTTP_SECONDS = Histogram("flashcards_http_request_seconds", "Время ответа HTTP", LATENCY_BUCKETS)
+INPUT_CHARS = Histogram("flashcards_input_chars", "Размер входного текста, символы", SIZE_BUCKETS)
+UPLOAD_BYTES = Histogram("flashcards_upload_bytes", "Размер загруженного PDF, байты", SIZE_BUCKETS)
+PDF_PAGES = Histogram("flashcards_pdf_pages", "Страниц в PDF", PAGE_BUCKETS)
+CARDS = Histogram("flashcards_cards", "Карточек в ответе", CARD_BUCKETS)
+
+REGISTRY = (STAGE_SECONDS, EVENTS, HTTP_REQUESTS, HTTP_SECONDS, INPUT_CHARS, UPLOAD_BYTES, PDF_PAGES, CARDS)
+
+
+class Spans :
+    """
+    Тайминги этапов одного запроса. Время одного этапа суммируется (например извлечение по страницам),
+    в гистограммы попадает при finish()
+    """
+    def __init__(self):
+        self.stages : Dict[str, float] = {}
+        self.events : Dict[str, int] = {}
+        self.finished = False
+
+    def add(self , stage : str , seconds : float) :
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self , event : str) :
+        self.events[event] = self.events.get(event, 0) + 1
+
+    def export(self) -> dict :
+        return {"stages" : dict(self.stages), "events" : dict(self.events)}
+
+    def finish(self) :
+        self.finished = True
+        for stage, seconds in self.stages.items() :
+            STAGE_SECONDS.observe(seconds, stage = stage)
+        for event, amount in self.events.items() :
+            EVENTS.inc(amount, event = event)
+
+
+_CURRENT : contextvars.ContextVar = contextvars.ContextVar("spans", default = None)
+
+
+def _active() -> Optional[Spans] :
+    spans = _CURRENT.get()
+    # поток ответа может продолжаться после того, как запрос уже записан
+    if spans is None or spans.finished :
+        return None
+    return spans
+
+
+@contextlib.contextmanager
+def collect() :
+    spans = Spans()
+    token = _CURRENT.set(spans)
+    try :
+        yield spans
+    finally :
+        _CURRENT.reset(token)
+
+
+def record(stage : str , seconds : float) :
+    spans = _active()
+    if spans is not None :
+        spans.add(stage, seconds)
+    else :
+        STAGE_SECONDS.observe(seconds, stage = stage)
+
+
+def event(name : str) :
+    spans = _active()
+    if spans is not None :
+        spans.count(name)
+    else :
+        EVENTS.inc(event = name)
+
+
+def merge(exported : dict) :
+    # тайминги, собранные в процессе парсера, добавляются к текущему запросу
+    for stage, seconds in exported.get("stages", {}).items() :
+        record(stage, seconds)
+    for name, amount in exported.get("events", {}).items() :
+        for _ in range(amount) :
+            event(name)
+
+
+@contextlib.contextmanager
+def span(stage : str) :
+    started = time.perf_counter()
+    try :
+        yield
+    finally :
+        record(stage, time.perf_counter() - started)
+
+
+def render(gauges : Dict[str, float] = None) -> str :
+    lines = []
+    for metric in REGISTRY :
+        with _LOCK :
+            lines.extend(metric.render())
+    # текущее состояние (очереди, кэши) передаётся снаружи на момент запроса
+    for name, value in (gauges or {}).items() :
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
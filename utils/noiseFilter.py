@@ -0,0 +1,110 @@
+import os
+import re
+from typing import Iterable, List, Sequence
+
+# Правила шума по языкам; common применяется всегда
+NOISE_RULES = {
+    'common' : [
+        r'©',
+        r'isbn',
+        r'^\d+$',
+        r'^\s*$',
+        r'^[\d\s\.\-—–]+$',
+    ],
+    'ru' : [
+        r'все права защищены',
+        r'издательство',
+        r'напечатано',
+        r'содержание|оглавление',
+        r'глава \d+',
+        r'часть \d+',
+        r'раздел \d+',
+        r'страница \d+',
+        r'автор:|составитель',
+        r'редактор:|под редакцией',
+    ],
+    'en' : [
+        r'copyright',
+        r'publishing|press',
+        r'printed in',
+        r'table of contents',
+        r'chapter \d+',
+        r'part \d+',
+        r'section \d+',
+        r'page \d+',
+        r'author:',
+        r'editor:',
+    ],
+}
+
+
+REGEX_SPECIAL = re.compile(r'[\\^$.|?*+()\[\]{}]')
+
+
+class NoiseClassifier :
+    """
+    Правила компилируются один раз: буквальные подстроки проверяются через `in` (быстрый поиск в C),
+    правила с \\d+ проверяются regex только если найден их буквальный префикс,
+    правила с ^...$ объединены в одно выражение для всего абзаца
+    """
+    def __init__(self , languages : Sequence[str] = ('ru', 'en') , minLen : int = 20):
+        self.languages = tuple(languages)
+        self.minLen = minLen
+        rules = list(NOISE_RULES['common'])
+        for language in self.languages :
+            rules.extend(NOISE_RULES.get(language, []))
+
+        literals = []
+        guarded = {}
+        anchored = []
+        for rule in rules :
+            for alternative in rule.split('|') :
+                if alternative.startswith('^') :
+                    anchored.append(alternative)
+                elif not REGEX_SPECIAL.search(alternative) :
+                    literals.append(alternative)
+                else :
+                    prefix = alternative[:REGEX_SPECIAL.search(alternative).start()]
+                    if not prefix :
+                        raise ValueError(f"Правило шума без буквального префикса: {alternative}")
+                    guarded.setdefault(prefix, []).append(alternative)
+
+        self._literals = tuple(literals)
+        self._guarded = tuple(
+            (prefix, re.compile('|'.join(alternatives)))
+            for prefix, alternatives in guarded.items()
+        )
+        self._anchored = re.compile('|'.join(f'(?:{rule})' for rule in anchored)) if anchored else None
+
+    def _matches(self , text : str) -> bool :
+        if self._anchored is not None and self._anchored.search(text) :
+            return True
+        for literal in self._literals :
+            if literal in text :
+                return True
+        for prefix, pattern in self._guarded :
+            if prefix in text and pattern.search(text) :
+                return True
+        return False
+
+    def isNoise(self , text : str) -> bool :
+        if not text :
+            return True
+        text = text.strip()
+        if len(text) < self.minLen :
+            return True
+        return self._matches(text.lower())
+
+    def classify(self , paragraphs : Iterable[str]) -> List[bool] :
+        matches = self._matches
+        minLen = self.minLen
+        result = []
+        for text in paragraphs :
+            text = text.strip() if text else ""
+            result.append(len(text) < minLen or matches(text.lower()))
+        return result
+
+
+def classifierFromEnv() -> NoiseClassifier :
+    languages = os.getenv("PDF_NOISE_LANGUAGES", "ru,en")
+    return NoiseClassifier([l.strip() for l in languages.split(',') if l.strip()])
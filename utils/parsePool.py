@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Union
+
+from utils import metrics
+from utils.cache import ResultCache, hashKey
+from utils.pdfParser import PdfDocument, preload, process_pdf
+from utils.textProcessor import processText
+from utils.uploads import PdfUpload
+
+
+def _initWorker(maxMemoryMb : int) :
+    preload()
+    _limitMemory(maxMemoryMb)
+
+
+def _limitMemory(maxMemoryMb : int) :
+    if maxMemoryMb <= 0 :
+        return
+    try :
+        import resource
+        limit = maxMemoryMb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e :
+        print(f"⚠️ Не удалось ограничить память парсера: {e}")
+
+
+class ParseTimeout(BaseException) :
+    """
+    SIGALRM в процессе-парсере. Не Exception: разбор PDF ловит Exception на каждой странице
+    и иначе проглотил бы таймаут. Из процесса наружу уходит обычный TimeoutError
+    """
+
+
+def _onAlarm(signum , frame) :
+    raise ParseTimeout()
+
+
+def _parseJob(pdfContent : Union[bytes, str] , maxChars : int = None , timeout : float = 0) -> dict :
+    # таймаут действует внутри процесса: зависшая PDF прерывается, и процесс сразу берёт следующую задачу
+    if timeout > 0 :
+        signal.signal(signal.SIGALRM, _onAlarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try :
+        # метрики процесса-парсера не видны API: тайминги возвращаются вместе с результатом
+        with metrics.collect() as spans , PdfDocument(pdfContent) as document :
+            # текст обрабатывается (processText) здесь же, по мере чтения страниц, а не в процессе API
+            text = process_pdf(document , maxChars)
+            try :
+                pages = document.numPages
+            except Exception :
+                pages = 0
+    except ParseTimeout :
+        raise TimeoutError("Парсинг PDF прерван по таймауту") from None
+    finally :
+        if timeout > 0 :
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return {"text" : text, "pages" : pages, "timings" : spans.export()}
+
+
+class ParsePool :
+    def __init__(self , workers : int = None , timeout : float = None , maxMemoryMb : int = None , killGrace : float = 5):
+        self.workers = workers or int(os.getenv("PDF_PARSE_WORKERS", "0")) or os.cpu_count() or 1
+        self.timeout = timeout or float(os.getenv("PDF_PARSE_TIMEOUT", "30"))
+        # сколько ждать сверх timeout, прежде чем убить процессы, не ответившие на SIGALRM (завис в C-коде)
+        self.killGrace = killGrace
+        # лимит на процесс = лимит на задачу: процесс парсит одну PDF за раз
+        self.maxMemoryMb = maxMemoryMb if maxMemoryMb is not None else int(os.getenv("PDF_PARSE_MAX_MEMORY_MB", "1024"))
+        self._executor = None
+        self.cache = ResultCache.fromEnv("pdf", "PDF")
+        # сколько полезного текста читать на одну карточку; 0 — читать документ целиком
+        self.charsPerCard = int(os.getenv("PDF_CHARS_PER_CARD", "3000"))
+
+    def _getExecutor(self) -> ProcessPoolExecutor :
+        if self._executor is None :
+            self._executor = ProcessPoolExecutor(
+                max_workers = self.workers,
+                initializer = _initWorker,
+                initargs = (self.maxMemoryMb,)
+            )
+        return self._executor
+
+    async def parse(self , pdfContent : Union[bytes, str, PdfUpload] , numCards : int = None) -> str :
+        return (await self.parseDocument(pdfContent , numCards))["text"]
+
+    async def parseDocument(self , pdfContent : Union[bytes, str, PdfUpload] , numCards : int = None) -> dict :
+        maxChars = numCards * self.charsPerCard if numCards and self.charsPerCard > 0 else None
+        # ключ — sha256 содержимого: у загрузки он уже посчитан по мере приёма байтов.
+        # "processed": в кэше обработанный текст, записи со старым сырым текстом под этот ключ не попадают
+        key = None
+        if isinstance(pdfContent, PdfUpload) :
+            key = hashKey("processed" , pdfContent.hash , maxChars)
+            pdfContent = pdfContent.source
+        elif isinstance(pdfContent, bytes) :
+            key = hashKey("processed" , hashlib.sha256(pdfContent).hexdigest() , maxChars)
+        if key is not None :
+            cached = await self.cache.getAsync(key)
+            if cached is not None :
+                print(f"♻️ Текст PDF взят из кэша")
+                metrics.event("pdf_cache_hit")
+                return cached
+
+        loop = asyncio.get_running_loop()
+        executor = self._getExecutor()
+        try :
+            future = loop.run_in_executor(executor, _parseJob, pdfContent, maxChars, self.timeout)
+            parsed = await asyncio.wait_for(future, timeout = self.timeout + self.killGrace)
+        except asyncio.TimeoutError :
+            self._kill(executor)
+            raise TimeoutError(f"Парсинг PDF занял больше {self.timeout} с")
+        except BrokenProcessPool :
+            if getattr(executor, "killed", False) :
+                raise TimeoutError("Парсер PDF перезапущен из-за зависшей задачи")
+            # процесс убит (обычно из-за лимита памяти) — пул пересоздаём
+            self._drop(executor)
+            raise MemoryError("Парсер PDF превысил лимит памяти")
+
+        metrics.merge(parsed.pop("timings"))
+        metrics.PDF_PAGES.observe(parsed["pages"])
+        if key is not None :
+            await self.cache.setAsync(key , parsed)
+        return parsed
+
+    async def parseMany(self , contents : List[Union[bytes, str, PdfUpload]] , numCards : int = None) -> List[Union[str, Exception]] :
+        return await asyncio.gather(
+            *(self.parse(c , numCards) for c in contents),
+            return_exceptions = True
+        )
+
+    async def processMany(self , texts : List[str]) -> List[Union[str, Exception]] :
+        loop = asyncio.get_running_loop()
+        executor = self._getExecutor()
+        return await asyncio.gather(
+            *(loop.run_in_executor(executor, processText, text) for text in texts),
+            return_exceptions = True
+        )
+
+    async def warmUp(self) :
+        # процессы пула стартуют заранее (initializer импортирует библиотеки PDF), а не на первом запросе
+        loop = asyncio.get_running_loop()
+        executor = self._getExecutor()
+        await asyncio.gather(*(loop.run_in_executor(executor, os.getpid) for _ in range(self.workers)))
+
+    def _kill(self , executor : ProcessPoolExecutor) :
+        # задача не ответила даже на SIGALRM: освободить слот можно, только убив процессы пула.
+        # Соседние задачи этого пула получат BrokenProcessPool, следующие запросы — новый пул
+        executor.killed = True
+        for process in list((executor._processes or {}).values()) :
+            process.kill()
+        self._drop(executor)
+
+    def _drop(self , executor : ProcessPoolExecutor) :
+        if self._executor is executor :
+            self._executor = None
+        executor.shutdown(wait = False, cancel_futures = True)
+
+    def shutdown(self) :
+        if self._executor is not None :
+            self._drop(self._executor)
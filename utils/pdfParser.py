@@ -1,143 +1,416 @@
+import contextlib
+import hashlib
 import io
-from typing import Union
-import PyPDF2
-import pdfplumber
+import mmap
+import time
+from typing import Iterable, Iterator, List, Optional, Union
 
-def parse_pdf(pdf_content: Union[bytes, str]) -> str:
+from utils import metrics
+from utils.cache import ResultCache
+from utils.noiseFilter import classifierFromEnv
+from utils.textProcessor import PARAGRAPH_BREAK_PATTERN, normalizeWhitespace, processTextStream
+
+NOISE_CLASSIFIER = classifierFromEnv()
+
+
+def preload() :
+    """
+    PyPDF2 и pdfplumber (вместе с pdfminer) импортируются при первом разборе, а не при импорте модуля.
+    Процессы парсера вызывают это при старте, чтобы первый PDF не ждал импорта
+    """
+    import PyPDF2
+    import pdfplumber
+
+CONTENT_MARKERS = (
+    'введение', 'introduction', 'chapter 1', 'глава 1',
+    'part 1', 'часть 1', 'раздел 1'
+)
+FRONT_MATTER_TITLES = (
+    'содержание', 'оглавление', 'contents', 'copyright', 'title', 'титул',
+    'cover', 'обложка', 'dedication', 'посвящение', 'acknowledg', 'благодарност',
+    'об авторе', 'about the author', 'list of', 'список'
+)
+# стили нумерации /PageLabels (PDF 1.3+): /D — арабские цифры, /r и /R — римские
+ROMAN_LABEL_STYLES = ('/r', '/R')
+
+# диапазон страниц зависит только от содержимого PDF — кэшируем по хэшу документа
+_PAGE_RANGE_CACHE = ResultCache("pageRange", maxItems = 512, ttl = 7 * 24 * 3600)
+
+class PdfDocument :
+    """
+    Одна открытая PDF: reader создаётся один раз, текст страниц извлекается лениво и кэшируется.
+    Вместо байтов можно передать путь к файлу: он отображается в память (mmap), без копии в куче процесса.
+    Отображение освобождает close() или выход из with
+    """
+    def __init__(self , pdfContent : Union[bytes, str]):
+        self.content = pdfContent
+        self._map = None
+        self._reader = None
+        self._pageTexts = {}
+        self._plumberText = None
+        self._hash = None
+
+    def __enter__(self) -> "PdfDocument" :
+        return self
+
+    def __exit__(self , *exc) :
+        self.close()
+
+    def close(self) :
+        # reader читает прямо из отображения, поэтому уходит вместе с ним; извлечённый текст страниц остаётся
+        self._reader = None
+        if self._map is not None :
+            self._map.close()
+            self._map = None
+
+    @property
+    def hash(self) -> str :
+        if self._hash is None :
+            self._hash = hashlib.sha256(self._buffer()).hexdigest()
+        return self._hash
+
+    def _buffer(self) :
+        if not isinstance(self.content, str) :
+            return self.content
+        if self._map is None :
+            with open(self.content, 'rb') as f :
+                self._map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        return self._map
+
+    @property
+    def reader(self) :
+        if self._reader is None :
+            from PyPDF2 import PdfReader
+            buffer = self._buffer()
+            self._reader = PdfReader(buffer if isinstance(buffer, mmap.mmap) else io.BytesIO(buffer))
+        return self._reader
+
+    @property
+    def numPages(self) -> int :
+        return len(self.reader.pages)
+
+    def pageText(self , pageNum : int) -> str :
+        if pageNum not in self._pageTexts :
+            self._pageTexts[pageNum] = self.reader.pages[pageNum].extract_text() or ""
+        return self._pageTexts[pageNum]
+
+    def iterPages(self , startPage : int = 0 , endPage : int = None) -> Iterator[str] :
+        # в отличие от pageText не запоминает текст: при потоковом чтении в памяти только текущая страница
+        endPage = self.numPages if endPage is None else min(endPage, self.numPages)
+        for pageNum in range(startPage, endPage) :
+            text = self._pageTexts.get(pageNum)
+            if text is None :
+                started = time.perf_counter()
+                text = self.reader.pages[pageNum].extract_text() or ""
+                metrics.record("extract_pypdf2", time.perf_counter() - started)
+            yield text
+
+    def text(self , startPage : int = 0 , endPage : int = None) -> str :
+        return '\n'.join(self.iterPages(startPage, endPage))
+
+    def iterPlumberPages(self) -> Iterator[str] :
+        source = self.content if isinstance(self.content, str) else io.BytesIO(self.content)
+        import pdfplumber
+        with pdfplumber.open(source) as pdf :
+            for page in pdf.pages :
+                started = time.perf_counter()
+                text = page.extract_text()
+                metrics.record("extract_pdfplumber", time.perf_counter() - started)
+                if text :
+                    yield text
+
+    def plumberText(self) -> str :
+        if self._plumberText is None :
+            self._plumberText = '\n'.join(self.iterPlumberPages())
+        return self._plumberText
+
+
+@contextlib.contextmanager
+def _openDocument(pdfContent : Union[bytes, str, PdfDocument]) -> Iterator[PdfDocument] :
+    # переданный документ закрывает тот, кто его открыл; открытый здесь закрывается здесь же
+    if isinstance(pdfContent, PdfDocument) :
+        yield pdfContent
+        return
+    with PdfDocument(pdfContent) as document :
+        yield document
+
+
+def parse_pdf(pdf_content: Union[bytes, str, PdfDocument], maxChars: int = None) -> str:
+    """
+    Страницы читаются по одной: очистка -> абзацы -> фильтр шума.
+    При maxChars чтение останавливается, как только набрано достаточно полезного текста
+    """
+    with _openDocument(pdf_content) as document:
+        return ''.join(_iter_document_text(document, maxChars))
+
+
+def process_pdf(pdf_content: Union[bytes, str, PdfDocument], maxChars: int = None) -> str:
+    """
+    processText(parse_pdf(...)), но абзацы проходят processTextStream по мере чтения страниц,
+    без отдельного прохода по всему извлечённому тексту
+    """
+    with _openDocument(pdf_content) as document:
+        return '\n\n'.join(processTextStream(_iter_document_text(document, maxChars)))
+
+
+def _iter_document_text(document: PdfDocument, maxChars: int = None) -> Iterator[str]:
+    """
+    Текст parse_pdf кусками: ''.join(кусков) == parse_pdf(document, maxChars)
+    """
     try:
-        start_page, end_page = _smart_page_range_detection(pdf_content)
+        with metrics.span("page_range"):
+            start_page, end_page = _smart_page_range_detection(document)
         
         print(f"📖 Обрабатываю страницы {start_page}-{end_page}")
-        if start_page > 0:
-            text = extract_page_range(pdf_content, start_page, end_page)
-        else:
-            text = pyPdf2(pdf_content)
-            if len(text.strip()) < 100:
-                text = pdfPlumber(pdf_content)
-        cleaned_text = cleanText(text)
-        meaningful_text = _filter_meaningful_paragraphs(cleaned_text)
+        pages = _iter_page_texts(document, start_page, end_page)
+
+        meaningful_count = 0
+        meaningful_size = 0
+        # весь очищенный текст нужен только как запасной вариант, пока полезного меньше 100 символов;
+        # до тех пор полезные абзацы придерживаются, дальше отдаются сразу
+        cleaned = []
+        pending = []
+        for group in _iter_paragraph_groups(pages):
+            if cleaned is not None:
+                cleaned.extend(group)
+            with metrics.span("noise_filter"):
+                group_meaningful = _meaningful_paragraphs(group)
+            for paragraph in group_meaningful:
+                piece = ('\n\n' if meaningful_count else '') + paragraph
+                meaningful_count += 1
+                meaningful_size += len(piece)
+                if pending is None:
+                    yield piece
+                else:
+                    pending.append(piece)
+            if cleaned is not None and meaningful_size >= 100:
+                cleaned = None
+                yield from pending
+                pending = None
+            if maxChars and meaningful_size >= maxChars:
+                print(f"⏹️ Набрано {meaningful_size} символов, дальше страницы не читаю")
+                break
         
-        print(f"✅ Извлечено {len(meaningful_text)} символов полезного текста")
-        if len(meaningful_text.strip()) < 100:
+        print(f"✅ Извлечено {meaningful_size} символов полезного текста")
+        if cleaned is not None:
             print("⚠️ Мало полезного текста, возвращаю весь текст")
-            return cleaned_text
-        
-        return meaningful_text
+            yield '\n\n'.join(cleaned)
     
     except Exception as e:
         raise Exception(f"Ошибка парсинга PDF: {str(e)}")
+
+
+def _iter_page_texts(document: PdfDocument, start_page: int, end_page: int) -> Iterator[str]:
+    if start_page > 0:
+        yield from document.iterPages(start_page, end_page)
+        return
+
+    # как и раньше, если PyPDF2 почти ничего не извлёк — пробуем pdfplumber
+    buffered = []
+    extracted = 0
+    try:
+        for text in document.iterPages():
+            if buffered is None:
+                yield text
+                continue
+            buffered.append(text)
+            extracted += len(text.strip())
+            if extracted >= 100:
+                yield from buffered
+                buffered = None
+    except Exception as e:
+        print(f"PyPDF2 failed: {e}")
+    if buffered is None:
+        return
+
+    metrics.event("pdfplumber_fallback")
+    try:
+        yield from document.iterPlumberPages()
+    except Exception as e:
+        print(f"pdfplumber failed: {e}")
+
+
+def iter_clean_paragraphs(page_texts: Iterable[str]) -> Iterator[str]:
+    """
+    Очищенные абзацы по мере чтения страниц; результат тот же, что cleanText('\\n'.join(pages)).split('\\n\\n')
+    """
+    for group in _iter_paragraph_groups(page_texts):
+        yield from group
+
+
+def _iter_paragraph_groups(page_texts: Iterable[str]) -> Iterator[List[str]]:
+    buffer = ""
+    for text in page_texts:
+        buffer += text + '\n'
+        cut = None
+        for cut in PARAGRAPH_BREAK_PATTERN.finditer(buffer):
+            pass
+        if cut is None:
+            continue
+        head, buffer = buffer[:cut.start()], buffer[cut.end():]
+        with metrics.span("clean"):
+            group = [paragraph for paragraph in cleanText(head).split('\n\n') if paragraph]
+        if group:
+            yield group
+    with metrics.span("clean"):
+        group = [paragraph for paragraph in cleanText(buffer).split('\n\n') if paragraph]
+    if group:
+        yield group
+
+
 def _is_noise_text(text: str) -> bool:
     """
     Проверяет является ли текст мусором
     """
-    if not text or len(text.strip()) < 20:
-        return True
-    
-    noise_patterns = [
-        r'copyright|©|все права защищены|isbn',
-        r'издательство|publishing|press',
-        r'printed in|напечатано',
-        
-        r'содержание|table of contents|оглавление',
-        r'глава \d+|chapter \d+',
-        r'часть \d+|part \d+',
-        r'раздел \d+|section \d+',
+    return NOISE_CLASSIFIER.isNoise(text)
 
-        r'^\d+$',
-        r'страница \d+|page \d+',
-        
-        r'автор:|author:|составитель',
-        r'редактор:|editor:|под редакцией',
-        
-        r'^\s*$',
-        r'^[\d\s\.\-—–]+$',
+
+def _looks_like_prose(para: str) -> bool:
+    if len(para.split()) < 10:
+        return False
+    upper_ratio = sum(map(str.isupper, para)) / len(para)
+    return upper_ratio <= 0.5
+
+
+def _meaningful_paragraphs(paragraphs: List[str]) -> List[str]:
+    paragraphs = [para for para in paragraphs if len(para) >= 50]
+    noise = NOISE_CLASSIFIER.classify(paragraphs)
+    return [
+        para for para, is_noise in zip(paragraphs, noise)
+        if not is_noise and _looks_like_prose(para)
     ]
-    
-    import re
-    text_lower = text.lower().strip()
-    
-    for pattern in noise_patterns:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return True
-    
-    return False
 
 
 def _filter_meaningful_paragraphs(text: str) -> str:
-    paragraphs = text.split('\n\n')
-    
-    meaningful = []
-    for para in paragraphs:
-        para = para.strip()
-        
-        if len(para) < 50:
-            continue
-        
-        if _is_noise_text(para):
-            continue
-        
-        words = para.split()
-        if len(words) < 10:
-            continue
-        upper_ratio = sum(1 for c in para if c.isupper()) / len(para)
-        if upper_ratio > 0.5:  
-            continue
-        
-        meaningful.append(para)
-    
-    return '\n\n'.join(meaningful)
+    return '\n\n'.join(_meaningful_paragraphs([para.strip() for para in text.split('\n\n')]))
 
 
-def _smart_page_range_detection(pdf_content: bytes) -> tuple:
-    import io
-    import PyPDF2
-    
+def _smart_page_range_detection(pdf_content: Union[bytes, PdfDocument]) -> tuple:
+    """
+    Начало содержательной части: сначала закладки и метки страниц (почти бесплатно),
+    затем поиск маркеров в тексте первых страниц
+    """
     try:
-        pdf_file = io.BytesIO(pdf_content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        total_pages = len(pdf_reader.pages)
-        for page_num in range(min(20, total_pages)):
-            page = pdf_reader.pages[page_num]
-            text = page.extract_text().lower()
-            content_markers = [
-                'введение', 'introduction', 'chapter 1', 'глава 1',
-                'part 1', 'часть 1', 'раздел 1'
-            ]
-            
-            for marker in content_markers:
-                if marker in text:
-                    return (page_num, total_pages)
-        return (min(3, total_pages), total_pages)
+        with _openDocument(pdf_content) as document:
+            total_pages = document.numPages
+            cached = _PAGE_RANGE_CACHE.get(document.hash)
+            if cached is not None:
+                return tuple(cached)
+
+            start_page = _start_from_outline(document)
+            if start_page is None:
+                start_page = _start_from_page_labels(document)
+            if start_page is None:
+                start_page = _start_from_text(document)
+
+            page_range = (min(start_page, total_pages), total_pages)
+            _PAGE_RANGE_CACHE.set(document.hash, page_range)
+            return page_range
     
-    except:
+    except Exception:
         return (0, 0)
+
+
+def _flatten_outline(outline) -> Iterator:
+    for item in outline:
+        if isinstance(item, list):
+            yield from _flatten_outline(item)
+        else:
+            yield item
+
+
+def _start_from_outline(document: PdfDocument) -> Optional[int]:
+    try:
+        outline = document.reader.outline
+    except Exception:
+        return None
+    if not outline:
+        return None
+
+    entries = []
+    for item in _flatten_outline(outline):
+        try:
+            page_num = document.reader.get_destination_page_number(item)
+        except Exception:
+            continue
+        if page_num is not None and page_num >= 0:
+            entries.append((page_num, str(getattr(item, 'title', '') or '').lower()))
+    if not entries:
+        return None
+    entries.sort()
+
+    for page_num, title in entries:
+        if any(marker in title for marker in CONTENT_MARKERS):
+            return page_num
+    for page_num, title in entries:
+        if not any(front in title for front in FRONT_MATTER_TITLES):
+            return page_num
+    return None
+
+
+def _page_label_ranges(document: PdfDocument) -> List[tuple]:
+    """
+    Диапазоны /PageLabels из каталога документа: [(первая страница, стиль)], по возрастанию.
+    В PyPDF2 3.0 нет API для меток страниц, поэтому дерево чисел (/Nums, /Kids) разбирается здесь
+    """
+    tree = document.reader.trailer["/Root"].get("/PageLabels")
+    if tree is None:
+        return []
+    ranges = []
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop().get_object()
+        nums = node.get("/Nums") or []
+        for i in range(0, len(nums) - 1, 2):
+            style = nums[i + 1].get_object().get("/S")
+            ranges.append((int(nums[i]), str(style) if style is not None else None))
+        nodes.extend(node.get("/Kids") or [])
+    return sorted(ranges)
+
+
+def _start_from_page_labels(document: PdfDocument) -> Optional[int]:
+    # передняя часть книг обычно нумеруется римскими цифрами (i, ii, iii...), основная — арабскими с «1»
+    try:
+        ranges = _page_label_ranges(document)
+    except Exception:
+        return None
+    if not ranges or ranges[0][0] != 0 or ranges[0][1] not in ROMAN_LABEL_STYLES:
+        return None
+    for start, style in ranges[1:]:
+        if style == '/D':
+            return start
+    return None
+
+
+def _start_from_text(document: PdfDocument) -> int:
+    total_pages = document.numPages
+    for page_num in range(min(20, total_pages)):
+        text = document.pageText(page_num).lower()
+        for marker in CONTENT_MARKERS:
+            if marker in text:
+                return page_num
+
+    # маркеров нет: пропускаем только те первые страницы, на которых нет связного текста
+    for page_num in range(min(3, total_pages)):
+        paragraphs = [p for p in cleanText(document.pageText(page_num)).split('\n\n') if p]
+        if _meaningful_paragraphs(paragraphs):
+            return page_num
+    # короткий документ целиком не выбрасываем
+    return 3 if total_pages > 3 else 0
     
-def pyPdf2(pdfContent : bytes) -> str:
+def pyPdf2(pdfContent : Union[bytes, PdfDocument]) -> str:
     try :
-        pdfFile = io.BytesIO(pdfContent)
-        pdfReader = PyPDF2.PdfReader(pdfFile)
-
-        textParts = []
-        for pageNum in range(len(pdfReader.pages)):
-            page = pdfReader.pages[pageNum]
-            textParts.append(page.extract_text())
-        return '\n'.join(textParts)
+        with _openDocument(pdfContent) as document :
+            return document.text()
     except Exception as e:
         print(f"PyPDF2 failed: {e}")
         return ""
 
 
-def pdfPlumber(pdfContent : bytes) -> str:
+def pdfPlumber(pdfContent : Union[bytes, PdfDocument]) -> str:
     try :
-        pdfFile = io.BytesIO(pdfContent)
-
-        textParts = []
-        with pdfplumber.open(pdfFile) as pdf :
-            for page in pdf.pages :
-                text = page.extract_text()
-                if text :
-                    textParts.append(text)
-        return '\n'.join(textParts)
+        with _openDocument(pdfContent) as document :
+            return document.plumberText()
     except Exception as e :
         print(f"pdfplumber failed: {e}")
         return ""
@@ -145,41 +418,27 @@ def pdfPlumber(pdfContent : bytes) -> str:
 def cleanText(text : str) -> str :
     if not text :
         return ""
-    import re
-    text = re.sub(r'[ \t]+', ' ', text)
-    
-    text = re.sub(r'\n\s*\n+', '\n\n', text)
-    
-    lines = [line.strip() for line in text.split('\n')]
-    text = '\n'.join(lines)
-
-    return text.strip()
+    return normalizeWhitespace(text)
 
-def extract_metadata(pdfContent : bytes) -> dict:
+def extract_metadata(pdfContent : Union[bytes, PdfDocument]) -> dict:
     try : 
-        pdfFile = io.BytesIO(pdfContent)
-        pdfReader = PyPDF2.PdfReader(pdfFile)
-
-        metadata = {
-            'numPages' : len(pdfReader.pages),
-            'title' : pdfReader.metadata.get('/Title' , 'Unknown'),
-            'author' : pdfReader.metadata.get('/Author' , 'Unknown'),
-            'subject' : pdfReader.metadata.get('/Subject' , 'Unknown'),
-        }
+        with _openDocument(pdfContent) as document :
+            info = document.reader.metadata or {}
+
+            metadata = {
+                'numPages' : document.numPages,
+                'title' : info.get('/Title' , 'Unknown'),
+                'author' : info.get('/Author' , 'Unknown'),
+                'subject' : info.get('/Subject' , 'Unknown'),
+            }
         return metadata
     except Exception as e :
         return {'error' : str(e)}
 
-def extract_page_range(pdfContent : bytes , startPage : int , endPage : int) -> str : 
+def extract_page_range(pdfContent : Union[bytes, PdfDocument] , startPage : int , endPage : int) -> str : 
     try : 
-        pdfFile = io.BytesIO(pdfContent)
-        pdfReader = PyPDF2.PdfReader(pdfFile)
-
-        textParts = []
-        for pageNum in range(startPage , min(endPage , len(pdfReader.pages))) :
-            page = pdfReader.pages[pageNum]
-            textParts.append(page.extract_text())
-        text = '\n'.join(textParts)
+        with _openDocument(pdfContent) as document :
+            text = document.text(startPage , endPage)
         return cleanText(text)
     except Exception as e :
         raise Exception(f"Page extracting failed : {str(e)}")
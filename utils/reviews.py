@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.sharedState import connect
+
+DAY = 24 * 3600
+SCHEDULE_COLUMNS = ('userId', 'cardId', 'due', 'interval', 'ease', 'reps', 'lapses', 'lastReview')
+
+
+def sm2(state : Dict[str, Any] , grade : int , now : float) -> Dict[str, Any] :
+    """
+    Алгоритм SM-2: grade от 0 (не помню) до 5 (идеально). Интервал в днях
+    """
+    state = dict(state)
+    if grade < 3 :
+        state["reps"] = 0
+        state["interval"] = 1.0
+        state["lapses"] += 1
+    else :
+        if state["reps"] == 0 :
+            state["interval"] = 1.0
+        elif state["reps"] == 1 :
+            state["interval"] = 6.0
+        else :
+            state["interval"] = round(state["interval"] * state["ease"], 2)
+        state["reps"] += 1
+    state["ease"] = max(1.3, state["ease"] + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    state["due"] = now + state["interval"] * DAY
+    state["lastReview"] = now
+    return state
+
+
+class ReviewStore :
+    """
+    Расписание повторений: одна строка на (пользователь, карточка) и индекс (userId, due),
+    поэтому выборка «что повторить сейчас» — диапазон по индексу, а не просмотр всей истории
+    """
+    def __init__(self , path : str , decksPath : str = None):
+        self._lock = threading.Lock()
+        self._db = connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS schedule ("
+            "userId TEXT NOT NULL, cardId INTEGER NOT NULL, due REAL NOT NULL, interval REAL NOT NULL, "
+            "ease REAL NOT NULL, reps INTEGER NOT NULL, lapses INTEGER NOT NULL, lastReview REAL, "
+            "PRIMARY KEY (userId, cardId)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS reviews ("
+            "id INTEGER PRIMARY KEY, userId TEXT NOT NULL, cardId INTEGER NOT NULL, grade INTEGER NOT NULL, "
+            "reviewed REAL NOT NULL, interval REAL NOT NULL, ease REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS schedule_due ON schedule(userId, due)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS reviews_card ON reviews(userId, cardId, reviewed)")
+        # удаление колоды чистит расписание по cardId у всех пользователей
+        self._db.execute("CREATE INDEX IF NOT EXISTS schedule_card ON schedule(cardId)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS reviews_card_id ON reviews(cardId)")
+        self._db.commit()
+        # выборки идут через JOIN с карточками (только живые карточки); колоды в другом файле подключаются через ATTACH
+        self.cardsTable = "cards"
+        if decksPath and os.path.abspath(decksPath) != os.path.abspath(path) :
+            self._db.execute("ATTACH DATABASE ? AS decks", (decksPath,))
+            self.cardsTable = "decks.cards"
+
+    @classmethod
+    def fromEnv(cls) -> "ReviewStore" :
+        decksPath = os.getenv("DECKS_DB", "decks.db")
+        return cls(os.getenv("REVIEWS_DB") or decksPath, decksPath)
+
+    def enroll(self , userId : str , cardIds : Iterable[int] , now : float = None) -> int :
+        # новые карточки доступны для повторения сразу; уже добавленные не сбрасываются
+        now = now or time.time()
+        with self._lock :
+            with self._db :
+                before = self._db.total_changes
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO schedule (userId, cardId, due, interval, ease, reps, lapses) "
+                    "VALUES (?, ?, ?, 0, 2.5, 0, 0)",
+                    ((userId, cardId, now) for cardId in cardIds)
+                )
+                return self._db.total_changes - before
+
+    def state(self , userId : str , cardId : int) -> Optional[Dict[str, Any]] :
+        with self._lock :
+            row = self._db.execute(
+                f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedule WHERE userId = ? AND cardId = ?", (userId, cardId)
+            ).fetchone()
+        return dict(zip(SCHEDULE_COLUMNS, row)) if row else None
+
+    def review(self , userId : str , cardId : int , grade : int , now : float = None) -> Dict[str, Any] :
+        now = now or time.time()
+        with self._lock :
+            with self._db :
+                row = self._db.execute(
+                    f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedule WHERE userId = ? AND cardId = ?", (userId, cardId)
+                ).fetchone()
+                if row is None :
+                    state = dict(userId = userId, cardId = cardId, due = now, interval = 0.0, ease = 2.5,
+                                 reps = 0, lapses = 0, lastReview = None)
+                else :
+                    state = dict(zip(SCHEDULE_COLUMNS, row))
+                state = sm2(state, grade, now)
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO schedule ({', '.join(SCHEDULE_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(SCHEDULE_COLUMNS))})",
+                    [state[c] for c in SCHEDULE_COLUMNS]
+                )
+                self._db.execute(
+                    "INSERT INTO reviews (userId, cardId, grade, reviewed, interval, ease) VALUES (?, ?, ?, ?, ?, ?)",
+                    (userId, cardId, grade, now, state["interval"], state["ease"])
+                )
+        return state
+
+    def due(self , userId : str , limit : int = 20 , now : float = None) -> List[Dict[str, Any]] :
+        now = now or time.time()
+        # JOIN до LIMIT: строки удалённых карточек не занимают места в выборке
+        with self._lock :
+            rows = self._db.execute(
+                f"SELECT {', '.join('s.' + c for c in SCHEDULE_COLUMNS)} FROM schedule s "
+                f"JOIN {self.cardsTable} c ON c.id = s.cardId "
+                "WHERE s.userId = ? AND s.due <= ? ORDER BY s.due LIMIT ?",
+                (userId, now, limit)
+            ).fetchall()
+        return [dict(zip(SCHEDULE_COLUMNS, row)) for row in rows]
+
+    def stats(self , userId : str , now : float = None) -> Dict[str, Any] :
+        now = now or time.time()
+        live = f"FROM schedule s JOIN {self.cardsTable} c ON c.id = s.cardId WHERE s.userId = ?"
+        with self._lock :
+            dueNow = self._db.execute(f"SELECT COUNT(*) {live} AND s.due <= ?", (userId, now)).fetchone()[0]
+            total = self._db.execute(f"SELECT COUNT(*) {live}", (userId,)).fetchone()[0]
+            nextDue = self._db.execute(f"SELECT MIN(s.due) {live} AND s.due > ?", (userId, now)).fetchone()[0]
+        return {"userId" : userId, "dueNow" : dueNow, "total" : total, "nextDue" : nextDue}
+
+    def forget(self , cardIds : Iterable[int]) -> int :
+        """
+        Удаляет расписание и историю карточек (например удалённой колоды) у всех пользователей
+        """
+        cardIds = list(cardIds)
+        with self._lock :
+            with self._db :
+                before = self._db.total_changes
+                for start in range(0, len(cardIds), 500) :
+                    batch = cardIds[start:start + 500]
+                    marks = ', '.join('?' * len(batch))
+                    self._db.execute(f"DELETE FROM schedule WHERE cardId IN ({marks})", batch)
+                    self._db.execute(f"DELETE FROM reviews WHERE cardId IN ({marks})", batch)
+                return self._db.total_changes - before
+
+    def history(self , userId : str , cardId : int , limit : int = 50) -> List[Dict[str, Any]] :
+        columns = ('grade', 'reviewed', 'interval', 'ease')
+        with self._lock :
+            rows = self._db.execute(
+                f"SELECT {', '.join(columns)} FROM reviews WHERE userId = ? AND cardId = ? ORDER BY reviewed DESC LIMIT ?",
+                (userId, cardId, limit)
+            ).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
@@ -0,0 +1,148 @@
+import asyncio
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+# сколько соединение ждёт блокировку записи, занятую другим воркером, прежде чем вернуть «database is locked»
+BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
+
+def connect(path : str , autocommit : bool = False) -> sqlite3.Connection :
+    """
+    Соединение с SQLite, которую могут делить несколько процессов: WAL (чтение не ждёт запись)
+    и одинаковый busy timeout для всех хранилищ. Ждать блокировку может долго — вызывать не из цикла событий
+    """
+    db = sqlite3.connect(path, timeout = BUSY_TIMEOUT, check_same_thread = False, isolation_level = None if autocommit else "")
+    db.execute("PRAGMA journal_mode=WAL")
+    return db
+
+
+def sharedPath(name : str) -> Optional[str] :
+    """
+    Путь к SQLite для хранилища: своя переменная (например JOBS_DB) или общий SHARED_STATE_DB
+    """
+    return os.getenv(name) or os.getenv("SHARED_STATE_DB") or None
+
+
+class SharedState :
+    """
+    Состояние, общее для всех воркеров на одной машине (SQLite в режиме WAL): token bucket лимита Gemini
+    и аренды single-flight. Изменения идут в BEGIN IMMEDIATE — воркеры не читают устаревшее значение
+    """
+    def __init__(self , path : str):
+        self.path = path
+        # владелец аренды — этот процесс; после fork у воркера свой объект (создаётся при импорте app)
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._db = connect(path, autocommit = True)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS buckets "
+            "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, pausedUntil REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+
+    @classmethod
+    def fromEnv(cls) -> Optional["SharedState"] :
+        path = os.getenv("SHARED_STATE_DB")
+        return cls(path) if path else None
+
+    @contextlib.contextmanager
+    def transaction(self) :
+        with self._lock :
+            self._db.execute("BEGIN IMMEDIATE")
+            try :
+                yield self._db
+            except BaseException :
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def takeToken(self , name : str , rate : float , capacity : float) -> float :
+        """
+        Забирает токен; возвращает 0 или сколько секунд подождать до следующей попытки
+        """
+        with self.transaction() as db :
+            now = time.time()
+            row = db.execute("SELECT tokens, updated, pausedUntil FROM buckets WHERE name = ?", (name,)).fetchone()
+            tokens, updated, pausedUntil = row if row else (capacity, now, 0.0)
+            if now < pausedUntil :
+                return pausedUntil - now
+            if rate <= 0 :
+                return 0.0
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1 :
+                tokens -= 1
+            else :
+                wait = (1 - tokens) / rate
+            db.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated, pausedUntil) VALUES (?, ?, ?, ?)",
+                (name, tokens, now, pausedUntil)
+            )
+            return wait
+
+    def pauseBucket(self , name : str , seconds : float) :
+        with self.transaction() as db :
+            now = time.time()
+            row = db.execute("SELECT pausedUntil FROM buckets WHERE name = ?", (name,)).fetchone()
+            db.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated, pausedUntil) VALUES (?, 0, ?, ?)",
+                (name, now, max(row[0] if row else 0.0, now + seconds))
+            )
+
+    def tryLease(self , key : str , ttl : float) -> bool :
+        with self.transaction() as db :
+            now = time.time()
+            row = db.execute("SELECT expires FROM leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] > now :
+                return False
+            db.execute("INSERT OR REPLACE INTO leases (key, owner, expires) VALUES (?, ?, ?)", (key, self.owner, now + ttl))
+            return True
+
+    def isLeased(self , key : str) -> bool :
+        # только чтение, без BEGIN IMMEDIATE: ожидающие воркеры не стоят в очереди за блокировкой записи
+        with self._lock :
+            row = self._db.execute("SELECT expires FROM leases WHERE key = ?", (key,)).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def renew(self , key : str , ttl : float) -> bool :
+        # продление своей аренды; False — аренду уже перехватил другой воркер
+        with self.transaction() as db :
+            renewed = db.execute(
+                "UPDATE leases SET expires = ? WHERE key = ? AND owner = ?", (time.time() + ttl, key, self.owner)
+            ).rowcount
+        return bool(renewed)
+
+    def release(self , key : str) :
+        with self.transaction() as db :
+            db.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+            # заодно чистим аренды упавших воркеров
+            db.execute("DELETE FROM leases WHERE expires < ?", (time.time(),))
+
+
+class SharedTokenBucket :
+    """
+    Тот же интерфейс, что у TokenBucket, но токены и пауза после 429 общие для всех воркеров
+    """
+    def __init__(self , state : SharedState , name : str , rate : float , capacity : float):
+        self.state = state
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+
+    def pause(self , seconds : float) :
+        self.state.pauseBucket(self.name, seconds)
+
+    async def acquire(self) :
+        while True :
+            # при конкуренции воркеров SQLite может ждать блокировку — не держим цикл событий
+            wait = await asyncio.to_thread(self.state.takeToken, self.name, self.rate, self.capacity)
+            if wait <= 0 :
+                return
+            await asyncio.sleep(wait)
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight :
+    """
+    Одинаковые одновременные запросы (тот же ключ) ждут одно вычисление и получают общий результат.
+    С state (SharedState) то же работает между воркерами: вычисляет владелец аренды ключа, остальные ждут
+    её освобождения и затем берут результат из общего кэша. Пока вычисление идёт, аренда продлевается каждые
+    leaseTtl / 3 секунд; leaseTtl ограничивает только ожидание после падения владельца.
+    Занятую аренду ожидающие проверяют чтением, удваивая паузу от pollInterval до maxPollInterval
+    """
+    def __init__(self , name : str , state = None , leaseTtl : float = 30 , pollInterval : float = 0.05 ,
+                 maxPollInterval : float = 0.5):
+        self.name = name
+        self.state = state
+        self.leaseTtl = leaseTtl
+        self.pollInterval = pollInterval
+        self.maxPollInterval = maxPollInterval
+        self._inFlight : Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+        self.remote = 0
+
+    async def do(self , key : str , factory : Callable[[], Awaitable[Any]] , release : Callable[[], Any] = None) -> Any :
+        """
+        release освобождает ресурсы запроса (например загруженный файл). Они принадлежат вычислению, а не запросу:
+        если запрос присоединился к чужому вычислению — release вызывается сразу, иначе — когда вычисление
+        завершится, даже если сам запрос к тому времени отключился
+        """
+        self.calls += 1
+        task = self._inFlight.get(key)
+        if task is None :
+            task = asyncio.ensure_future(self._run(key, factory))
+            self._inFlight[key] = task
+            task.add_done_callback(lambda done : self._finish(key, done))
+            if release is not None :
+                task.add_done_callback(lambda done : release())
+        else :
+            self.shared += 1
+            if release is not None :
+                release()
+        # shield: если один клиент отключился, вычисление для остальных не отменяется
+        return await asyncio.shield(task)
+
+    async def _run(self , key : str , factory : Callable[[], Awaitable[Any]]) -> Any :
+        if self.state is None :
+            return await factory()
+        waited = False
+        delay = self.pollInterval
+        # аренда истекает сама, если её владелец упал. Блокировку записи (tryLease) берём,
+        # только когда аренда выглядит свободной; пока она занята — опрос чтением и всё реже
+        while not await asyncio.to_thread(self.state.tryLease, key, self.leaseTtl) :
+            waited = True
+            while True :
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.maxPollInterval)
+                if not await asyncio.to_thread(self.state.isLeased, key) :
+                    break
+        if waited :
+            self.remote += 1
+        heartbeat = asyncio.create_task(self._renew(key))
+        try :
+            return await factory()
+        finally :
+            heartbeat.cancel()
+            await asyncio.to_thread(self.state.release, key)
+
+    async def _renew(self , key : str) :
+        while True :
+            await asyncio.sleep(self.leaseTtl / 3)
+            try :
+                if not await asyncio.to_thread(self.state.renew, key, self.leaseTtl) :
+                    print(f"⚠️ Аренда {self.name} потеряна: документ может считаться в другом воркере")
+                    return
+            except Exception as e :
+                # например «database is locked»: попробуем на следующем такте, аренда ещё действует
+                print(f"⚠️ Не удалось продлить аренду {self.name}: {e}")
+
+    def _finish(self , key : str , task : asyncio.Task) :
+        if self._inFlight.get(key) is task :
+            del self._inFlight[key]
+        # ошибку забирают ожидающие; если все отключились — не даём asyncio ругаться на неполученное исключение
+        if not task.cancelled() :
+            task.exception()
+
+    def stats(self) -> dict :
+        return {
+            "name" : self.name,
+            "calls" : self.calls,
+            "shared" : self.shared,
+            "remote" : self.remote,
+            "inFlight" : len(self._inFlight),
+        }
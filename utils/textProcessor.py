@@ -1,44 +1,113 @@
 import re
-from typing import List,Dict
+from collections import Counter
+from typing import Iterable, Iterator, List, Dict
+
+from utils import metrics
+from utils.keywords import STOP_WORDS
+
+KEY_PHRASE_PATTERN = re.compile(r'\b[а-яёА-ЯЁa-zA-Z]{4,}\b')
+
+CONTROL_PATTERN = re.compile(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f-\x9f]')
+SPACES_PATTERN = re.compile(r'  +')
+BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+PARAGRAPH_BREAK_PATTERN = re.compile(r'\n[^\S\n]*\n')
+# порядок важен: после удаления URL может обнажиться email, после email — номер страницы.
+# Первый элемент — дешёвая проверка подстроки, чтобы пропустить проход regex
+NOISE_PATTERNS = (
+    ('://', re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')), #URL brutally mogs
+    ('@', re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')), #emails sub5
+    ('', re.compile(r'(?:Страница|Page)\s+\d+', re.IGNORECASE)), #page sub3
+)
+PUNCTUATION_MARKS = '.,!?;:'
+PUNCTUATION_PATTERN = re.compile(rf'\s*([{PUNCTUATION_MARKS}])([А-Яа-яA-Za-z])?')
+PAGE_END_PATTERN = re.compile(r'(?:Страница|Page)\s*$', re.IGNORECASE)
+
+def _fixPunctuation(match) -> str :
+    mark , letter = match.groups()
+    return f"{mark} {letter}" if letter else mark
+
+def _normalizeLines(text : str) -> str :
+    text = SPACES_PATTERN.sub(' ', text)
+    text = '\n'.join([line.strip() for line in text.split('\n')])
+    return BLANK_LINES_PATTERN.sub('\n\n', text).strip()
+
+def normalizeWhitespace(text : str) -> str :
+    # общая для processText и pdfParser.cleanText: схлопывает пробелы/табы, обрезает строки, сводит пустые строки к одной
+    return _normalizeLines(text.replace('\t', ' '))
+
+def _pipeline(text : str) -> str :
+    text = CONTROL_PATTERN.sub('', text).replace('\t', ' ').replace('«', '"').replace('»', '"')
+    text = _normalizeLines(text)
+    text = removeNoise(text)
+    return PUNCTUATION_PATTERN.sub(_fixPunctuation, text)
 
 def processText(text : str) -> str :
     if not text or not text.strip() : 
         raise ValueError("Text cannot be empty")
-    text = basicCleaning(text)
-    text = normalize(text)
-    text = removeNoise(text)
-    text = fixErrors(text)
-
-    return text
+    with metrics.span("process_text") :
+        return _pipeline(text)
+
+def _canSplit(before : str , after : str) -> bool :
+    """
+    Совпадает ли processText(a + "\n\n" + b) с before + "\n\n" + after, где before/after — _pipeline(a)/_pipeline(b).
+    Не совпадает, если блок пуст (лишний перевод строки) или регулярка цепляется через разрыв:
+    знак препинания в начале абзаца съедает пробелы перед собой, «Страница» в конце абзаца — номер следующего
+    """
+    if not before or not after or after[0].isspace() or after[0] in PUNCTUATION_MARKS :
+        return False
+    return not (after[0].isdigit() and PAGE_END_PATTERN.search(before))
+
+def processTextStream(chunks : Iterable[str]) -> Iterator[str] :
+    """
+    Потоковый режим processText: принимает куски (например страницы), отдаёт готовые абзацы-блоки.
+    "\n\n".join(блоков) совпадает с processText(всего текста); абзацы, которые нельзя обработать отдельно, идут одним блоком
+    """
+    buffer = ""
+    pending = None
+    for chunk in chunks :
+        buffer += chunk
+        cut = None
+        for cut in PARAGRAPH_BREAK_PATTERN.finditer(buffer) :
+            pass
+        if cut is None :
+            continue
+        head , buffer = buffer[:cut.start()] , buffer[cut.end():]
+        if pending is None :
+            pending = head
+            continue
+        # блок отдаём, только когда виден следующий: от него зависит, можно ли их разделить
+        before , after = _pipeline(pending) , _pipeline(head)
+        if _canSplit(before, after) :
+            yield before
+            pending = head
+        else :
+            pending += "\n\n" + head
+    if pending is None :
+        tail = _pipeline(buffer)
+    else :
+        before , tail = _pipeline(pending) , _pipeline(buffer)
+        if _canSplit(before, tail) :
+            yield before
+        else :
+            tail = _pipeline(pending + "\n\n" + buffer)
+    if tail :
+        yield tail
 
 def basicCleaning(text : str) -> str: 
-    text = re.sub(r'[\x00-\x08\x0b-\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-    text = text.replace('\t', ' ')
-
-    return text
+    return CONTROL_PATTERN.sub('', text).replace('\t', ' ')
 
 def normalize(text : str) -> str: 
-    text = re.sub(r' +', ' ', text)
-    text = re.sub(r'\n\s*\n+', '\n\n', text)
-    
-    lines = [line.strip() for line in text.split('\n')]
-    text = '\n'.join(lines)
-
-    return text.strip()
+    return _normalizeLines(text)
 
 def removeNoise(text : str) -> str:
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text) #URL brutally mogs
-    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '', text) #emails sub5
-    text = re.sub(r'(?:Страница|Page)\s+\d+', '', text, flags=re.IGNORECASE) #page sub3
-
+    for marker , pattern in NOISE_PATTERNS :
+        if marker in text :
+            text = pattern.sub('', text)
     return text
 
 def fixErrors(text : str) -> str:
-    text = re.sub(r'\s+([.,!?;:])', r'\1', text)
-    text = re.sub(r'([.,!?;:])([А-Яа-яA-Za-z])', r'\1 \2', text)
-    text = text.replace('«', '"').replace('»', '"')
-
-    return text
+    text = PUNCTUATION_PATTERN.sub(_fixPunctuation, text)
+    return text.replace('«', '"').replace('»', '"')
 
 def analyzeText(text : str) -> Dict[str,any] : 
     words = text.split()
@@ -66,16 +135,8 @@ def splitIntoParagraphs(text : str) -> List[str] :
     return paragraphs
 
 def extractKeyPhrases(text : str , topN : int = 10) -> List[str] : 
-    stopWords = {
-        'это', 'быть', 'в', 'на', 'с', 'по', 'для', 'от', 'к', 'и',
-        'а', 'но', 'или', 'что', 'как', 'так', 'вот', 'же', 'то',
-        'the', 'is', 'in', 'on', 'at', 'for', 'and', 'or', 'but', 'a'
-    }
-    words = re.findall(r'\b[а-яёА-ЯЁa-zA-Z]{4,}\b', text.lower())
-    filteredWords = [w for w in words if w not in stopWords]
-
-    from collections import Counter
-    wordFreq = Counter(filteredWords)
+    words = KEY_PHRASE_PATTERN.findall(text.lower())
+    wordFreq = Counter(w for w in words if w not in STOP_WORDS)
 
     return [word for word, _ in wordFreq.most_common(topN)]
 
@@ -106,4 +167,34 @@ def validateTextForCards(text : str) -> tuple[bool,str]:
     if len(sentences) < 2 : 
         return False , "Text must contain minimum 2 sentences"
     
-    return True ,  ""
\ No newline at end of file
+    return True ,  ""
+
+def splitKeepingPunctuation(text : str) -> List[str] : 
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    return [s for s in sentences if s.strip()]
+
+def chunkText(text : str , maxChars : int = 4000) -> List[str] : 
+    chunks = []
+    current = ""
+
+    def flush() : 
+        nonlocal current
+        if current.strip() : 
+            chunks.append(current.strip())
+        current = ""
+
+    for paragraph in splitIntoParagraphs(text) : 
+        pieces = [paragraph] if len(paragraph) <= maxChars else splitKeepingPunctuation(paragraph)
+        separator = "\n\n"
+        for piece in pieces : 
+            while len(piece) > maxChars : 
+                flush()
+                chunks.append(piece[:maxChars])
+                piece = piece[maxChars:]
+            if len(current) + len(separator) + len(piece) > maxChars : 
+                flush()
+            current = current + separator + piece if current else piece
+            separator = " "
+
+    flush()
+    return chunks
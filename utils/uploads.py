@@ -0,0 +1,249 @@
+import hashlib
+import io
+import os
+import tempfile
+from typing import Dict, List, Optional, Union
+from urllib.parse import parse_qsl
+
+from multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+
+PDF_MAGIC = b'%PDF-'
+# по спецификации заголовок может стоять не в самом начале, но в первых 1024 байтах
+MAGIC_WINDOW = 1024
+
+
+class UploadError(Exception) :
+    pass
+
+
+class PdfUpload :
+    """
+    Загружаемый PDF пишется кусками: пока он меньше spoolBytes — в памяти, дальше — во временный файл.
+    Размер, сигнатура %PDF- и sha256 проверяются по мере поступления байтов
+    """
+    def __init__(self , filename : str , maxBytes : int , spoolBytes : int , tmpDir : str = None):
+        self.filename = filename or ""
+        self.maxBytes = maxBytes
+        self.spoolBytes = spoolBytes
+        self.tmpDir = tmpDir
+        self.size = 0
+        self.error = None
+        self._head = b""
+        self._checked = False
+        self._sha256 = hashlib.sha256()
+        self._memory = io.BytesIO()
+        self._file = None
+        self.path = None
+
+    def write(self , chunk : bytes) :
+        if self.error :
+            return
+        self.size += len(chunk)
+        if self.size > self.maxBytes :
+            self._fail(f"Файл слишком большой.Максимум {self.maxBytes // (1024 * 1024)}MB")
+        if not self._checked :
+            self._head += chunk[:MAGIC_WINDOW - len(self._head)]
+            if PDF_MAGIC in self._head :
+                self._checked = True
+            elif len(self._head) >= MAGIC_WINDOW :
+                self._fail("Файл не является PDF")
+        self._sha256.update(chunk)
+        if self._file is None and self._memory.tell() + len(chunk) > self.spoolBytes :
+            self._rollover()
+        (self._file or self._memory).write(chunk)
+
+    def _fail(self , message : str) :
+        self.error = message
+        self._discard()
+        raise UploadError(message)
+
+    def _rollover(self) :
+        self._file = tempfile.NamedTemporaryFile(prefix = "upload-", suffix = ".pdf", dir = self.tmpDir, delete = False)
+        self.path = self._file.name
+        self._file.write(self._memory.getbuffer())
+        self._memory = None
+
+    def finish(self) :
+        if self.error :
+            return
+        if not self._checked :
+            self._fail("Файл не является PDF")
+        if self._file is not None :
+            self._file.close()
+
+    @property
+    def hash(self) -> str :
+        return self._sha256.hexdigest()
+
+    @property
+    def source(self) -> Union[bytes, str] :
+        # путь передаётся в процесс парсера как есть и читается через mmap, без копии через pickle
+        if self.path is not None :
+            return self.path
+        return self._memory.getvalue()
+
+    def _discard(self) :
+        if self._file is not None :
+            self._file.close()
+        if self.path is not None :
+            try :
+                os.unlink(self.path)
+            except FileNotFoundError :
+                pass
+            self.path = None
+        self._file = None
+        self._memory = None
+
+    def close(self) :
+        self._discard()
+
+
+class UploadForm :
+    def __init__(self):
+        self.fields : Dict[str, List[str]] = {}
+        self.files : Dict[str, List[PdfUpload]] = {}
+
+    def field(self , name : str , default : str = None) -> Optional[str] :
+        values = self.fields.get(name)
+        return values[0] if values else default
+
+    def close(self) :
+        for uploads in self.files.values() :
+            for upload in uploads :
+                upload.close()
+
+
+async def receiveForm(request , maxFileBytes : int = None , spoolBytes : int = None ,
+                      maxFieldBytes : int = 5 * 1024 * 1024 , failFast : bool = True , suffix : str = '.pdf' ,
+                      maxRequestBytes : int = None , maxParts : int = None) -> UploadForm :
+    """
+    Разбирает multipart/form-data прямо из потока запроса. Форму без файлов можно прислать и как application/x-www-form-urlencoded.
+    failFast: первый неподходящий файл прерывает чтение (UploadError); иначе ошибка сохраняется в upload.error,
+    а остаток файла читается без записи.
+    maxRequestBytes и maxParts (файлы и поля вместе) ограничивают весь запрос в обоих режимах
+    """
+    maxFileBytes = maxFileBytes or int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+    spoolBytes = spoolBytes if spoolBytes is not None else int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+    maxRequestBytes = maxRequestBytes or int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(50 * 1024 * 1024)))
+    maxParts = maxParts or int(os.getenv("UPLOAD_MAX_PARTS", "50"))
+    tmpDir = os.getenv("UPLOAD_TMP_DIR") or None
+
+    contentType, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b'boundary')
+    urlencoded = contentType == b'application/x-www-form-urlencoded'
+    if not urlencoded and (contentType != b'multipart/form-data' or not boundary) :
+        raise UploadError("Ожидается multipart/form-data или application/x-www-form-urlencoded")
+
+    # заведомо слишком большой запрос отклоняем по заголовку, не читая тело
+    declared = request.headers.get("content-length")
+    declared = int(declared) if declared and declared.isdigit() else None
+    if failFast and declared is not None and declared > maxFileBytes + maxFieldBytes :
+        raise UploadError(f"Файл слишком большой.Максимум {maxFileBytes // (1024 * 1024)}MB")
+    if declared is not None and declared > maxRequestBytes :
+        raise UploadError(f"Запрос слишком большой.Максимум {maxRequestBytes // (1024 * 1024)}MB")
+    if urlencoded :
+        return await _receiveFields(request, maxFieldBytes, maxRequestBytes, maxParts)
+
+    form = UploadForm()
+    part = {}
+    parts = 0
+
+    def onPartBegin() :
+        nonlocal parts
+        parts += 1
+        if parts > maxParts :
+            raise UploadError(f"Слишком много файлов и полей.Максимум {maxParts}")
+        part.clear()
+        part.update(headers = {}, field = b"", value = b"", target = None, data = bytearray())
+
+    def onHeaderField(data , start , end) :
+        part["field"] += data[start:end]
+
+    def onHeaderValue(data , start , end) :
+        part["value"] += data[start:end]
+
+    def onHeaderEnd() :
+        part["headers"][part["field"].lower()] = part["value"]
+        part["field"] , part["value"] = b"", b""
+
+    def onHeadersFinished() :
+        _, disposition = parse_options_header(part["headers"].get(b'content-disposition', b""))
+        part["name"] = disposition.get(b'name', b"").decode('utf-8', errors = 'replace')
+        filename = disposition.get(b'filename')
+        if filename is not None :
+            upload = PdfUpload(filename.decode('utf-8', errors = 'replace'), maxFileBytes, spoolBytes, tmpDir)
+            form.files.setdefault(part["name"], []).append(upload)
+            part["target"] = upload
+            if suffix and not upload.filename.endswith(suffix) :
+                upload.error = "Разрешены только PDF файлы"
+                if failFast :
+                    raise UploadError(upload.error)
+
+    def onPartData(data , start , end) :
+        upload = part["target"]
+        if upload is None :
+            part["data"] += data[start:end]
+            if len(part["data"]) > maxFieldBytes :
+                raise UploadError(f"Поле {part['name']} слишком большое")
+            return
+        try :
+            upload.write(data[start:end])
+        except UploadError :
+            if failFast :
+                raise
+
+    def onPartEnd() :
+        upload = part["target"]
+        if upload is None :
+            form.fields.setdefault(part["name"], []).append(part["data"].decode('utf-8', errors = 'replace'))
+            return
+        try :
+            upload.finish()
+        except UploadError :
+            if failFast :
+                raise
+
+    parser = MultipartParser(boundary, {
+        'on_part_begin' : onPartBegin,
+        'on_part_data' : onPartData,
+        'on_part_end' : onPartEnd,
+        'on_header_field' : onHeaderField,
+        'on_header_value' : onHeaderValue,
+        'on_header_end' : onHeaderEnd,
+        'on_headers_finished' : onHeadersFinished,
+    })
+    received = 0
+    try :
+        async for chunk in request.stream() :
+            # Content-Length может не быть (chunked) — считаем фактически прочитанное
+            received += len(chunk)
+            if received > maxRequestBytes :
+                raise UploadError(f"Запрос слишком большой.Максимум {maxRequestBytes // (1024 * 1024)}MB")
+            parser.write(chunk)
+        parser.finalize()
+    except MultipartParseError as e :
+        form.close()
+        raise UploadError(f"Некорректный multipart запрос: {e}")
+    except BaseException :
+        form.close()
+        raise
+    return form
+
+
+async def _receiveFields(request , maxFieldBytes : int , maxRequestBytes : int , maxParts : int) -> UploadForm :
+    # urlencoded-форма — только текстовые поля: тело небольшое и читается целиком, но с теми же лимитами, что и multipart
+    body = bytearray()
+    async for chunk in request.stream() :
+        body += chunk
+        if len(body) > maxRequestBytes :
+            raise UploadError(f"Запрос слишком большой.Максимум {maxRequestBytes // (1024 * 1024)}MB")
+    try :
+        pairs = parse_qsl(body.decode('latin-1'), keep_blank_values = True, errors = 'replace', max_num_fields = maxParts)
+    except ValueError :
+        raise UploadError(f"Слишком много файлов и полей.Максимум {maxParts}")
+    form = UploadForm()
+    for name , value in pairs :
+        if len(value.encode()) > maxFieldBytes :
+            raise UploadError(f"Поле {name} слишком большое")
+        form.fields.setdefault(name, []).append(value)
+    return form